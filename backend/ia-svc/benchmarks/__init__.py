@@ -0,0 +1,10 @@
+"""
+Benchmarks y generador de carga de ia-svc.
+
+Todo corre en proceso: usuarios-svc y tickets-svc se reemplazan por stubs de
+httpx.MockTransport (ver synthetic.py), así que los resultados no dependen de la red.
+
+    python -m benchmarks.run --quick --output resultados.json
+    python -m benchmarks.run --compare base.json
+    python -m benchmarks.loadgen --mode open --rates 50 100 200 --duration 10
+"""
@@ -0,0 +1,316 @@
+# ia-svc/benchmarks/loadgen.py
+"""
+Generador de carga extremo a extremo del pipeline 'ticket.creado'.
+
+Publica tickets realistas (servicios reales de catalogo.json, varias empresas y grupos)
+en un broker en memoria; un consumidor con el mismo límite de mensajes en vuelo que
+el modo asyncio de RabbitMQClient los entrega a main.process_new_ticket, que habla con
+usuarios-svc y tickets-svc falsos (latencia configurable). La latencia se mide desde
+la publicación hasta que el pipeline publica 'ticket.procesado'.
+
+Modos:
+    open    llegadas de Poisson a --rate tickets/s, sin esperar respuestas
+            (con --rates se barre una lista de tasas para encontrar la saturación)
+    closed  --concurrency usuarios virtuales: publicar, esperar 'ticket.procesado', repetir
+
+Uso:
+    python -m benchmarks.loadgen --mode open --rates 50 100 200 400 --duration 10
+    python -m benchmarks.loadgen --mode closed --concurrency 32 --upstream-latency-ms 15 --output carga.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.synthetic import FakeUpstreams, catalog_groups, load_catalog, make_company, make_ticket_payload
+from logger import set_level
+from services.idempotency import IdempotencyCache
+from services.upstream_client import UpstreamClient
+
+OUTCOME_KEYS = {
+    'ticket.procesado': 'processed',
+    'ticket.sugerencia_asignacion': 'suggestion_fallback',
+    'ticket.error': 'error',
+}
+
+
+class InMemoryBroker:
+    """
+    Sustituto del exchange 'tickets': cola de 'ticket.creado' para el consumidor y
+    registro de los eventos que publica el pipeline.
+
+    Tiene la misma interfaz que EventPublisher.publish (devuelve un Future ya confirmado),
+    así que se conecta como publicador de RabbitMQClient.
+    """
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.listeners: List[Callable[[str, Dict], None]] = []
+        self.published: Dict[str, int] = {}
+        self.max_backlog = 0
+
+    def publish(self, routing_key: str, message: dict, headers: Optional[Dict] = None) -> Future:
+        self.published[routing_key] = self.published.get(routing_key, 0) + 1
+        if routing_key == 'ticket.creado':
+            self.queue.put_nowait(message)
+            self.max_backlog = max(self.max_backlog, self.queue.qsize())
+        for listener in self.listeners:
+            listener(routing_key, message)
+        future: Future = Future()
+        future.set_result(str(uuid.uuid4()))
+        return future
+
+
+class LoadRun:
+    """Estado de una corrida: tiempos de publicación y resultados por ticket"""
+
+    def __init__(self):
+        self.sent_at: Dict[str, float] = {}
+        self.latencies: List[float] = []
+        self.outcomes: Dict[str, int] = {'processed': 0, 'suggestion_fallback': 0, 'error': 0}
+        self.waiters: Dict[str, asyncio.Future] = {}
+
+    def on_event(self, routing_key: str, message: Dict):
+        outcome = OUTCOME_KEYS.get(routing_key)
+        if outcome is None:
+            return
+        ticket_id = message.get('ticketId')
+        started = self.sent_at.pop(ticket_id, None)
+        if started is None:
+            return
+        self.outcomes[outcome] += 1
+        if outcome == 'processed':
+            self.latencies.append(time.perf_counter() - started)
+        waiter = self.waiters.pop(ticket_id, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(outcome)
+
+    @property
+    def completed(self) -> int:
+        return sum(self.outcomes.values())
+
+
+def percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(int(round(p * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(run: LoadRun, elapsed: float, sent: int, broker: InMemoryBroker, **extra) -> Dict:
+    latencies = sorted(run.latencies)
+
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    return dict(extra, **{
+        'sent': sent,
+        'completed': run.completed,
+        'outcomes': dict(run.outcomes),
+        'pending': len(run.sent_at),
+        'elapsed_s': round(elapsed, 3),
+        'offered_rate': round(sent / elapsed, 2) if elapsed else None,
+        'throughput': round(run.outcomes['processed'] / elapsed, 2) if elapsed else None,
+        'max_backlog': broker.max_backlog,
+        'latency_ms': {
+            'p50': ms(percentile(latencies, 0.50)),
+            'p95': ms(percentile(latencies, 0.95)),
+            'p99': ms(percentile(latencies, 0.99)),
+            'max': ms(latencies[-1] if latencies else None),
+            'mean': ms(statistics.fmean(latencies) if latencies else None),
+        },
+    })
+
+
+class Pipeline:
+    """main.process_new_ticket conectado al broker en memoria y a upstreams falsos"""
+
+    def __init__(self, args):
+        import main  # Importar main no abre conexiones; eso lo hace el lifespan
+
+        catalog = load_catalog()
+        groups = catalog_groups(catalog)
+        self.catalog = catalog
+        self.companies = [f'empresa-{i}' for i in range(args.companies)]
+        self.upstreams = FakeUpstreams(
+            {empresa: make_company(empresa, args.agents, args.tickets, groups, args.seed) for empresa in self.companies},
+            latency_ms=args.upstream_latency_ms, jitter_ms=args.upstream_jitter_ms, seed=args.seed)
+
+        upstream = UpstreamClient('loadgen', transport=self.upstreams.transport())
+        upstream.register('usuarios', main.USUARIOS_SERVICE_URL)
+        upstream.register('tickets', main.TICKETS_SERVICE_URL)
+        main.upstream_client = upstream
+        main.agent_assigner.upstream = upstream
+        main.agent_assigner.fetcher.upstream = upstream
+        # Caché de idempotencia propia: con la misma semilla se repiten los IDs de ticket entre corridas
+        main.idempotency = IdempotencyCache()
+
+        set_level(args.log_level)
+        self.main = main
+        self.upstream = upstream
+        self.max_in_flight = args.max_in_flight
+        self.rng = random.Random(args.seed)
+
+    def attach(self, broker: InMemoryBroker):
+        self.main.rabbitmq_client.publisher = broker
+
+    def new_ticket(self) -> Dict:
+        return make_ticket_payload(self.rng, self.rng.choice(self.companies), self.catalog)
+
+    async def consume(self, broker: InMemoryBroker):
+        """Consumidor con a lo sumo 'max_in_flight' tickets en proceso (como el prefetch del broker)"""
+        slots = asyncio.Semaphore(self.max_in_flight)
+        tasks = set()
+
+        def settle(task):
+            tasks.discard(task)
+            slots.release()
+            if not task.cancelled():
+                task.exception()  # Los fallos ya se cuentan por su 'ticket.error'
+
+        while True:
+            message = await broker.queue.get()
+            await slots.acquire()
+            task = asyncio.create_task(self.main.process_new_ticket(message))
+            tasks.add(task)
+            task.add_done_callback(settle)
+
+
+async def run_open_loop(pipeline: Pipeline, rate: float, duration: float, drain: float) -> Dict:
+    broker, run = InMemoryBroker(), LoadRun()
+    broker.listeners.append(run.on_event)
+    pipeline.attach(broker)
+    consumer = asyncio.create_task(pipeline.consume(broker))
+
+    rng = random.Random(f'open:{rate}')
+    start = time.perf_counter()
+    next_at, sent = start, 0
+    while next_at - start < duration:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        message = pipeline.new_ticket()
+        run.sent_at[message['ticket']['id']] = time.perf_counter()
+        broker.publish('ticket.creado', message)
+        sent += 1
+        next_at += rng.expovariate(rate)
+
+    # Esperar a que se vacíe lo publicado (hasta 'drain' segundos)
+    deadline = time.perf_counter() + drain
+    while run.sent_at and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    consumer.cancel()
+    return summarize(run, elapsed, sent, broker, mode='open', rate=rate)
+
+
+async def run_closed_loop(pipeline: Pipeline, concurrency: int, duration: float, think_ms: float,
+                          timeout: float) -> Dict:
+    broker, run = InMemoryBroker(), LoadRun()
+    broker.listeners.append(run.on_event)
+    pipeline.attach(broker)
+    consumer = asyncio.create_task(pipeline.consume(broker))
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    sent = 0
+
+    async def user():
+        nonlocal sent
+        while time.perf_counter() - start < duration:
+            message = pipeline.new_ticket()
+            ticket_id = message['ticket']['id']
+            waiter = run.waiters[ticket_id] = loop.create_future()
+            run.sent_at[ticket_id] = time.perf_counter()
+            broker.publish('ticket.creado', message)
+            sent += 1
+            try:
+                await asyncio.wait_for(waiter, timeout)
+            except asyncio.TimeoutError:
+                run.waiters.pop(ticket_id, None)
+            if think_ms:
+                await asyncio.sleep(think_ms / 1000.0)
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    consumer.cancel()
+    return summarize(run, elapsed, sent, broker, mode='closed', concurrency=concurrency)
+
+
+def print_summary(result: Dict):
+    lat = result['latency_ms']
+    label = f"rate={result['rate']}/s" if result['mode'] == 'open' else f"concurrency={result['concurrency']}"
+    print(f"{result['mode']:<6} {label:<18} enviados {result['sent']:>6}  procesados {result['outcomes']['processed']:>6}  "
+          f"{result['throughput'] or 0:>8.1f} tickets/s  p50 {lat['p50']} ms  p95 {lat['p95']} ms  "
+          f"p99 {lat['p99']} ms  backlog máx {result['max_backlog']}", flush=True)
+
+
+async def run(args) -> Dict:
+    pipeline = Pipeline(args)
+    results = []
+    try:
+        if args.mode == 'open':
+            for rate in args.rates or [args.rate]:
+                result = await run_open_loop(pipeline, rate, args.duration, args.drain)
+                print_summary(result)
+                results.append(result)
+        else:
+            for concurrency in args.concurrencies or [args.concurrency]:
+                result = await run_closed_loop(pipeline, concurrency, args.duration, args.think_ms, args.drain)
+                print_summary(result)
+                results.append(result)
+    finally:
+        await pipeline.upstream.close()
+
+    return {
+        'created_at': datetime.utcnow().isoformat() + 'Z',
+        'config': {k: v for k, v in vars(args).items() if k != 'output'},
+        'upstream': {
+            'requests': sum(pipeline.upstreams.requests.values()),
+            'classified': len(pipeline.upstreams.classified),
+            'assigned': len(pipeline.upstreams.assigned),
+        },
+        'results': results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> Dict:
+    parser = argparse.ArgumentParser(description='Generador de carga del pipeline ticket.creado de ia-svc')
+    parser.add_argument('--mode', choices=('open', 'closed'), default='open')
+    parser.add_argument('--rate', type=float, default=50.0, help='Tickets/s (modo open)')
+    parser.add_argument('--rates', type=float, nargs='+', help='Barrido de tasas (modo open)')
+    parser.add_argument('--concurrency', type=int, default=16, help='Usuarios virtuales (modo closed)')
+    parser.add_argument('--concurrencies', type=int, nargs='+', help='Barrido de concurrencia (modo closed)')
+    parser.add_argument('--think-ms', type=float, default=0.0, help='Pausa entre tickets de un usuario (modo closed)')
+    parser.add_argument('--duration', type=float, default=10.0, help='Segundos de carga por paso')
+    parser.add_argument('--drain', type=float, default=10.0, help='Segundos máximos de espera por lo pendiente')
+    parser.add_argument('--companies', type=int, default=5)
+    parser.add_argument('--agents', type=int, default=50, help='Agentes por empresa')
+    parser.add_argument('--tickets', type=int, default=5000, help='Tickets existentes por empresa')
+    parser.add_argument('--upstream-latency-ms', type=float, default=5.0)
+    parser.add_argument('--upstream-jitter-ms', type=float, default=5.0)
+    parser.add_argument('--max-in-flight', type=int, default=int(os.getenv('RABBITMQ_MAX_IN_FLIGHT', 10)))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--log-level', default='ERROR', help='Nivel de log del servicio durante la carga')
+    parser.add_argument('--output', help='Archivo JSON con el reporte')
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"✅ Reporte en {args.output}")
+    return report
+
+
+if __name__ == '__main__':
+    main()
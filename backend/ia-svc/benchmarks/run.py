@@ -0,0 +1,295 @@
+# ia-svc/benchmarks/run.py
+"""
+Micro-benchmarks reproducibles del clasificador y del scoring de asignación.
+
+Casos:
+    classify_ticket            exacto / aproximado / desconocido
+    calculate_agent_metrics    agentes x tickets de la empresa
+    _calculate_gaming_penalty
+    calculate_assignment_score
+    assign_ticket              completo, con libro mayor (caliente) o fotografía (frío)
+
+Uso:
+    python -m benchmarks.run                         # matriz completa (10-1000 agentes, 1k-100k tickets)
+    python -m benchmarks.run --quick                 # matriz reducida para CI
+    python -m benchmarks.run --only assign_ticket --output resultados.json
+    python -m benchmarks.run --quick --compare base.json --max-regression 0.15
+
+El JSON de salida se puede guardar como línea base de una versión; con --compare
+el proceso termina con código 2 si algún caso bajó más de --max-regression ops/s.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+# Permite 'python benchmarks/run.py' además de 'python -m benchmarks.run'
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.synthetic import FakeUpstreams, catalog_groups, load_catalog, make_company
+from services.agent_assigner import AgentAssigner
+from services.ticket_classifier import TicketClassifier
+from services.upstream_client import UpstreamClient
+from services.workload_ledger import WorkloadLedger
+
+SCHEMA_VERSION = 1
+
+FULL_AGENTS = (10, 100, 1000)
+FULL_TICKETS = (1_000, 10_000, 100_000)
+QUICK_AGENTS = (10, 100)
+QUICK_TICKETS = (1_000, 10_000)
+
+
+# ----------------------------------------------------------------------
+# Medición
+# ----------------------------------------------------------------------
+
+def _calibrate(run: Callable[[int], float], min_time: float) -> int:
+    """Número de iteraciones por repetición para que cada una dure al menos 'min_time'"""
+    loops = 1
+    while True:
+        elapsed = run(loops)
+        if elapsed >= min_time or loops >= 1_000_000:
+            return loops
+        # Estimar cuántas faltan (con margen) en vez de duplicar a ciegas
+        loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9) * 1.2))
+
+
+def measure(run: Callable[[int], float], repeat: int, min_time: float) -> Dict:
+    """
+    Ejecutar 'run(loops)' (que devuelve segundos transcurridos) 'repeat' veces.
+
+    Returns:
+        ops_per_sec (según la mediana), median_us, mean_us, min_us, stdev_us, loops, repeat
+    """
+    loops = _calibrate(run, min_time)
+    per_op = [run(loops) / loops for _ in range(repeat)]
+    median = statistics.median(per_op)
+    return {
+        'ops_per_sec': round(1.0 / median, 2) if median > 0 else None,
+        'median_us': round(median * 1e6, 3),
+        'mean_us': round(statistics.fmean(per_op) * 1e6, 3),
+        'min_us': round(min(per_op) * 1e6, 3),
+        'stdev_us': round(statistics.pstdev(per_op) * 1e6, 3),
+        'loops': loops,
+        'repeat': repeat,
+    }
+
+
+def sync_runner(func: Callable[[], object]) -> Callable[[int], float]:
+    def run(loops: int) -> float:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        return time.perf_counter() - start
+    return run
+
+
+def async_runner(loop: asyncio.AbstractEventLoop, coro_func: Callable[[], Awaitable]) -> Callable[[int], float]:
+    async def body(loops: int) -> float:
+        start = time.perf_counter()
+        for _ in range(loops):
+            await coro_func()
+        return time.perf_counter() - start
+
+    def run(loops: int) -> float:
+        return loop.run_until_complete(body(loops))
+    return run
+
+
+# ----------------------------------------------------------------------
+# Escenarios
+# ----------------------------------------------------------------------
+
+class Scenario:
+    """Empresa sintética con su asignador sobre upstreams falsos"""
+
+    EMPRESA_ID = 'empresa-bench'
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, n_agents: int, n_tickets: int,
+                 groups: List[str], use_ledger: bool, seed: int):
+        self.loop = loop
+        self.group = groups[0]
+        company = make_company(self.EMPRESA_ID, n_agents, n_tickets, groups, seed)
+        self.upstreams = FakeUpstreams({self.EMPRESA_ID: company})
+        self.upstream = UpstreamClient('bench', transport=self.upstreams.transport())
+        self.upstream.register('usuarios', 'http://usuarios-svc:3001')
+        self.upstream.register('tickets', 'http://tickets-svc:3002')
+        self.assigner = AgentAssigner('http://usuarios-svc:3001', 'http://tickets-svc:3002',
+                                      upstream=self.upstream,
+                                      ledger=WorkloadLedger() if use_ledger else None)
+        self.ticket = {'empresaId': self.EMPRESA_ID, 'grupo_atencion': self.group}
+        # Calentar roster (y libro mayor, si aplica) como en un servicio ya en marcha
+        loop.run_until_complete(self.assigner.assign_ticket(dict(self.ticket)))
+        self.snapshot = loop.run_until_complete(self.assigner.get_workload_view(self.EMPRESA_ID))
+        self.agent_ids = [a['_id'] for a in company['usuarios'] if self.group in a['gruposDeAtencion']]
+
+    def close(self):
+        self.loop.run_until_complete(self.upstream.close())
+
+
+def bench_classifier(results: List[Dict], args):
+    classifier = TicketClassifier()
+    name = classifier.catalog.names[0]
+    cases = {
+        'exact': {'servicioNombre': name},
+        'normalized': {'servicioNombre': f'  {name.upper()} '},
+        'fuzzy': {'servicioNombre': name[:-2] + 'xx'},
+        'unknown': {'servicioNombre': 'Servicio que no existe en el catálogo'},
+    }
+    for case, ticket in cases.items():
+        record(results, 'classify_ticket', {'case': case},
+               measure(sync_runner(lambda t=ticket: classifier.classify_ticket(t)), args.repeat, args.min_time))
+
+
+def bench_scoring(results: List[Dict], args):
+    assigner = AgentAssigner('http://usuarios-svc:3001', 'http://tickets-svc:3002')
+    metrics = {
+        'active_count': 7, 'active_weighted': 9.5, 'avg_ticket_age_days': 4.2, 'stagnant_count': 2,
+        'resolution_velocity': 0.4, 'efficiency_ratio': 0.65, 'gaming_penalty': 312.0
+    }
+    agent = {'_id': 'agente-1', 'nombre': 'Agente 1'}
+    if '_calculate_gaming_penalty' in args.only:
+        record(results, '_calculate_gaming_penalty', {},
+               measure(sync_runner(lambda: assigner._calculate_gaming_penalty(metrics)), args.repeat, args.min_time))
+    if 'calculate_assignment_score' in args.only:
+        record(results, 'calculate_assignment_score', {},
+               measure(sync_runner(lambda: assigner.calculate_assignment_score(agent, metrics)), args.repeat, args.min_time))
+
+
+def bench_assignment(results: List[Dict], args, loop, groups: List[str]):
+    for n_tickets in args.tickets:
+        for n_agents in args.agents:
+            # 'ledger': libro mayor caliente; 'snapshot': descarga los tickets en cada asignación
+            for mode in (('ledger', 'snapshot') if 'assign_ticket' in args.only else ('ledger',)):
+                scenario = Scenario(loop, n_agents, n_tickets, groups, mode == 'ledger', args.seed)
+                params = {'agents': n_agents, 'tickets': n_tickets}
+                try:
+                    if mode == 'ledger' and 'calculate_agent_metrics' in args.only:
+                        agent_id = scenario.agent_ids[0]
+                        record(results, 'calculate_agent_metrics', params, measure(
+                            async_runner(loop, lambda: scenario.assigner.calculate_agent_metrics(
+                                agent_id, scenario.EMPRESA_ID, scenario.snapshot)),
+                            args.repeat, args.min_time))
+                    if 'assign_ticket' in args.only:
+                        record(results, 'assign_ticket', dict(params, mode=mode), measure(
+                            async_runner(loop, lambda: scenario.assigner.assign_ticket(dict(scenario.ticket))),
+                            args.repeat, args.min_time))
+                finally:
+                    scenario.close()
+
+
+def record(results: List[Dict], name: str, params: Dict, stats: Dict):
+    results.append(dict(name=name, params=params, **stats))
+    label = ' '.join(f'{k}={v}' for k, v in params.items())
+    print(f"{name:<28} {label:<40} {stats['ops_per_sec'] or 0:>14,.1f} ops/s  "
+          f"mediana {stats['median_us']:>12,.1f} µs", flush=True)
+
+
+# ----------------------------------------------------------------------
+# Resultados
+# ----------------------------------------------------------------------
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _key(result: Dict) -> str:
+    return result['name'] + json.dumps(result['params'], sort_keys=True)
+
+
+def compare(results: Iterable[Dict], baseline: Dict, max_regression: float) -> List[Dict]:
+    """Casos cuyo ops/s bajó más de 'max_regression' (fracción) respecto a la línea base"""
+    base = {_key(r): r for r in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        previous = base.get(_key(result))
+        if not previous or not previous.get('ops_per_sec') or not result.get('ops_per_sec'):
+            continue
+        change = result['ops_per_sec'] / previous['ops_per_sec'] - 1.0
+        if change < -max_regression:
+            regressions.append({'name': result['name'], 'params': result['params'],
+                                'baseline_ops_per_sec': previous['ops_per_sec'],
+                                'ops_per_sec': result['ops_per_sec'], 'change': round(change, 4)})
+    return regressions
+
+
+BENCHMARKS = ('classify_ticket', 'calculate_agent_metrics', '_calculate_gaming_penalty',
+              'calculate_assignment_score', 'assign_ticket')
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmarks de clasificación y asignación de ia-svc')
+    parser.add_argument('--quick', action='store_true', help='Matriz reducida (10-100 agentes, 1k-10k tickets)')
+    parser.add_argument('--agents', type=int, nargs='+', help='Tamaños de roster')
+    parser.add_argument('--tickets', type=int, nargs='+', help='Tickets por empresa')
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.05, help='Segundos mínimos por repetición')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Archivo JSON de resultados (default: stdout al final)')
+    parser.add_argument('--compare', help='JSON de una corrida anterior para detectar regresiones')
+    parser.add_argument('--max-regression', type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    args.agents = tuple(args.agents or (QUICK_AGENTS if args.quick else FULL_AGENTS))
+    args.tickets = tuple(args.tickets or (QUICK_TICKETS if args.quick else FULL_TICKETS))
+
+    # Los logs del servicio no deben medir ni ensuciar la salida
+    logging.getLogger('ia').setLevel(logging.ERROR)
+
+    results: List[Dict] = []
+    if 'classify_ticket' in args.only:
+        bench_classifier(results, args)
+    if {'_calculate_gaming_penalty', 'calculate_assignment_score'} & set(args.only):
+        bench_scoring(results, args)
+    if {'calculate_agent_metrics', 'assign_ticket'} & set(args.only):
+        loop = asyncio.new_event_loop()
+        try:
+            bench_assignment(results, args, loop, catalog_groups(load_catalog()))
+        finally:
+            loop.close()
+
+    report = {
+        'schema': SCHEMA_VERSION,
+        'created_at': datetime.utcnow().isoformat() + 'Z',
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {'quick': args.quick, 'agents': args.agents, 'tickets': args.tickets,
+                   'repeat': args.repeat, 'min_time': args.min_time, 'seed': args.seed},
+        'results': results,
+    }
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            report['regressions'] = compare(results, json.load(f), args.max_regression)
+        for reg in report['regressions']:
+            print(f"⚠️ Regresión {reg['name']} {reg['params']}: {reg['baseline_ops_per_sec']:,.1f} -> "
+                  f"{reg['ops_per_sec']:,.1f} ops/s ({reg['change']:+.1%})")
+        exit_code = 2 if report['regressions'] else 0
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"✅ Resultados en {args.output}")
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,207 @@
+# ia-svc/benchmarks/synthetic.py
+"""
+Datos sintéticos reproducibles y upstreams falsos en proceso.
+
+- make_roster / make_company_tickets: empresas con N agentes y M tickets con una
+  mezcla realista de estados, prioridades y fechas.
+- make_ticket_payload: tickets 'ticket.creado' tomados del catálogo real.
+- FakeUpstreams: usuarios-svc y tickets-svc sobre httpx.MockTransport, con
+  latencia configurable y paginación, filtros y orden iguales a los de tickets-svc.
+"""
+import asyncio
+import json
+import os
+import random
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+
+CATALOG_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'catalogo.json')
+
+# Mezcla de estados de una empresa con historial (≈40% activos)
+STATE_WEIGHTS = {
+    'abierto': 20,
+    'en_proceso': 15,
+    'en_espera': 5,
+    'resuelto': 30,
+    'cerrado': 30,
+}
+PRIORITY_WEIGHTS = {'baja': 20, 'media': 45, 'alta': 25, 'critica': 10}
+
+
+def _iso(moment: datetime) -> str:
+    return moment.replace(microsecond=0).isoformat() + 'Z'
+
+
+def load_catalog(path: str = CATALOG_PATH) -> List[Dict]:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def catalog_groups(catalog: Sequence[Dict]) -> List[str]:
+    """Grupos de atención que aparecen en el catálogo (orden estable)"""
+    groups = []
+    for entry in catalog:
+        grupo = entry.get('gruposDeAtencion')
+        for name in (grupo if isinstance(grupo, list) else [grupo]):
+            if name and name not in groups:
+                groups.append(name)
+    return groups
+
+
+def make_roster(empresa_id: str, n_agents: int, groups: Sequence[str], seed: int = 0) -> List[Dict]:
+    """
+    Usuarios activos de una empresa con rol de soporte.
+    Cada agente pertenece a un grupo (reparto circular) y a veces a un segundo.
+    """
+    rng = random.Random(f'{seed}:{empresa_id}:roster')
+    agents = []
+    for i in range(n_agents):
+        grupos = [groups[i % len(groups)]]
+        if len(groups) > 1 and rng.random() < 0.2:
+            extra = rng.choice(groups)
+            if extra not in grupos:
+                grupos.append(extra)
+        agents.append({
+            '_id': f'{empresa_id}-agente-{i}',
+            'nombre': f'Agente {i}',
+            'email': f'agente{i}@{empresa_id}.example.com',
+            'rol': 'soporte',
+            'empresaId': empresa_id,
+            'gruposDeAtencion': grupos,
+            'activo': True,
+        })
+    return agents
+
+
+def make_company_tickets(empresa_id: str, n_tickets: int, agent_ids: Sequence[str],
+                         seed: int = 0, now: Optional[datetime] = None,
+                         unassigned_ratio: float = 0.1) -> List[Dict]:
+    """Tickets de una empresa repartidos entre 'agent_ids' en los últimos 60 días"""
+    rng = random.Random(f'{seed}:{empresa_id}:tickets')
+    now = now or datetime.utcnow()
+    states, state_w = zip(*STATE_WEIGHTS.items())
+    priorities, priority_w = zip(*PRIORITY_WEIGHTS.items())
+
+    tickets = []
+    for i in range(n_tickets):
+        created = now - timedelta(minutes=rng.randint(0, 60 * 24 * 60))
+        assigned = created + timedelta(minutes=rng.randint(1, 240))
+        updated = min(now, assigned + timedelta(hours=rng.expovariate(1 / 36)))
+        agent = None if not agent_ids or rng.random() < unassigned_ratio else rng.choice(agent_ids)
+        tickets.append({
+            '_id': f'{empresa_id}-ticket-{i}',
+            'empresaId': empresa_id,
+            'estado': rng.choices(states, state_w)[0],
+            'prioridad': rng.choices(priorities, priority_w)[0],
+            'agenteAsignado': agent,
+            'createdAt': _iso(created),
+            'fechaAsignacion': _iso(assigned) if agent else None,
+            'updatedAt': _iso(updated),
+        })
+    return tickets
+
+
+def make_ticket_payload(rng: random.Random, empresa_id: str, catalog: Sequence[Dict],
+                        ticket_id: Optional[str] = None) -> Dict:
+    """Mensaje 'ticket.creado' con un servicio real del catálogo"""
+    entry = rng.choice(catalog)
+    grupo = entry.get('gruposDeAtencion')
+    return {
+        'ticket': {
+            'id': ticket_id or f'{empresa_id}-nuevo-{rng.getrandbits(48):012x}',
+            'titulo': f"{entry['nombre']} - {entry.get('categoria') or 'General'}",
+            'descripcion': f"Solicitud de {entry['nombre'].lower()} reportada por el usuario",
+            'servicioNombre': entry['nombre'],
+            'empresaId': empresa_id,
+            'gruposDeAtencion': grupo[0] if isinstance(grupo, list) else grupo,
+        }
+    }
+
+
+def make_company(empresa_id: str, n_agents: int, n_tickets: int, groups: Sequence[str],
+                 seed: int = 0) -> Dict:
+    """Roster + tickets de una empresa, en el formato que espera FakeUpstreams"""
+    roster = make_roster(empresa_id, n_agents, groups, seed)
+    tickets = make_company_tickets(empresa_id, n_tickets, [a['_id'] for a in roster], seed)
+    return {'usuarios': roster, 'tickets': tickets}
+
+
+_TICKET_WRITE_RE = re.compile(r'^/tickets/([^/]+)/(clasificacion|asignar-ia)$')
+
+
+class FakeUpstreams:
+    """
+    usuarios-svc y tickets-svc falsos para httpx.MockTransport.
+
+    Args:
+        companies: {empresaId: {'usuarios': [...], 'tickets': [...]}}
+        latency_ms: Latencia fija añadida a cada respuesta
+        jitter_ms: Latencia aleatoria adicional (uniforme 0..jitter_ms)
+    """
+
+    def __init__(self, companies: Dict[str, Dict], latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0, seed: int = 0):
+        self.companies = companies
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._rng = random.Random(seed)
+        self.requests: Dict[str, int] = {}
+        self.classified: Dict[str, Dict] = {}
+        self.assigned: Dict[str, str] = {}
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        delay = self.latency_ms + (self._rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000.0)
+
+        route = f'{request.method} {request.url.host}{request.url.path}'
+        self.requests[route] = self.requests.get(route, 0) + 1
+        params = request.url.params
+
+        if request.url.path == '/usuarios':
+            company = self.companies.get(params.get('empresaId'), {})
+            return httpx.Response(200, json={'data': company.get('usuarios', [])})
+
+        if request.url.path == '/tickets':
+            empresa_id = params.get('empresaId')
+            if empresa_id:
+                tickets = self.companies.get(empresa_id, {}).get('tickets', [])
+            else:
+                tickets = [t for company in self.companies.values() for t in company.get('tickets', [])]
+            tickets = self._filter_tickets(tickets, params)
+            limit = int(params.get('limite', 1000))
+            page = int(params.get('pagina', 1))
+            start = (page - 1) * limit
+            return httpx.Response(200, json={'data': tickets[start:start + limit], 'total': len(tickets)})
+
+        match = _TICKET_WRITE_RE.match(request.url.path)
+        if match:
+            ticket_id, action = match.groups()
+            body = json.loads(request.content or b'{}')
+            if action == 'clasificacion':
+                self.classified[ticket_id] = body
+            else:
+                self.assigned[ticket_id] = body.get('agenteId')
+            return httpx.Response(200, json={'success': True, 'data': {'_id': ticket_id}})
+
+        return httpx.Response(404, json={'message': 'ruta no simulada'})
+
+    @staticmethod
+    def _filter_tickets(tickets: List[Dict], params) -> List[Dict]:
+        """Filtros de GET /tickets de tickets-svc (estado, prioridad, agenteAsignado, asignado), por createdAt descendente"""
+        if params.get('estado'):
+            tickets = [t for t in tickets if t.get('estado') == params['estado']]
+        if params.get('prioridad'):
+            tickets = [t for t in tickets if t.get('prioridad') == params['prioridad']]
+        if params.get('agenteAsignado'):
+            tickets = [t for t in tickets if t.get('agenteAsignado') == params['agenteAsignado']]
+        elif params.get('asignado') in ('true', 'false'):
+            assigned = params['asignado'] == 'true'
+            tickets = [t for t in tickets if bool(t.get('agenteAsignado')) == assigned]
+        return sorted(tickets, key=lambda t: t.get('createdAt') or '', reverse=True)
@@ -1,40 +1,142 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
 import os
+import queue
 import sys
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Optional
 
+ROOT_LOGGER_NAME = 'ia'
 
-def init_logger():
-    """Inicializa logger para ia-svc.
-    - Si BRANCH != 'main' imprime en stdout con prefijo de rama.
-    - Si BRANCH == 'main' escribe a archivo en LOG_DIR/app.log con permisos restrictivos.
-    """
+# Atributos propios de LogRecord; todo lo demás llegó por 'extra' y va al JSON
+_RESERVED_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _branch() -> str:
     branch = os.getenv('BRANCH') or os.getenv('GIT_BRANCH') or os.getenv('NODE_ENV') or 'dev'
-    normalized = branch.lower()
-    is_main = normalized in ('main', 'production', 'prod')
-
-    # Always log to stdout in container/production/development
-    # Docker captures stdout/stderr which is the standard way to log.
-    prefix = f'[{normalized}]'
-
-    def _print(*args, **kwargs):
-        sys.stdout.write(prefix + ' ' + ' '.join(map(str, args)) + '\n')
-
-    # Rebind print to include prefix
-    builtins = __import__('builtins')
-    builtins.print = _print
-    return
-
-    def file_print(*args, **kwargs):
-        try:
-            message = ' '.join(map(str, args))
-            line = f"{datetime.utcnow().isoformat()} {message}\n"
-            with open(log_file, 'a', encoding='utf-8') as f:
-                f.write(line)
-        except Exception as e:
-            sys.stderr.write(f"Logger write error: {e}\n")
-
-    builtins = __import__('builtins')
-    builtins.print = file_print
+    return branch.lower()
+
+
+class JsonFormatter(logging.Formatter):
+    """Un objeto JSON por línea: ts, level, logger, msg, branch y los campos de 'extra'"""
+
+    def __init__(self, branch: str):
+        super().__init__()
+        self.branch = branch
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'branch': self.branch,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Deja el mensaje ya interpolado y la traza como texto (los args y el traceback
+    no siempre se pueden pasar entre hilos), pero conserva los campos de 'extra'.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class TextFormatter(logging.Formatter):
+    """Formato legible para desarrollo: '[rama] LEVEL mensaje'"""
+
+    def __init__(self, branch: str):
+        super().__init__(f'[{branch}] %(levelname)s %(message)s')
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Logger del servicio bajo la jerarquía 'ia' (ej: 'services.agent_assigner' -> 'ia.agent_assigner').
+    Los mensajes usan formato perezoso: logger.debug('Agente %s', agent_id).
+    """
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{name.rsplit('.', 1)[-1]}")
+
+
+def init_logger(level: Optional[str] = None, fmt: Optional[str] = None, stream=None):
+    """
+    Inicializa el logging de ia-svc.
+
+    - Nivel: LOG_LEVEL (default INFO); se puede cambiar en caliente con set_level().
+    - Formato: LOG_FORMAT 'json' o 'text' (default: json en main/production, text en el resto).
+    - Los registros pasan por una cola (QueueHandler) y un hilo de fondo (QueueListener)
+      escribe a stdout, de modo que los hilos del consumidor y el event loop nunca
+      se bloquean escribiendo.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    branch = _branch()
+    is_main = branch in ('main', 'production', 'prod')
+    fmt = (fmt or os.getenv('LOG_FORMAT') or ('json' if is_main else 'text')).lower()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter(branch) if fmt == 'json' else TextFormatter(branch))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger(ROOT_LOGGER_NAME)
+    root.handlers = [_QueueHandler(log_queue)]
+    root.propagate = False
+    set_level(level or os.getenv('LOG_LEVEL', 'INFO'))
+
+    _listener = logging.handlers.QueueListener(log_queue, output)
+    _listener.start()
+    atexit.register(shutdown_logger)
+
+
+def shutdown_logger():
+    """Vaciar la cola y detener el hilo escritor"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def set_level(level: str, name: Optional[str] = None) -> str:
+    """
+    Cambiar el nivel en caliente (todo el servicio o un logger concreto).
+
+    Raises:
+        ValueError: si el nivel no existe
+    """
+    level = str(level).upper()
+    if not isinstance(logging.getLevelName(level), int):
+        raise ValueError(f'Nivel de log inválido: {level}')
+    target = get_logger(name) if name else logging.getLogger(ROOT_LOGGER_NAME)
+    target.setLevel(level)
+    return level
+
+
+def get_level(name: Optional[str] = None) -> str:
+    """Nivel efectivo actual"""
+    target = get_logger(name) if name else logging.getLogger(ROOT_LOGGER_NAME)
+    return logging.getLevelName(target.getEffectiveLevel())
 
 
 if __name__ == '__main__':
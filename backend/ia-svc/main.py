@@ -1,18 +1,37 @@
 # ia-svc/main.py
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 import uvicorn
 import os
 from dotenv import load_dotenv
 from pathlib import Path
-import httpx
 from datetime import datetime
 import threading
+import asyncio
+import socket
+import signal
+import json
+import time
 
-from services.ticket_classifier import TicketClassifier
+from services.ticket_classifier import TicketClassifier, CATALOG_UPDATED_ROUTING_KEY
 from services.agent_assigner import AgentAssigner
-from services.rabbitmq_client import RabbitMQClient
+from services.rabbitmq_client import RabbitMQClient, CONSUMER_MODE_ASYNCIO
+from services.event_publisher import EventPublisher
+from services.event_outbox import EventOutbox
+from services.upstream_client import UpstreamClient
+from services.workload_ledger import WorkloadLedger, TICKET_LIFECYCLE_ROUTING_KEYS
+from services.idempotency import IdempotencyCache, message_version
+from services.metrics import (
+    REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE, STAGE_LATENCY, TICKETS_PROCESSED,
+    CONSUMER_IN_FLIGHT, CONSUMER_BACKLOG
+)
+from services.tracing import TRACER, current_span, inject
+from services.resilience import UpstreamUnavailable, deadline
+from services.sharding import shard_path, shard_queue, shard_routing_key
+
+from logger import init_logger, get_logger, set_level, get_level
 
 from contextlib import asynccontextmanager
+from typing import Optional
 
 # ✅ Cargar variables de entorno
 ENV = os.getenv('NODE_ENV', 'development')
@@ -21,20 +40,11 @@ ENV = os.getenv('NODE_ENV', 'development')
 load_dotenv() # Carga .env por defecto
 load_dotenv(dotenv_path=Path(__file__).parent / '.env.local') # Sobrescribe con .env.local si existe
 
-print(f'[{ENV}] 🌍 Entorno detectado')
-
 # Inicializar logger lo antes posible
-try:
-    from .logger import init_logger
-except Exception:
-    # fallback relative import for when module executed as script
-    try:
-        from logger import init_logger
-    except Exception:
-        init_logger = None
+init_logger()
+logger = get_logger('main')
 
-if init_logger:
-    init_logger()
+logger.info('[%s] 🌍 Entorno detectado', ENV)
 
 # Configuración de servicios
 RABBITMQ_URL = os.getenv('RABBITMQ_URL', 'amqp://localhost:5672')
@@ -44,38 +54,129 @@ USUARIOS_SERVICE_URL = os.getenv('USUARIOS_SVC_URL', os.getenv('USUARIOS_SERVICE
 TICKETS_SERVICE_URL = os.getenv('TICKETS_SVC_URL', os.getenv('TICKETS_SERVICE_URL', 'http://tickets-svc:3002'))
 SERVICE_TOKEN = os.getenv('SERVICE_TOKEN','23022e6bdb08ad3631c48af69253c5528f42cbed36b024b2fc041c0cfb23723b')
 
+# Modo del proceso: 'all' = API + consumidor de 'ticket.creado'; 'api' = solo API
+# (los tickets los consumen los procesos de worker.py)
+IA_MODE = os.getenv('IA_MODE', 'all').lower()
+
+_background_tasks = []
+
+async def start_services(tickets_queue: str = 'ia_tickets', tickets_routing_key: str = 'ticket.creado',
+                         consume_tickets: bool = True, reconcile_loaded_only: bool = False,
+                         outbox_path: Optional[str] = None):
+    """
+    Arrancar pools, publicador, recarga del catálogo, libro mayor y consumidores.
+    
+    Args:
+        tickets_queue: Cola de la que se consumen los tickets nuevos
+        tickets_routing_key: Routing key vinculada a esa cola
+        consume_tickets: False en modo 'api' (solo atender HTTP)
+        reconcile_loaded_only: Reconciliar solo las empresas ya cargadas (procesos de un shard)
+        outbox_path: Outbox de este proceso (default: EVENT_OUTBOX_PATH); nunca se comparte entre procesos
+    """
+    # Pools HTTP compartidos hacia usuarios-svc y tickets-svc
+    await upstream_client.start()
+    
+    # Publicador dedicado con confirmaciones del broker, detrás del outbox durable
+    outbox_path = EVENT_OUTBOX_PATH if outbox_path is None else outbox_path
+    if outbox_path:
+        event_publisher.attach_outbox(EventOutbox(outbox_path))
+    event_publisher.start()
+    
+    # Recarga del catálogo de servicios en caliente (sin reiniciar)
+    ticket_classifier.start_watching()
+    
+    # Los mensajes se procesan en el event loop de la aplicación para reutilizar el pool HTTP
+    loop = asyncio.get_running_loop()
+    
+    def handle_new_ticket(message: dict):
+        asyncio.run_coroutine_threadsafe(process_new_ticket(message), loop).result()
+    
+    def start_consumer(client: RabbitMQClient, name: str, **consumer_args):
+        """Modo asyncio: consume en este mismo loop. Modo thread: hilo dedicado con BlockingConnection."""
+        if client.consumer_mode == CONSUMER_MODE_ASYNCIO:
+            client.start_consuming(**consumer_args)
+            return
+        
+        def run():
+            try:
+                client.start_consuming(**consumer_args)
+            except Exception as e:
+                logger.error('❌ Error en %s: %s', name, e)
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    # Consumidor de tickets nuevos
+    if consume_tickets:
+        start_consumer(
+            rabbitmq_client, 'consumidor RabbitMQ',
+            queue_name=tickets_queue,
+            routing_key=tickets_routing_key,
+            callback=process_new_ticket if rabbitmq_client.consumer_mode == CONSUMER_MODE_ASYNCIO else handle_new_ticket
+        )
+        logger.info('✅ Consumidor RabbitMQ iniciado (cola %s, modo %s)', tickets_queue, rabbitmq_client.consumer_mode)
+    else:
+        logger.info('🌐 Modo API: los tickets nuevos los consumen los workers')
+    
+    # Libro mayor de carga: bootstrap inmediato + reconciliación periódica
+    _background_tasks.append(asyncio.create_task(reconcile_workload_ledger(loaded_only=reconcile_loaded_only)))
+    
+    # Consumidor de eventos de dominio (cachés y libro mayor), cola propia de esta instancia
+    start_consumer(
+        events_rabbitmq_client, 'consumidor de eventos RabbitMQ',
+        queue_name=EVENTS_QUEUE_NAME,
+        routing_key=DOMAIN_EVENTS_ROUTING_KEYS,
+        callback=process_domain_event,
+        exclusive=True,
+        with_routing_key=True
+    )
+    logger.info('✅ Consumidor de eventos iniciado (%s)', ', '.join(DOMAIN_EVENTS_ROUTING_KEYS))
+
+async def stop_services():
+    """Detener tareas y consumidores y cerrar conexiones"""
+    logger.info('🛑 Cerrando servicio de IA...')
+    for task in _background_tasks:
+        task.cancel()
+    _background_tasks.clear()
+    ticket_classifier.stop_watching()
+    rabbitmq_client.close()
+    events_rabbitmq_client.close()
+    await asyncio.to_thread(event_publisher.close)
+    await upstream_client.close()
+    idempotency.close()
+    logger.info('✅ Conexiones cerradas')
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manejador de ciclo de vida (Sustituye a startup/shutdown)"""
-    print("\n" + "="*60)
-    print("🚀 INICIANDO SERVICIO DE IA")
-    print("="*60)
-    print(f"📡 RabbitMQ URL: {RABBITMQ_URL}")
-    print(f"👥 Usuarios Service: {USUARIOS_SERVICE_URL}")
-    print(f"🎫 Tickets Service: {TICKETS_SERVICE_URL}")
-    print(f"🔑 Service Token: {'Configurado' if SERVICE_TOKEN else '❌ NO CONFIGURADO'}")
-    print("="*60 + "\n")
-    
-    def start_consumer():
-        try:
-            rabbitmq_client.start_consuming(
-                queue_name='ia_tickets',
-                routing_key='ticket.creado',
-                callback=process_new_ticket
-            )
-        except Exception as e:
-            print(f"❌ Error en consumidor RabbitMQ: {e}")
+    logger.info('🚀 INICIANDO SERVICIO DE IA (modo %s)', IA_MODE)
+    logger.info('📡 RabbitMQ URL: %s', RABBITMQ_URL)
+    logger.info('👥 Usuarios Service: %s', USUARIOS_SERVICE_URL)
+    logger.info('🎫 Tickets Service: %s', TICKETS_SERVICE_URL)
+    logger.info('🔑 Service Token: %s', 'Configurado' if SERVICE_TOKEN else '❌ NO CONFIGURADO')
     
-    # Iniciar consumidor en un hilo separado
-    consumer_thread = threading.Thread(target=start_consumer, daemon=True)
-    consumer_thread.start()
-    print("✅ Consumidor RabbitMQ iniciado\n")
+    await start_services(consume_tickets=IA_MODE != 'api')
     
     yield # Aquí es donde la aplicación "corre"
     
-    print("\n🛑 Cerrando servicio de IA...")
-    rabbitmq_client.close()
-    print("✅ Conexiones cerradas\n")
+    await stop_services()
+
+async def run_worker(shard: int, shards: int):
+    """
+    Proceso consumidor de un shard (lo lanza worker.py): sin API HTTP, consume la cola
+    de su shard y solo mantiene calientes las empresas que le tocan.
+    """
+    logger.info('🚀 INICIANDO WORKER DE IA (shard %s/%s)', shard, shards)
+    await start_services(tickets_queue=shard_queue(shard), tickets_routing_key=shard_routing_key(shard),
+                         reconcile_loaded_only=True,
+                         outbox_path=shard_path(EVENT_OUTBOX_PATH, shard) if EVENT_OUTBOX_PATH else '')
+    
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+    await stop.wait()
+    
+    await stop_services()
 
 # Configuración de la aplicación
 app = FastAPI(
@@ -91,7 +192,7 @@ app = FastAPI(
 @app.middleware("http")
 async def verify_service_token(request, call_next):
     # Skip helatcheck and root
-    if request.url.path in ["/health", "/", "/docs", "/openapi.json"]:
+    if request.url.path in ["/health", "/metrics", "/", "/docs", "/openapi.json"]:
         return await call_next(request)
 
     # Check Headers
@@ -128,103 +229,213 @@ USUARIOS_SERVICE_URL = os.getenv('USUARIOS_SVC_URL', os.getenv('USUARIOS_SERVICE
 TICKETS_SERVICE_URL = os.getenv('TICKETS_SVC_URL', os.getenv('TICKETS_SERVICE_URL', 'http://tickets-svc:3002'))
 SERVICE_TOKEN = os.getenv('SERVICE_TOKEN','23022e6bdb08ad3631c48af69253c5528f42cbed36b024b2fc041c0cfb23723b')
 
-print(f"📡 RabbitMQ: {RABBITMQ_URL}")
-print(f"👥 Usuarios: {USUARIOS_SERVICE_URL}")
-print(f"🎫 Tickets: {TICKETS_SERVICE_URL}")
+logger.info('📡 RabbitMQ: %s', RABBITMQ_URL)
+logger.info('👥 Usuarios: %s', USUARIOS_SERVICE_URL)
+logger.info('🎫 Tickets: %s', TICKETS_SERVICE_URL)
 
 # Inicializar servicios
+upstream_client = UpstreamClient(SERVICE_TOKEN)
+upstream_client.register('usuarios', USUARIOS_SERVICE_URL)
+upstream_client.register('tickets', TICKETS_SERVICE_URL)
+
 ticket_classifier = TicketClassifier()
-agent_assigner = AgentAssigner(USUARIOS_SERVICE_URL, TICKETS_SERVICE_URL)
-rabbitmq_client = RabbitMQClient(RABBITMQ_URL)
+workload_ledger = WorkloadLedger()
+agent_assigner = AgentAssigner(USUARIOS_SERVICE_URL, TICKETS_SERVICE_URL, upstream=upstream_client, ledger=workload_ledger)
+
+# Tickets ya procesados: los 'ticket.creado' re-entregados o re-emitidos se descartan sin llamadas HTTP
+idempotency = IdempotencyCache.from_env()
+
+class TicketProcessingError(Exception):
+    """El ticket falló: el consumidor hace nack y el broker lo reentrega una vez (ver RabbitMQClient)"""
+
+# Presupuesto de tiempo de cada ticket (segundos): acota timeouts y reintentos de todas sus llamadas upstream
+TICKET_DEADLINE_SECONDS = float(os.getenv('TICKET_DEADLINE_SECONDS', 20))
+
+# Cada cuánto se reconcilia el libro mayor de carga contra tickets-svc (segundos)
+LEDGER_RECONCILE_SECONDS = float(os.getenv('WORKLOAD_LEDGER_RECONCILE_SECONDS', 600))
+
+# Outbox local durable de eventos por publicar; se abre al arrancar (EVENT_OUTBOX_PATH vacío =
+# cola en memoria del publicador, los eventos sin confirmar se pierden si el proceso se reinicia)
+EVENT_OUTBOX_PATH = os.getenv('EVENT_OUTBOX_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'event_outbox.db'))
+event_publisher = EventPublisher(RABBITMQ_URL)
+rabbitmq_client = RabbitMQClient(RABBITMQ_URL, publisher=event_publisher)
+
+# Conexión separada para eventos de dominio (cambios de usuarios, etc.).
+# Un solo mensaje en vuelo: los eventos de un mismo ticket se aplican en el orden de llegada
+events_rabbitmq_client = RabbitMQClient(RABBITMQ_URL, max_in_flight=1, workers=1, prefetch_count=1)
+EVENTS_QUEUE_NAME = f"ia_eventos.{socket.gethostname()}.{os.getpid()}"
+DOMAIN_EVENTS_ROUTING_KEYS = [
+    key.strip() for key in os.getenv('USUARIOS_EVENTS_ROUTING_KEYS', 'usuario.#').split(',') if key.strip()
+] + TICKET_LIFECYCLE_ROUTING_KEYS + [CATALOG_UPDATED_ROUTING_KEY]
+
+# Gauges leídos de los consumidores en cada scrape de /metrics
+for _name, _client in (('tickets', rabbitmq_client), ('eventos', events_rabbitmq_client)):
+    CONSUMER_IN_FLIGHT.set_function(lambda c=_client: c.in_flight, consumer=_name)
+    CONSUMER_BACKLOG.set_function(lambda c=_client: c.backlog, consumer=_name)
+
+def publish_event(routing_key: str, message: dict):
+    """
+    Publicar un evento midiendo la etapa 'publish' hasta la confirmación del broker
+    (o solo la llamada, si no hay publicador con confirmaciones).
+    """
+    started = time.perf_counter()
+    # El contexto de la traza del ticket viaja en los headers del evento
+    future = rabbitmq_client.publish(routing_key, message, headers=inject())
+    if future is None:
+        STAGE_LATENCY.observe(time.perf_counter() - started, stage='publish')
+    else:
+        future.add_done_callback(lambda _f: STAGE_LATENCY.observe(time.perf_counter() - started, stage='publish'))
+    return future
 
 async def update_ticket_classification(ticket_id: str, classification: dict):
     """Actualizar la clasificación del ticket en tickets-svc"""
-    async with httpx.AsyncClient(timeout=15.0) as client:
-        try:
-            response = await client.patch(
-                f"{TICKETS_SERVICE_URL}/tickets/{ticket_id}/clasificacion",
-                headers={
-                    'Authorization': f'Bearer {SERVICE_TOKEN}',
-                    'X-Service-Name': 'ia-svc',
-                    'Content-Type': 'application/json'
-                },
+    try:
+        with STAGE_LATENCY.time(stage='patch_classification'):
+            response = await upstream_client.patch(
+                'tickets', f"/tickets/{ticket_id}/clasificacion",
+                route='tickets.classify',
                 json=classification
             )
-            response.raise_for_status()
-            print(f"✅ Ticket {ticket_id} clasificado correctamente")
-            return response.json()
-        except Exception as e:
-            print(f"❌ Error actualizando clasificación del ticket {ticket_id}: {e}")
-            raise
+        response.raise_for_status()
+        logger.info('✅ Ticket %s clasificado correctamente', ticket_id)
+        return response.json()
+    except Exception as e:
+        logger.error('❌ Error actualizando clasificación del ticket %s: %s', ticket_id, e)
+        raise
 
 async def assign_ticket_to_agent(ticket_id: str, agent_id: str):
     """Asignar el ticket a un agente en tickets-svc"""
-    async with httpx.AsyncClient(timeout=15.0) as client:
-        try:
-            response = await client.put(
-                f"{TICKETS_SERVICE_URL}/tickets/{ticket_id}/asignar-ia",
-                headers={
-                    'Authorization': f'Bearer {SERVICE_TOKEN}',
-                    'X-Service-Name': 'ia-svc',
-                    'Content-Type': 'application/json'
-                },
+    try:
+        with STAGE_LATENCY.time(stage='put_assignment'):
+            response = await upstream_client.put(
+                'tickets', f"/tickets/{ticket_id}/asignar-ia",
+                route='tickets.assign',
                 json={'agenteId': agent_id}
             )
-            response.raise_for_status()
-            print(f"✅ Ticket {ticket_id} asignado a agente {agent_id}")
-            return response.json()
+        response.raise_for_status()
+        logger.info('✅ Ticket %s asignado a agente %s', ticket_id, agent_id)
+        return response.json()
+    except Exception as e:
+        logger.error('❌ Error asignando ticket %s a agente: %s', ticket_id, e)
+        raise
+
+def process_domain_event(routing_key: str, message: dict):
+    """Procesar eventos de dominio que afectan a las cachés del servicio"""
+    if routing_key.startswith('usuario.'):
+        # Un cambio de usuario (alta, baja, rol, grupos) invalida el roster de su empresa
+        usuario = message.get('usuario') or message
+        empresa_id = usuario.get('empresaId') or message.get('empresaId')
+        agent_assigner.invalidate_roster(empresa_id)
+    elif routing_key in TICKET_LIFECYCLE_ROUTING_KEYS:
+        # Mantener el libro mayor de carga de trabajo al día
+        workload_ledger.apply_event(routing_key, message)
+    elif routing_key == CATALOG_UPDATED_ROUTING_KEY:
+        # El evento puede traer el catálogo completo ('servicios') o solo avisar del cambio
+        ticket_classifier.reload_catalog(entries=message.get('servicios'), force=True)
+
+async def reconcile_workload_ledger(loaded_only: bool = False):
+    """
+    Bootstrap del libro mayor al arrancar y reconciliación periódica.
+    Con 'loaded_only' no hay bootstrap: se reconcilian solo las empresas ya cargadas.
+    """
+    while True:
+        try:
+            if loaded_only:
+                await agent_assigner.sync_workload_ledger(companies=workload_ledger.company_ids())
+            else:
+                await agent_assigner.sync_workload_ledger()
         except Exception as e:
-            print(f"❌ Error asignando ticket {ticket_id} a agente: {e}")
-            raise
+            logger.warning('⚠️ No se pudo sincronizar el libro mayor de carga: %s', e)
+        await asyncio.sleep(LEDGER_RECONCILE_SECONDS)
 
 async def process_new_ticket(message: dict):
-    """Procesar un nuevo ticket"""
+    """
+    Procesar un nuevo ticket dentro de su propia traza (span raíz por ticket).
+    Los duplicados (mismo ticket, misma versión o anterior) se descartan antes de cualquier llamada HTTP.
+    Si el ticket falla se libera su reserva y se lanza TicketProcessingError, para que el
+    consumidor haga nack y la reentrega sí se procese.
+    """
+    ticket_id = (message.get('ticket') or {}).get('id')
+    if ticket_id and not idempotency.claim(ticket_id, message_version(message)):
+        TICKETS_PROCESSED.inc(outcome='duplicate')
+        logger.info('♻️ Ticket %s ya procesado, mensaje duplicado descartado', ticket_id,
+                    extra={'ticket_id': ticket_id})
+        return
+    
+    outcome = None
+    try:
+        with TRACER.start_trace('ticket.creado', ticket_id=ticket_id), deadline(TICKET_DEADLINE_SECONDS):
+            outcome = await _process_new_ticket(message)
+    finally:
+        if ticket_id:
+            if outcome in ('processed', 'suggestion_fallback'):
+                idempotency.complete(ticket_id, outcome)
+            else:
+                idempotency.release(ticket_id)
+    if ticket_id and outcome == 'error':
+        raise TicketProcessingError(f'Ticket {ticket_id} no procesado')
+
+async def _process_new_ticket(message: dict):
+    """Procesar un nuevo ticket. Devuelve el resultado ('processed', 'suggestion_fallback' o 'error')"""
+    started = time.perf_counter()
     try:
-        print("\n" + "="*60)
-        print("🎫 NUEVO TICKET RECIBIDO")
-        print("="*60)
-        
         # 1. Extraer datos del ticket
         ticket_data = message.get('ticket', {})
         ticket_id = ticket_data.get('id')
         
         if not ticket_id:
-            print("❌ Error: Mensaje sin ID de ticket")
+            logger.error('❌ Error: Mensaje sin ID de ticket')
             return
         
-        print(f"📋 Ticket ID: {ticket_id}")
-        print(f"📝 Título: {ticket_data.get('titulo', 'N/A')}")
-        print(f"🏢 Empresa ID: {ticket_data.get('empresaId', 'N/A')}")
-        print(f"🔧 Servicio: {ticket_data.get('servicioNombre', 'N/A')}")
-        print(f"🔧 Grupos Recibidos: {ticket_data.get('gruposDeAtencion', 'NO RECIBIDO')}")
+        logger.info('🎫 NUEVO TICKET RECIBIDO: %s', ticket_id, extra={
+            'ticket_id': ticket_id,
+            'empresa_id': ticket_data.get('empresaId'),
+            'servicio': ticket_data.get('servicioNombre'),
+            'grupos_recibidos': ticket_data.get('gruposDeAtencion')
+        })
+        logger.debug('📝 Título: %s', ticket_data.get('titulo', 'N/A'))
         
         # 2. Clasificar ticket
-        print("\n🔍 CLASIFICANDO TICKET...")
-        classification = ticket_classifier.classify_ticket(ticket_data)
+        with STAGE_LATENCY.time(stage='classify'), TRACER.span('classify_ticket'):
+            classification = ticket_classifier.classify_ticket(ticket_data)
         
-        print(f"   Tipo: {classification.get('tipo')}")
-        print(f"   Prioridad: {classification.get('prioridad')}")
-        print(f"   Categoría: {classification.get('categoria')}")
-        print(f"   Grupo de Atención: {classification.get('grupo_atencion')}")
-        print(f"   SLA Resolución: {classification.get('tiempoResolucion')} min")
+        logger.info('🔍 Ticket %s clasificado: %s / %s (grupo %s, SLA %s min)',
+                    ticket_id, classification.get('tipo'), classification.get('prioridad'),
+                    classification.get('grupo_atencion'), classification.get('tiempoResolucion'),
+                    extra={'ticket_id': ticket_id, 'clasificacion': dict(classification)})
         
         # 3. Actualizar ticket con clasificación
         try:
             await update_ticket_classification(ticket_id, classification)
         except Exception as e:
-            print(f"⚠️ No se pudo actualizar clasificación, continuando con asignación...")
+            logger.warning('⚠️ No se pudo actualizar clasificación, continuando con asignación...')
         
         # 4. Actualizar ticket_data para asignación
         ticket_data.update(classification)
         
         # Si el ticket ya tiene gruposDeAtencion del servicio, usarlo en lugar del default
         if ticket_data.get('gruposDeAtencion'):
-            print(f"   ✅ Usando grupo del servicio: {ticket_data.get('gruposDeAtencion')}")
+            logger.info('✅ Usando grupo del servicio: %s', ticket_data.get('gruposDeAtencion'))
             ticket_data['grupo_atencion'] = ticket_data.get('gruposDeAtencion')
         
         # 5. Asignar agente
-        print("\n👥 ASIGNANDO AGENTE...")
-        best_agent = await agent_assigner.assign_ticket(ticket_data)
+        try:
+            best_agent = await agent_assigner.assign_ticket(ticket_data)
+        except UpstreamUnavailable as e:
+            # Upstream caído (circuito abierto o sin presupuesto): directo a la sugerencia, sin agente
+            logger.warning('⚠️ No se pudo evaluar agentes para %s (%s), publicando sugerencia sin agente...', ticket_id, e)
+            TICKETS_PROCESSED.inc(outcome='suggestion_fallback')
+            publish_event(
+                'ticket.sugerencia_asignacion',
+                {
+                    'ticketId': ticket_id,
+                    'agenteIdSugerido': None,
+                    'agenteNombre': None,
+                    'clasificacion': classification,
+                    'motivo': str(e)
+                }
+            )
+            return 'suggestion_fallback'
         
         agent_id = best_agent.get('_id') or best_agent.get('id')
         agent_name = best_agent.get('nombre', 'Desconocido')
@@ -232,10 +443,20 @@ async def process_new_ticket(message: dict):
         # 6. Actualizar ticket con asignación
         try:
             await assign_ticket_to_agent(ticket_id, agent_id)
+            # Reflejar la asignación en el libro mayor sin esperar el evento de tickets-svc
+            workload_ledger.apply_event('ticket.asignado_automaticamente', {
+                'ticket': {
+                    'id': ticket_id,
+                    'empresaId': ticket_data.get('empresaId'),
+                    'agenteId': agent_id,
+                    'prioridad': classification.get('prioridad')
+                }
+            })
         except Exception as e:
-            print(f"⚠️ No se pudo asignar automáticamente, publicando evento...")
+            logger.warning('⚠️ No se pudo asignar automáticamente, publicando evento...')
             # Si falla la asignación directa, publicar evento para que admin lo asigne
-            rabbitmq_client.publish(
+            TICKETS_PROCESSED.inc(outcome='suggestion_fallback')
+            publish_event(
                 'ticket.sugerencia_asignacion',
                 {
                     'ticketId': ticket_id,
@@ -244,10 +465,10 @@ async def process_new_ticket(message: dict):
                     'clasificacion': classification
                 }
             )
-            return
+            return 'suggestion_fallback'
         
         # 7. Publicar evento de éxito
-        rabbitmq_client.publish(
+        publish_event(
             'ticket.procesado',
             {
                 'ticketId': ticket_id,
@@ -258,27 +479,36 @@ async def process_new_ticket(message: dict):
             }
         )
         
-        print("\n" + "="*60)
-        print(f"✅ TICKET {ticket_id} PROCESADO EXITOSAMENTE")
-        print(f"👤 Asignado a: {agent_name}")
-        print("="*60 + "\n")
+        logger.info('✅ TICKET %s PROCESADO EXITOSAMENTE, asignado a %s', ticket_id, agent_name,
+                    extra={'ticket_id': ticket_id, 'agente_id': agent_id})
+        TICKETS_PROCESSED.inc(outcome='processed')
+        return 'processed'
         
     except Exception as e:
-        print(f"\n❌ ERROR PROCESANDO TICKET: {e}")
-        print("="*60 + "\n")
+        TICKETS_PROCESSED.inc(outcome='error')
+        span = current_span()
+        if span is not None:
+            span.status = 'error'
+            span.error = str(e)
+        logger.error('❌ ERROR PROCESANDO TICKET: %s', e, extra={'ticket_id': message.get('ticket', {}).get('id')})
         
-        # Publicar evento de error
-        try:
-            rabbitmq_client.publish(
-                'ticket.error',
-                {
-                    'ticketId': ticket_data.get('id'),
-                    'error': str(e),
-                    'timestamp': datetime.now().isoformat()
-                }
-            )
-        except:
-            pass
+        # Publicar evento de error (una sola vez por ticket: el reintento tras el nack no lo repite)
+        failed_id = ticket_data.get('id')
+        if not failed_id or idempotency.first_error(failed_id, message_version(message)):
+            try:
+                publish_event(
+                    'ticket.error',
+                    {
+                        'ticketId': failed_id,
+                        'error': str(e),
+                        'timestamp': datetime.now().isoformat()
+                    }
+                )
+            except:
+                pass
+        return 'error'
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - started, stage='total')
 
 
 
@@ -291,10 +521,30 @@ async def root():
         "status": "running"
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Métricas en formato Prometheus (latencia por etapa, resultados, upstreams, consumidores)"""
+    return Response(content=REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/debug/traces")
+async def list_traces(ticket_id: str = None, min_duration_ms: float = 0.0, limit: int = 20):
+    """Trazas recientes (filtrables por ticket o por duración mínima para encontrar tickets lentos)"""
+    buffer = TRACER.buffer
+    traces = buffer.traces(limit=limit, ticket_id=ticket_id, min_duration_ms=min_duration_ms) if buffer else []
+    return {"enabled": TRACER.enabled, "count": len(traces), "traces": traces}
+
+@app.get("/debug/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """Todos los spans de una traza, ordenados por inicio"""
+    spans = TRACER.buffer.get_trace(trace_id) if TRACER.buffer else None
+    if spans is None:
+        raise HTTPException(status_code=404, detail=f"Traza no encontrada: {trace_id}")
+    return {"traceId": trace_id, "spans": sorted(spans, key=lambda s: s['start'])}
+
 @app.get("/health")
 async def health_check():
     """Endpoint de verificación de salud del servicio"""
-    rabbitmq_status = "connected" if rabbitmq_client.connection and not rabbitmq_client.connection.is_closed else "disconnected"
+    rabbitmq_status = "connected" if rabbitmq_client.is_connected() else "disconnected"
     
     return {
         "status": "healthy",
@@ -302,7 +552,23 @@ async def health_check():
         "services": {
             "classifier": "ready",
             "assigner": "ready",
-            "rabbitmq": rabbitmq_status
+            "rabbitmq": rabbitmq_status,
+            "rabbitmq_consumer": {
+                "mode": rabbitmq_client.consumer_mode,
+                "ack_mode": rabbitmq_client.ack_mode,
+                "workers": rabbitmq_client.workers,
+                "prefetch": rabbitmq_client.prefetch_count,
+                "in_flight": rabbitmq_client.in_flight,
+                "max_in_flight": rabbitmq_client.max_in_flight
+            },
+            "rabbitmq_publisher": event_publisher.stats(),
+            "upstreams": upstream_client.stats()
+        },
+        "catalog": ticket_classifier.catalog_stats(),
+        "caches": {
+            "roster": agent_assigner.roster_cache.stats(),
+            "workload_ledger": workload_ledger.stats(),
+            "idempotency": idempotency.stats()
         },
         "config": {
             "rabbitmq_url": RABBITMQ_URL,
@@ -323,6 +589,41 @@ async def classify_ticket_endpoint(ticket_data: dict):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def read_ticket_batch(request: Request) -> list:
+    """
+    Leer un lote de tickets del cuerpo de la petición.
+    Acepta un arreglo JSON, un objeto {"tickets": [...]} o NDJSON (un ticket por línea).
+    """
+    body = await request.body()
+    content_type = request.headers.get('content-type', '')
+    try:
+        if 'ndjson' in content_type or 'jsonlines' in content_type:
+            tickets = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            tickets = json.loads(body or b'[]')
+            if isinstance(tickets, dict):
+                tickets = tickets.get('tickets', [])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Cuerpo inválido: {e}")
+    
+    if not isinstance(tickets, list) or not all(isinstance(t, dict) for t in tickets):
+        raise HTTPException(status_code=400, detail="Se esperaba una lista de tickets")
+    return tickets
+
+@app.post("/classify/batch")
+async def classify_batch_endpoint(request: Request):
+    """Endpoint para clasificar muchos tickets en una sola petición (JSON o NDJSON)"""
+    tickets = await read_ticket_batch(request)
+    try:
+        classifications = ticket_classifier.classify_batch(tickets)
+        return {
+            "success": True,
+            "count": len(classifications),
+            "classifications": classifications
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/assign")
 async def assign_ticket_endpoint(ticket_data: dict):
     """Endpoint manual para asignar un ticket"""
@@ -333,16 +634,47 @@ async def assign_ticket_endpoint(ticket_data: dict):
             "agent": {
                 "id": best_agent.get('_id') or best_agent.get('id'),
                 "nombre": best_agent.get('nombre'),
-                "cargaActual": best_agent.get('cargaActual')
+                "cargaActual": best_agent['metrics']['active_count']
             }
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/assign/batch")
+async def assign_batch_endpoint(request: Request):
+    """Endpoint para asignar muchos tickets repartiendo la carga entre los agentes (JSON o NDJSON)"""
+    tickets = await read_ticket_batch(request)
+    try:
+        decisions = await agent_assigner.assign_batch(tickets)
+        return {
+            "success": True,
+            "count": len(decisions),
+            "assigned": sum(1 for d in decisions if d['success']),
+            "decisions": decisions
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/admin/log-level")
+async def get_log_level(logger_name: str = None):
+    """Nivel de log efectivo (de todo el servicio o de un logger: ?logger_name=agent_assigner)"""
+    return {"logger": logger_name or "ia", "level": get_level(logger_name)}
+
+@app.put("/admin/log-level")
+async def set_log_level(body: dict):
+    """Cambiar el nivel de log en caliente: {"level": "DEBUG", "logger": "agent_assigner"?}"""
+    try:
+        level = set_level(body.get('level'), body.get('logger'))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.warning('🔧 Nivel de log de %s cambiado a %s', body.get('logger') or 'ia', level)
+    return {"logger": body.get('logger') or "ia", "level": level}
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app", 
         host="0.0.0.0", 
         port=int(os.getenv('IA_PORT', 3005)), 
-        reload=True
+        # Recarga automática solo en desarrollo (vigila archivos y corre un proceso extra)
+        reload=ENV == 'development'
     )
\ No newline at end of file
@@ -1,178 +1,269 @@
 # ia-svc/services/agent_assigner.py
-import httpx
-from typing import List, Dict
-from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Sequence, Tuple
+import asyncio
+import heapq
 import os
+import time
+
+from logger import get_logger
+from services.metrics import STAGE_LATENCY
+from services.tracing import TRACER
+from services.upstream_client import UpstreamClient
+from services.resilience import UpstreamUnavailable
+from services.roster_cache import RosterCache
+from services.ticket_fetcher import TicketFetcher
+from services.workload_ledger import WorkloadLedger
+from services.records import AgentRecord, TicketRecord
+from services.ticket_snapshot import TicketSnapshot, ACTIVE_STATES, VELOCITY_DAYS, priority_weight
+
+logger = get_logger(__name__)
+
+# Roles válidos para asignación de tickets
+VALID_ROLES = ('soporte', 'Soporte', 'resolutor-empresa', 'beca-soporte', 'admin-interno')
 
 class AgentAssigner:
-    def __init__(self, usuarios_service_url: str, tickets_service_url: str):
+    def __init__(self, usuarios_service_url: str, tickets_service_url: str,
+                 upstream: Optional[UpstreamClient] = None,
+                 roster_cache: Optional[RosterCache] = None,
+                 ledger: Optional[WorkloadLedger] = None):
         self.usuarios_service_url = usuarios_service_url
         self.tickets_service_url = tickets_service_url
         self.service_token = os.getenv('SERVICE_TOKEN', '23022e6bdb08ad3631c48af69253c5528f42cbed36b024b2fc041c0cfb23723b')
         
-    def _get_headers(self):
-        """Headers para autenticación entre servicios"""
-        return {
-            'Authorization': f'Bearer {self.service_token}',
-            'X-Service-Name': 'ia-svc',
-            'Content-Type': 'application/json'
-        }
+        # Cliente HTTP compartido (pool de conexiones). Si no se inyecta, se crea uno propio.
+        if upstream is None:
+            upstream = UpstreamClient(self.service_token)
+            upstream.register('usuarios', usuarios_service_url)
+            upstream.register('tickets', tickets_service_url)
+        self.upstream = upstream
         
-    async def get_available_agents(self, grupo_atencion: str, empresa_id: str) -> List[Dict]:
+        # Descarga paginada y concurrente de tickets (TICKETS_PAGE_SIZE, TICKETS_FETCH_CONCURRENCY)
+        self.fetcher = TicketFetcher(upstream)
+        
+        # Caché de roster por empresa (TTL + tamaño máximo)
+        if roster_cache is None:
+            roster_cache = RosterCache(
+                ttl_seconds=float(os.getenv('ROSTER_CACHE_TTL', 300)),
+                max_entries=int(os.getenv('ROSTER_CACHE_MAX_EMPRESAS', 1000))
+            )
+        self.roster_cache = roster_cache
+        
+        # Libro mayor de carga de trabajo alimentado por eventos (opcional)
+        self.ledger = ledger
+        
+    async def get_available_agents(self, grupo_atencion: str, empresa_id: str) -> List[AgentRecord]:
         """
         Obtener agentes disponibles del grupo de atención específico
         
+        El roster de la empresa se sirve desde caché mientras esté vigente;
+        solo se consulta usuarios-svc cuando expira o se invalida.
+        
         Args:
             grupo_atencion: Grupo técnico (ej: "Mesa de Servicio")
             empresa_id: ID de la empresa
         """
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            try:
-                # Buscar usuarios activos de la empresa (sin filtrar por rol aquí)
-                response = await client.get(
-                    f"{self.usuarios_service_url}/usuarios",
-                    headers=self._get_headers(),
-                    params={
-                        "empresaId": empresa_id,
-                        "activo": "true"
-                    }
-                )
-                
-                data = response.json()
-                # Manejar diferentes formatos de respuesta: {data: [...]}, {usuarios: [...]}, o [...]
-                if isinstance(data, dict):
-                    all_agents = data.get('data') or data.get('usuarios') or data
-                    # Si sigue siendo un dict (y no una lista dentro), es probable que sea el error
-                    if isinstance(all_agents, dict):
-                        print(f"⚠️ Formato de respuesta inesperado de usuarios-svc: {all_agents.keys()}")
-                        all_agents = []
-                else:
-                    all_agents = data
-                
-                # Roles válidos para asignación de tickets
-                valid_roles = ['soporte', 'Soporte', 'resolutor-empresa', 'beca-soporte', 'admin-interno']
-                
-                # Filtrar por rol válido Y grupo de atención
-                filtered_agents = [
-                    agent for agent in all_agents
-                    if agent.get('rol') in valid_roles and 
-                       grupo_atencion in agent.get('gruposDeAtencion', [])
-                ]
-                
-                print(f"✅ Obtenidos {len(filtered_agents)}/{len(all_agents)} agentes del grupo '{grupo_atencion}' para empresa {empresa_id}")
-                return filtered_agents
-                
-            except Exception as e:
-                print(f"❌ Error al obtener agentes: {e}")
-                raise Exception(f"Error al obtener agentes: {e}")
-            
-    async def get_agent_tickets(self, agent_id: str, empresa_id: str, states: List[str] = None) -> List[Dict]:
-        """
-        Obtener tickets de un agente
+        roster = self.roster_cache.get(empresa_id)
+        if roster is None:
+            roster = await self._fetch_roster(empresa_id)
+            self.roster_cache.set(empresa_id, roster)
         
-        Args:
-            agent_id: ID del agente
-            empresa_id: ID de la empresa
-            states: Lista de estados a filtrar (default: activos)
-        """
-        if states is None:
-            states = ['abierto', 'en_proceso', 'en_espera']
-            
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            try:
-                # Obtener TODOS los tickets de la empresa con límite alto
-                # El endpoint normal filtra por rol, necesitamos usar el service token
-                response = await client.get(
-                    f"{self.tickets_service_url}/tickets",
-                    headers=self._get_headers(),
-                    params={
-                        "empresaId": empresa_id,
-                        "limite": "1000"  # Límite alto para obtener todos
-                    }
-                )
-                response.raise_for_status()
-                
-                data = response.json()
-                all_tickets = data.get('data', [])
-                
-                print(f"   [DEBUG] Total tickets empresa: {len(all_tickets)}")
-                print(f"   [DEBUG] Buscando agente ID: {agent_id}")
-                
-                # Filtrar por agente asignado Y estados localmente
-                filtered_tickets = []
-                for t in all_tickets:
-                    agente_asignado = t.get('agenteAsignado')
-                    
-                    # Log detallado de cada ticket para debug
-                    if agente_asignado:
-                        agente_id_ticket = agente_asignado if isinstance(agente_asignado, str) else agente_asignado.get('_id')
-                        print(f"   [DEBUG] Ticket {t.get('_id', 'NO_ID')[:8]}: agente={agente_id_ticket[:8] if agente_id_ticket else 'None'}, estado={t.get('estado')}")
-                        
-                        if (agente_asignado == agent_id or 
-                            (isinstance(agente_asignado, dict) and agente_asignado.get('_id') == agent_id)):
-                            if t.get('estado') in states:
-                                filtered_tickets.append(t)
-                                print(f"   [DEBUG] ✅ MATCH - Ticket incluido")
-                
-                print(f"   [DEBUG] Agente {agent_id[:8]}: {len(filtered_tickets)} tickets activos de {len(all_tickets)} totales")
-                
-                return filtered_tickets
-                
-            except Exception as e:
-                print(f"⚠️ Error al obtener tickets para agente {agent_id}: {e}")
-                return []
-    
-    def calculate_ticket_age_days(self, ticket: Dict) -> float:
-        """Calcula la edad del ticket en días desde su asignación"""
-        fecha_asignacion = ticket.get('fechaAsignacion')
-        if not fecha_asignacion:
-            # Fallback a createdAt si no hay fechaAsignacion
-            fecha_asignacion = ticket.get('createdAt')
+        # Los registros del roster no se modifican: se comparten sin copiar
+        filtered_agents = list(roster.get(grupo_atencion, []))
         
-        if not fecha_asignacion:
-            return 0.0
+        logger.debug("✅ Obtenidos %s agentes del grupo '%s' para empresa %s", len(filtered_agents), grupo_atencion, empresa_id)
+        return filtered_agents
+    
+    async def _fetch_roster(self, empresa_id: str) -> Dict[str, List[AgentRecord]]:
+        """
+        Descargar los usuarios activos de la empresa e indexarlos por grupo de atención
         
+        Returns:
+            { "Grupo de atención": [AgentRecord de los agentes con rol válido] }
+        """
         try:
-            # Parsear fecha (puede venir como string ISO o Date)
-            if isinstance(fecha_asignacion, str):
-                fecha = datetime.fromisoformat(fecha_asignacion.replace('Z', '+00:00'))
+            # Buscar usuarios activos de la empresa (sin filtrar por rol aquí)
+            response = await self.upstream.get(
+                'usuarios', '/usuarios',
+                route='usuarios.list',
+                params={
+                    "empresaId": empresa_id,
+                    "activo": "true"
+                }
+            )
+            
+            data = response.json()
+            # Manejar diferentes formatos de respuesta: {data: [...]}, {usuarios: [...]}, o [...]
+            if isinstance(data, dict):
+                all_agents = data.get('data') or data.get('usuarios') or data
+                # Si sigue siendo un dict (y no una lista dentro), es probable que sea el error
+                if isinstance(all_agents, dict):
+                    logger.warning('⚠️ Formato de respuesta inesperado de usuarios-svc: %s', all_agents.keys())
+                    all_agents = []
             else:
-                fecha = fecha_asignacion
+                all_agents = data
+            
+            # Filtrar por rol válido e indexar por grupo de atención
+            roster: Dict[str, List[AgentRecord]] = {}
+            for agent in all_agents:
+                if agent.get('rol') not in VALID_ROLES:
+                    continue
+                record = AgentRecord.from_json(agent)
+                for grupo in record.grupos:
+                    roster.setdefault(grupo, []).append(record)
             
-            delta = datetime.now() - fecha.replace(tzinfo=None)
-            return delta.total_seconds() / 86400  # Convertir a días
-        except:
-            return 0.0
+            logger.info('👥 Roster empresa %s: %s usuarios activos, %s grupos', empresa_id, len(all_agents), len(roster))
+            return roster
+            
+        except UpstreamUnavailable as e:
+            # Circuito abierto o sin presupuesto: se propaga tal cual para el fallback de main
+            logger.warning('⚠️ usuarios-svc no disponible: %s', e)
+            raise
+        except Exception as e:
+            logger.error('❌ Error al obtener agentes: %s', e)
+            raise Exception(f"Error al obtener agentes: {e}")
     
-    def is_ticket_stagnant(self, ticket: Dict, hours_threshold: int = 48) -> bool:
+    def invalidate_roster(self, empresa_id: Optional[str] = None):
+        """
+        Invalidar el roster en caché (por cambios de usuarios)
+        
+        Args:
+            empresa_id: ID de la empresa (None = todas)
         """
-        Determina si un ticket está estancado (sin actualización en X horas)
+        self.roster_cache.invalidate(empresa_id)
+        logger.info('♻️ Roster invalidado: %s', empresa_id or 'todas las empresas')
+        
+    async def fetch_company_tickets(self, empresa_id: Optional[str] = None) -> List[Dict]:
+        """
+        Descargar los tickets que usan las métricas de una empresa (o de todas si empresa_id es None):
+        todos los activos y los cerrados con agente dentro de la ventana de RECENT_DAYS días.
+        Las páginas se piden en paralelo (ver TicketFetcher).
         
         Args:
-            ticket: Diccionario del ticket
-            hours_threshold: Horas sin actualización para considerar estancado
+            empresa_id: ID de la empresa (None = todas las empresas, para el bootstrap del libro mayor)
+        """
+        return await self.fetcher.collect(self.fetcher.scoring_tickets(empresa_id))
+    
+    async def get_company_snapshot(self, empresa_id: str, agent_id: Optional[str] = None) -> TicketSnapshot:
         """
-        updated_at = ticket.get('updatedAt')
-        if not updated_at:
-            return False
+        Descarga UNA vez los tickets de la empresa y los indexa por agente asignado.
         
+        Args:
+            empresa_id: ID de la empresa
+            agent_id: Solo los tickets de este agente (métricas de un agente suelto)
+        """
         try:
-            if isinstance(updated_at, str):
-                fecha = datetime.fromisoformat(updated_at.replace('Z', '+00:00'))
+            if agent_id is None:
+                tickets = await self.fetch_company_tickets(empresa_id)
             else:
-                fecha = updated_at
+                tickets = await self.fetcher.collect(self.fetcher.scoring_tickets(empresa_id, agente_id=agent_id))
+            snapshot = TicketSnapshot(empresa_id, tickets)
             
-            delta = datetime.now() - fecha.replace(tzinfo=None)
-            hours_since_update = delta.total_seconds() / 3600
+            logger.debug('📸 Snapshot empresa %s: %s tickets, %s agentes con carga', empresa_id, len(snapshot), len(snapshot.agent_ids))
+            return snapshot
             
-            return hours_since_update > hours_threshold
-        except:
-            return False
+        except UpstreamUnavailable as e:
+            # Circuito abierto o sin presupuesto: sin carga no se puede puntuar, fallback de main
+            logger.warning('⚠️ tickets-svc no disponible: %s', e)
+            raise
+        except Exception as e:
+            logger.warning('⚠️ Error al obtener tickets de la empresa %s: %s', empresa_id, e)
+            return TicketSnapshot(empresa_id, [])
+    
+    async def get_workload_view(self, empresa_id: str):
+        """
+        Vista de carga de trabajo de la empresa para calcular métricas.
+        
+        Usa el libro mayor en memoria si la empresa ya está cargada; si no, descarga
+        la fotografía una vez y la usa para inicializar la empresa en el libro mayor.
+        """
+        if self.ledger is None:
+            return await self.get_company_snapshot(empresa_id)
+        
+        workload = self.ledger.company(empresa_id)
+        if workload is not None:
+            return workload
+        
+        with self.ledger.reloading() as since:
+            try:
+                tickets = await self.fetch_company_tickets(empresa_id)
+            except UpstreamUnavailable as e:
+                logger.warning('⚠️ tickets-svc no disponible: %s', e)
+                raise
+            except Exception as e:
+                logger.warning('⚠️ Error al obtener tickets de la empresa %s: %s', empresa_id, e)
+                return TicketSnapshot(empresa_id, [])
             
-    async def calculate_agent_metrics(self, agent_id: str, empresa_id: str) -> Dict:
+            workload = self.ledger.load_company(empresa_id, tickets, since=since)
+        logger.info('📒 Libro mayor: empresa %s cargada (%s tickets)', empresa_id, len(tickets))
+        return workload
+    
+    async def sync_workload_ledger(self, companies: Optional[Sequence[str]] = None) -> int:
+        """
+        Cargar (bootstrap) o reconciliar el libro mayor con todos los tickets de tickets-svc.
+        
+        Args:
+            companies: Reconciliar solo estas empresas (procesos de un shard); None = todas
+        
+        Returns:
+            Número de empresas cargadas
+        """
+        if self.ledger is None:
+            return 0
+        # Los eventos que lleguen durante la descarga se vuelven a aplicar sobre la fotografía
+        if companies is not None:
+            with self.ledger.reloading() as since:
+                snapshots = await asyncio.gather(*(self.fetch_company_tickets(empresa_id) for empresa_id in companies))
+                loaded = self.ledger.load_companies(dict(zip(companies, snapshots)), since=since)
+            logger.info('📒 Libro mayor sincronizado: %s empresas, %s tickets',
+                        loaded, sum(len(tickets) for tickets in snapshots))
+            return loaded
+        with self.ledger.reloading() as since:
+            tickets = await self.fetch_company_tickets()
+            companies = self.ledger.load_all(tickets, since=since)
+        logger.info('📒 Libro mayor sincronizado: %s empresas, %s tickets', companies, len(tickets))
+        return companies
+        
+    async def get_agent_tickets(self, agent_id: str, empresa_id: str, states: List[str] = None,
+                                snapshot: Optional[TicketSnapshot] = None) -> List[TicketRecord]:
+        """
+        Obtener tickets de un agente
+        
+        Args:
+            agent_id: ID del agente
+            empresa_id: ID de la empresa
+            states: Lista de estados a filtrar (default: activos)
+            snapshot: Fotografía ya descargada de la empresa (evita otra llamada a tickets-svc)
+        """
+        if states is None:
+            states = ACTIVE_STATES
+        if snapshot is not None:
+            return snapshot.tickets_for(agent_id, states)
+        # Sin fotografía: solo los tickets del agente, filtrados en tickets-svc
+        tickets = await self.fetcher.collect(self.fetcher.iter_tickets(empresa_id, states=states, agente_id=agent_id))
+        return TicketRecord.from_json_batch(tickets)
+    
+    def calculate_group_metrics(self, agent_ids: Sequence[str], snapshot) -> Dict[str, Dict]:
+        """
+        Métricas completas (incluyendo anti-gaming) de varios agentes a la vez.
+        
+        Las fechas de la empresa ya están en columnas; los totales de todos los
+        agentes salen de una sola pasada vectorizada sobre la fotografía o el libro mayor.
+        
+        Args:
+            agent_ids: IDs de los agentes a evaluar
+            snapshot: TicketSnapshot o CompanyWorkload de la empresa
+        """
+        totals = snapshot.agent_totals(agent_ids)
+        return {agent_id: self._metrics_from_totals(totals[agent_id]) for agent_id in agent_ids}
+    
+    async def calculate_agent_metrics(self, agent_id: str, empresa_id: str,
+                                      snapshot: Optional[TicketSnapshot] = None) -> Dict:
         """
         Calcula métricas completas del agente incluyendo anti-gaming
         
+        Si se recibe 'snapshot' las métricas salen de esa fotografía compartida;
+        si no, se descarga una sola vez para este agente.
+        
         Returns:
             {
                 "active_count": int,
@@ -184,105 +275,42 @@ class AgentAssigner:
                 "gaming_penalty": float
             }
         """
-        # Obtener tickets activos
-        active_tickets = await self.get_agent_tickets(agent_id, empresa_id)
-        
-        # Obtener tickets históricos (últimos 30 días para eficiencia)
-        now = datetime.now()
-        thirty_days_ago = now - timedelta(days=30)
-        seven_days_ago = now - timedelta(days=7)
-        
-        # Obtener todos los tickets del agente (activos + cerrados recientes)
-        all_states = ['abierto', 'en_proceso', 'en_espera', 'resuelto', 'cerrado']
-        all_tickets = await self.get_agent_tickets(agent_id, empresa_id, all_states)
-        
-        # Filtrar tickets de últimos 30 días
-        recent_tickets = [
-            t for t in all_tickets
-            if self._is_ticket_recent(t, thirty_days_ago)
-        ]
-        
-        # Calcular métricas básicas
-        active_count = len(active_tickets)
-        
-        # Peso ponderado por prioridad
-        priority_weights = {
-            'critica': 3,
-            'crítica': 3,
-            'alta': 2,
-            'media': 1,
-            'baja': 0.5
-        }
-        
-        active_weighted = sum(
-            priority_weights.get(t.get('prioridad', 'media').lower(), 1)
-            for t in active_tickets
-        )
+        if snapshot is None:
+            snapshot = await self.get_company_snapshot(empresa_id, agent_id=agent_id)
+        return self.calculate_group_metrics([agent_id], snapshot)[agent_id]
+    
+    def _metrics_from_totals(self, totals: Dict) -> Dict:
+        """Métricas del agente a partir de sus totales agrupados"""
+        active_count = totals['active_count']
         
-        # Calcular edad promedio de tickets activos
-        if active_tickets:
-            ages = [self.calculate_ticket_age_days(t) for t in active_tickets]
-            avg_ticket_age_days = sum(ages) / len(ages)
-        else:
-            avg_ticket_age_days = 0.0
-        
-        # Contar tickets estancados
-        stagnant_count = sum(
-            1 for t in active_tickets
-            if self.is_ticket_stagnant(t, hours_threshold=48)
-        )
+        # Edad promedio de tickets activos (días desde su asignación)
+        avg_ticket_age_days = totals['age_days_sum'] / active_count if active_count else 0.0
         
-        # Calcular velocidad de resolución (tickets cerrados últimos 7 días)
-        closed_last_7_days = [
-            t for t in recent_tickets
-            if t.get('estado') in ['resuelto', 'cerrado']
-            and self._is_ticket_recent(t, seven_days_ago)
-        ]
-        resolution_velocity = len(closed_last_7_days) / 7.0
-        
-        # Calcular eficiencia (ratio de tickets cerrados vs asignados en 30 días)
-        assigned_last_30 = len(recent_tickets)
-        closed_last_30 = len([
-            t for t in recent_tickets
-            if t.get('estado') in ['resuelto', 'cerrado']
-        ])
+        # Velocidad de resolución (tickets cerrados últimos 7 días)
+        resolution_velocity = totals['velocity_closed'] / float(VELOCITY_DAYS)
         
-        efficiency_ratio = closed_last_30 / assigned_last_30 if assigned_last_30 > 0 else 1.0
+        # Eficiencia (ratio de tickets cerrados vs asignados en 30 días)
+        assigned_last_30 = totals['recent_count']
+        efficiency_ratio = totals['recent_closed'] / assigned_last_30 if assigned_last_30 > 0 else 1.0
         
         # Calcular penalización por gaming
         gaming_penalty = self._calculate_gaming_penalty({
             'avg_ticket_age_days': avg_ticket_age_days,
-            'stagnant_count': stagnant_count,
+            'stagnant_count': totals['stagnant_count'],
             'resolution_velocity': resolution_velocity,
             'efficiency_ratio': efficiency_ratio
         })
         
         return {
             'active_count': active_count,
-            'active_weighted': active_weighted,
+            'active_weighted': totals['active_weighted'],
             'avg_ticket_age_days': round(avg_ticket_age_days, 2),
-            'stagnant_count': stagnant_count,
+            'stagnant_count': totals['stagnant_count'],
             'resolution_velocity': round(resolution_velocity, 2),
             'efficiency_ratio': round(efficiency_ratio, 2),
             'gaming_penalty': round(gaming_penalty, 2)
         }
     
-    def _is_ticket_recent(self, ticket: Dict, since_date: datetime) -> bool:
-        """Verifica si un ticket fue creado después de una fecha"""
-        created_at = ticket.get('createdAt')
-        if not created_at:
-            return False
-        
-        try:
-            if isinstance(created_at, str):
-                fecha = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-            else:
-                fecha = created_at
-            
-            return fecha.replace(tzinfo=None) >= since_date
-        except:
-            return False
-    
     def _calculate_gaming_penalty(self, metrics: Dict) -> float:
         """
         Calcula penalización por comportamiento de gaming
@@ -312,7 +340,7 @@ class AgentAssigner:
         
         return penalty
         
-    def calculate_assignment_score(self, agent: Dict, metrics: Dict) -> float:
+    def calculate_assignment_score(self, agent: AgentRecord, metrics: Dict) -> float:
         """
         Calcula score final para asignación
         
@@ -359,44 +387,162 @@ class AgentAssigner:
             raise Exception("Ticket no tiene grupo_atencion definido")
         
         # 1. Obtener agentes del grupo específico
-        agents = await self.get_available_agents(grupo_atencion, empresa_id)
+        with STAGE_LATENCY.time(stage='fetch_roster'), \
+                TRACER.span('get_available_agents', empresa_id=empresa_id, grupo=grupo_atencion) as span:
+            agents = await self.get_available_agents(grupo_atencion, empresa_id)
+            if span is not None:
+                span.set_attribute('agentes', len(agents))
         if not agents:
             raise Exception(f"No hay Resolutores disponibles en el grupo '{grupo_atencion}' para empresaId {empresa_id}")
             
-        print(f"📋 Evaluando {len(agents)} Resolutores del grupo '{grupo_atencion}'...")
+        logger.info("📋 Evaluando %s Resolutores del grupo '%s'...", len(agents), grupo_atencion)
         
         agent_scores = []
+        metrics_started = time.perf_counter()
+        
+        # 2. Carga de trabajo de la empresa (libro mayor o fotografía única compartida por todos los agentes)
+        snapshot = await self.get_workload_view(empresa_id)
+        
+        # 3. Métricas de todos los agentes en una sola pasada y Score de cada uno
+        agents = [AgentRecord.coerce(agent) for agent in agents]
+        with TRACER.span('calculate_agent_metrics', agentes=len(agents)):
+            group_metrics = self.calculate_group_metrics([agent.id for agent in agents], snapshot)
         
-        # 2. Calcular Score para cada agente
         for agent in agents:
-            agent_id = agent.get('_id') or agent.get('id')
-            agent['id'] = agent_id
-            
-            # Obtener métricas completas (incluyendo anti-gaming)
-            metrics = await self.calculate_agent_metrics(agent_id, empresa_id)
-            agent['metrics'] = metrics
+            metrics = group_metrics[agent.id]
             
             # Calcular Score
             score = self.calculate_assignment_score(agent, metrics)
             
             agent_scores.append((agent, score))
             
-            # Log detallado
-            print(f"   👤 {agent.get('nombre')}")
-            print(f"      Tickets Activos: {metrics['active_count']} (Peso: {metrics['active_weighted']})")
-            print(f"      Edad Promedio: {metrics['avg_ticket_age_days']} días")
-            print(f"      Estancados: {metrics['stagnant_count']}")
-            print(f"      Velocidad: {metrics['resolution_velocity']} tickets/día")
-            print(f"      Eficiencia: {metrics['efficiency_ratio']*100:.0f}%")
-            print(f"      Gaming Penalty: {metrics['gaming_penalty']}")
-            print(f"      ⭐ Score Final: {score:.2f}")
-        
-        # 3. Seleccionar Mejor Candidato
-        best_agent_tuple = max(agent_scores, key=lambda x: x[1])
-        best_agent = best_agent_tuple[0]
-        best_score = best_agent_tuple[1]
-        
-        print(f"\n✅ ASIGNADO A: {best_agent.get('nombre')} (Score: {best_score:.2f})")
-        print(f"   Carga Actual: {best_agent['metrics']['active_count']} tickets")
-        
-        return best_agent
\ No newline at end of file
+            # Detalle por agente solo en DEBUG (formato perezoso: no cuesta nada si está suprimido)
+            logger.debug('👤 %s: activos %s (peso %s), edad %s días, estancados %s, velocidad %s/día, '
+                         'eficiencia %.0f%%, gaming %s, ⭐ score %.2f',
+                         agent.nombre, metrics['active_count'], metrics['active_weighted'],
+                         metrics['avg_ticket_age_days'], metrics['stagnant_count'],
+                         metrics['resolution_velocity'], metrics['efficiency_ratio'] * 100,
+                         metrics['gaming_penalty'], score,
+                         extra={'agente_id': agent.id, 'metrics': metrics, 'score': round(score, 2)})
+        
+        STAGE_LATENCY.observe(time.perf_counter() - metrics_started, stage='agent_metrics')
+        
+        # 4. Seleccionar Mejor Candidato (el roster no se modifica: se devuelve un dict nuevo)
+        best_agent, best_score = max(agent_scores, key=lambda x: x[1])
+        best_metrics = group_metrics[best_agent.id]
+        
+        logger.info('✅ ASIGNADO A: %s (Score: %.2f, carga actual: %s tickets)',
+                    best_agent.nombre, best_score, best_metrics['active_count'])
+        
+        return best_agent.to_dict(metrics=best_metrics)
+    
+    async def assign_batch(self, tickets: List[Dict]) -> List[Dict]:
+        """
+        Asignar muchos tickets de una vez repartiendo la carga.
+        
+        Los tickets se agrupan por (empresa, grupo de atención); por grupo se toma UNA
+        vista de carga y se calculan las métricas de cada agente una sola vez. Después
+        se asigna de forma voraz: cada ticket va al agente con mejor score y la carga
+        proyectada de ese agente se actualiza antes de elegir para el siguiente ticket.
+        Los tickets de mayor prioridad se reparten primero.
+        
+        Returns:
+            Decisiones en el mismo orden que 'tickets':
+            { "ticketId", "success", "agent": {...}, "score" } o { "ticketId", "success": False, "error" }
+        """
+        decisions: List[Optional[Dict]] = [None] * len(tickets)
+        by_company: Dict[str, Dict[str, List[int]]] = {}
+        
+        for index, ticket in enumerate(tickets):
+            empresa_id = ticket.get('empresaId')
+            grupo_atencion = ticket.get('grupo_atencion')
+            if not empresa_id:
+                decisions[index] = self._failed_decision(ticket, "Ticket no tiene empresaId")
+            elif not grupo_atencion:
+                decisions[index] = self._failed_decision(ticket, "Ticket no tiene grupo_atencion definido")
+            else:
+                by_company.setdefault(empresa_id, {}).setdefault(grupo_atencion, []).append(index)
+        
+        # Empresas en paralelo; grupos de una misma empresa en serie porque un
+        # agente puede pertenecer a varios grupos y comparte su carga proyectada
+        await asyncio.gather(*[
+            self._assign_company_batch(empresa_id, groups, tickets, decisions)
+            for empresa_id, groups in by_company.items()
+        ])
+        
+        assigned = sum(1 for d in decisions if d['success'])
+        logger.info('✅ Lote asignado: %s/%s tickets, %s empresas', assigned, len(tickets), len(by_company))
+        return decisions
+    
+    async def _assign_company_batch(self, empresa_id: str, groups: Dict[str, List[int]],
+                                    tickets: List[Dict], decisions: List[Optional[Dict]]):
+        """Asignar los tickets de una empresa, grupo por grupo, con carga proyectada compartida"""
+        try:
+            snapshot = await self.get_workload_view(empresa_id)
+        except Exception as e:
+            for indexes in groups.values():
+                for index in indexes:
+                    decisions[index] = self._failed_decision(tickets[index], str(e))
+            return
+        
+        # agent_id -> métricas (con la carga proyectada acumulada del lote)
+        projected: Dict[str, Dict] = {}
+        
+        for grupo_atencion, indexes in groups.items():
+            try:
+                agents = await self.get_available_agents(grupo_atencion, empresa_id)
+            except Exception as e:
+                agents = []
+                error = str(e)
+            else:
+                error = f"No hay Resolutores disponibles en el grupo '{grupo_atencion}' para empresaId {empresa_id}"
+            
+            if not agents:
+                for index in indexes:
+                    decisions[index] = self._failed_decision(tickets[index], error)
+                continue
+            
+            # Métricas (una sola pasada) de los agentes que aún no tienen carga proyectada
+            agents = [AgentRecord.coerce(agent) for agent in agents]
+            missing = [agent.id for agent in agents if agent.id not in projected]
+            if missing:
+                projected.update(self.calculate_group_metrics(missing, snapshot))
+            
+            # Montículo de (-score, orden, agente): el mejor candidato siempre en la cima
+            heap: List[Tuple[float, int, AgentRecord]] = []
+            for order, agent in enumerate(agents):
+                metrics = projected[agent.id]
+                heapq.heappush(heap, (-self.calculate_assignment_score(agent, metrics), order, agent))
+            
+            # Prioridad alta primero (orden estable dentro de la misma prioridad)
+            indexes = sorted(indexes, key=lambda i: -priority_weight(tickets[i].get('prioridad')))
+            
+            for index in indexes:
+                ticket = tickets[index]
+                neg_score, order, agent = heapq.heappop(heap)
+                metrics = projected[agent.id]
+                score = -neg_score
+                
+                decisions[index] = {
+                    'ticketId': ticket.get('id') or ticket.get('_id'),
+                    'success': True,
+                    'agent': {
+                        'id': agent.id,
+                        'nombre': agent.nombre,
+                        'cargaActual': metrics['active_count']
+                    },
+                    'score': round(score, 2)
+                }
+                
+                # Actualizar la carga proyectada y reinsertar con su nuevo score
+                metrics['active_count'] += 1
+                metrics['active_weighted'] += priority_weight(ticket.get('prioridad'))
+                heapq.heappush(heap, (-self.calculate_assignment_score(agent, metrics), order, agent))
+    
+    @staticmethod
+    def _failed_decision(ticket: Dict, error: str) -> Dict:
+        return {
+            'ticketId': ticket.get('id') or ticket.get('_id'),
+            'success': False,
+            'error': error
+        }
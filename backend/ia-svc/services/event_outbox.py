@@ -0,0 +1,124 @@
+# ia-svc/services/event_outbox.py
+"""
+Outbox local y durable de eventos por publicar (SQLite en modo WAL).
+
+- append() solo agrega una fila (sin esperar al broker): el evento sobrevive a una
+  caída del broker o a un reinicio del proceso.
+- Las filas se leen en el orden en que se agregaron (seq), así que los eventos de un
+  mismo ticket salen en orden.
+- Lo entregado (ack del broker) se borra y, cuando el outbox queda vacío, se compacta
+  el archivo (checkpoint del WAL y vacuum incremental).
+
+Con synchronous=NORMAL el WAL resiste la caída del proceso; no se hace fsync por evento.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class OutboxEvent(NamedTuple):
+    seq: int
+    routing_key: str
+    body: bytes
+    headers: Optional[Dict]
+    message_id: str
+
+
+class EventOutbox:
+    """
+    Args:
+        path: Archivo SQLite (se crea si no existe)
+        compact_interval: Segundos mínimos entre compactaciones
+    """
+
+    def __init__(self, path: str, compact_interval: float = 60.0):
+        self.path = path
+        self.compact_interval = compact_interval
+        self._lock = threading.Lock()
+        self._last_compact = 0.0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS outbox ('
+                         'seq INTEGER PRIMARY KEY AUTOINCREMENT, routing_key TEXT NOT NULL, body BLOB NOT NULL, '
+                         'headers TEXT, message_id TEXT NOT NULL, created_at REAL NOT NULL)')
+
+        # Contadores expuestos en /health
+        self.appended = 0
+        self.delivered = 0
+        self.compactions = 0
+
+        pending = self.pending()
+        if pending:
+            logger.info('📦 [Outbox] %s eventos pendientes de una ejecución anterior se reenviarán', pending)
+
+    def append(self, routing_key: str, body: bytes, headers: Optional[Dict] = None) -> OutboxEvent:
+        """Agregar un evento al final del outbox"""
+        message_id = str(uuid.uuid4())
+        with self._lock:
+            seq = self._db.execute(
+                'INSERT INTO outbox (routing_key, body, headers, message_id, created_at) VALUES (?, ?, ?, ?, ?)',
+                (routing_key, body, json.dumps(headers) if headers else None, message_id, time.time())
+            ).lastrowid
+            self.appended += 1
+        return OutboxEvent(seq, routing_key, body, headers, message_id)
+
+    def read(self, after: int = 0, limit: int = 100) -> List[OutboxEvent]:
+        """Siguientes eventos sin entregar, en orden, a partir de 'seq' > after"""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT seq, routing_key, body, headers, message_id FROM outbox WHERE seq > ? ORDER BY seq LIMIT ?',
+                (after, limit)
+            ).fetchall()
+        return [OutboxEvent(seq, routing_key, bytes(body), json.loads(headers) if headers else None, message_id)
+                for seq, routing_key, body, headers, message_id in rows]
+
+    def mark_delivered(self, seqs: Iterable[int]):
+        """Borrar los eventos confirmados por el broker (y compactar si el outbox quedó vacío)"""
+        seqs = [(seq,) for seq in seqs]
+        if not seqs:
+            return
+        with self._lock:
+            self._db.executemany('DELETE FROM outbox WHERE seq = ?', seqs)
+            self.delivered += len(seqs)
+        if time.monotonic() - self._last_compact >= self.compact_interval and not self.pending():
+            self.compact()
+
+    def pending(self) -> int:
+        """Eventos sin entregar"""
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+
+    def compact(self):
+        """Devolver al sistema las páginas de lo ya entregado y truncar el WAL"""
+        with self._lock:
+            self._db.execute('PRAGMA incremental_vacuum')
+            self._db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            self._last_compact = time.monotonic()
+            self.compactions += 1
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def stats(self) -> Dict:
+        return {
+            'path': self.path,
+            'pending': self.pending(),
+            'appended': self.appended,
+            'delivered': self.delivered,
+            'compactions': self.compactions
+        }
@@ -0,0 +1,447 @@
+# ia-svc/services/event_publisher.py
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import pika
+
+from logger import get_logger
+from services.event_outbox import EventOutbox, OutboxEvent
+
+logger = get_logger(__name__)
+
+
+class PublishNacked(Exception):
+    """El broker rechazó (nack) el mensaje publicado"""
+
+
+def ordering_key(body: bytes) -> Optional[str]:
+    """ID del ticket de un evento ('ticketId' o 'ticket.id'): los eventos de un mismo ticket salen en orden"""
+    try:
+        message = json.loads(body)
+    except ValueError:
+        return None
+    if not isinstance(message, dict):
+        return None
+    ticket_id = message.get('ticketId') or (message.get('ticket') or {}).get('id')
+    return str(ticket_id) if ticket_id else None
+
+
+class _OutgoingEvent:
+    __slots__ = ('routing_key', 'body', 'headers', 'message_id', 'future', 'enqueued_at', 'seq')
+
+    def __init__(self, routing_key: str, body: bytes, headers: Optional[Dict],
+                 message_id: Optional[str] = None, future: Optional[Future] = None, seq: Optional[int] = None):
+        self.routing_key = routing_key
+        self.body = body
+        self.headers = headers
+        self.message_id = message_id or str(uuid.uuid4())
+        self.future: Future = future or Future()
+        self.enqueued_at = time.monotonic()
+        self.seq = seq
+
+
+class EventPublisher:
+    """
+    Camino de publicación dedicado y thread-safe.
+
+    - Usa su propia conexión y canal (SelectConnection en un hilo propio), así que
+      publicar no compite con el canal del consumidor.
+    - El canal trabaja en modo 'publisher confirms': cada publish() devuelve un Future
+      que se resuelve cuando el broker confirma (ack) o rechaza (nack) el evento.
+    - Micro-batching opcional: los eventos se acumulan hasta 'batch_size' o
+      'linger_ms' y se escriben en una sola ráfaga.
+    - Con 'outbox' (EventOutbox) los eventos se guardan primero en el outbox local y el
+      hilo del publicador los drena por lotes y en orden cuando hay conexión; solo se
+      borran al recibir el ack, así que ni una caída del broker ni un reinicio los pierde.
+    """
+
+    # Segundos antes de reintentar lo que el broker rechazó (solo con outbox)
+    NACK_RETRY_SECONDS = 1.0
+
+    def __init__(self, url: str, exchange: str = 'tickets',
+                 batch_size: Optional[int] = None, linger_ms: Optional[float] = None,
+                 parameters_factory: Optional[Callable[[], pika.URLParameters]] = None,
+                 outbox: Optional[EventOutbox] = None):
+        self.url = url
+        self.exchange = exchange
+        self.batch_size = batch_size or int(os.getenv('EVENT_PUBLISHER_BATCH_SIZE', 100))
+        self.linger = (linger_ms if linger_ms is not None else float(os.getenv('EVENT_PUBLISHER_LINGER_MS', 5))) / 1000.0
+        self._parameters_factory = parameters_factory or (lambda: pika.URLParameters(self.url))
+
+        self._queue: Deque[_OutgoingEvent] = deque()
+        self._queue_lock = threading.Lock()
+        self._pending: Dict[int, Tuple[_OutgoingEvent, float]] = {}
+        self._delivery_tag = 0
+        self._flush_scheduled = False
+
+        # Outbox durable: 'seq' del último evento leído del outbox, Futures de quien publicó y
+        # eventos rechazados por el broker que se reenvían (solo esos) después de una pausa.
+        # Mientras un evento rechazado no se confirma, los siguientes de su ticket se retienen.
+        self.outbox = outbox
+        self._outbox_cursor = 0
+        self._outbox_futures: Dict[int, Future] = {}
+        self._outbox_retry: List[Tuple[float, _OutgoingEvent]] = []
+        self._outbox_blocked: Dict[str, Set[int]] = {}
+        self._outbox_held: List[_OutgoingEvent] = []
+
+        self._connection = None
+        self._channel = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._ready = threading.Event()
+
+        # Métricas
+        self.published = 0
+        self.confirmed = 0
+        self.nacked = 0
+        self._confirm_latencies: Deque[float] = deque(maxlen=1000)
+
+    # ------------------------------------------------------------------
+    # API pública (thread-safe)
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Arrancar el hilo del publicador"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='rabbitmq-publisher', daemon=True)
+        self._thread.start()
+
+    def attach_outbox(self, outbox: EventOutbox):
+        """Drenar a partir de ahora desde 'outbox' (antes de start(); reemplaza uno ya cerrado)"""
+        self.outbox = outbox
+        self._outbox_cursor = 0
+        self._outbox_futures.clear()
+        self._outbox_retry = []
+        self._outbox_blocked = {}
+        self._outbox_held = []
+
+    def publish(self, routing_key: str, message: dict, headers: Optional[Dict] = None) -> Future:
+        """
+        Encolar un evento para publicarlo con confirmación.
+
+        Returns:
+            Future que se resuelve con el message_id al recibir el ack del broker,
+            o falla con PublishNacked si el broker lo rechaza.
+        """
+        body = json.dumps(message).encode('utf-8')
+        if self.outbox is not None:
+            # Solo se escribe en el outbox local; el hilo del publicador lo drena. El Future se
+            # registra bajo el mismo lock que la escritura: un lote que lea la fila en ese
+            # momento espera el lock para tomarlo (ver _next_outbox_batch)
+            future: Future = Future()
+            with self._queue_lock:
+                stored = self.outbox.append(routing_key, body, headers)
+                self._outbox_futures[stored.seq] = future
+            self._request_flush(immediate=stored.seq - self._outbox_cursor >= self.batch_size)
+            return future
+
+        event = _OutgoingEvent(routing_key, body, headers)
+        with self._queue_lock:
+            self._queue.append(event)
+            queued = len(self._queue)
+        self._request_flush(immediate=queued >= self.batch_size)
+        return event.future
+
+    def close(self, timeout: float = 5.0):
+        """Vaciar lo pendiente (hasta 'timeout') y cerrar la conexión"""
+        deadline = time.monotonic() + timeout
+        while (self._queue or self._pending or self._outbox_futures or self._outbox_retry or self._outbox_held) \
+                and self._ready.is_set() \
+                and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self._stopping = True
+        connection = self._connection
+        if connection is not None:
+            try:
+                connection.ioloop.add_callback_threadsafe(self._close_connection)
+            except Exception:
+                pass
+        if self._thread:
+            self._thread.join(timeout=max(deadline - time.monotonic(), 0.5))
+        if self.outbox is not None:
+            # Lo no confirmado queda en el outbox para el siguiente arranque
+            self.outbox.close()
+        logger.info('🔗 [RabbitMQ] Publicador cerrado')
+
+    def stats(self) -> Dict:
+        """Contadores y latencia de confirmación (ms)"""
+        latencies = sorted(self._confirm_latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000, 2)
+
+        return {
+            'connected': self._ready.is_set(),
+            'published': self.published,
+            'confirmed': self.confirmed,
+            'nacked': self.nacked,
+            'queued': len(self._queue),
+            'awaiting_confirm': len(self._pending),
+            'outbox': self.outbox.stats() if self.outbox is not None else None,
+            'confirm_latency_ms': {
+                'avg': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+                'p50': percentile(0.50),
+                'p99': percentile(0.99),
+            }
+        }
+
+    # ------------------------------------------------------------------
+    # Hilo del publicador (todo lo de abajo corre en el ioloop de pika)
+    # ------------------------------------------------------------------
+
+    def _request_flush(self, immediate: bool = False):
+        connection = self._connection
+        if connection is None or not self._ready.is_set():
+            # Se vaciará al abrir el canal
+            return
+        try:
+            connection.ioloop.add_callback_threadsafe(lambda: self._schedule_flush(immediate))
+        except Exception:
+            pass
+
+    def _schedule_flush(self, immediate: bool):
+        if immediate or self.linger <= 0:
+            self._flush()
+        elif not self._flush_scheduled:
+            self._flush_scheduled = True
+            self._connection.ioloop.call_later(self.linger, self._flush)
+
+    def _flush(self):
+        """Publicar en ráfaga todo lo encolado"""
+        self._flush_scheduled = False
+        channel = self._channel
+        if channel is None or not channel.is_open:
+            return
+
+        if self.outbox is not None:
+            batch = self._next_outbox_batch()
+        else:
+            with self._queue_lock:
+                batch = list(self._queue)
+                self._queue.clear()
+
+        for event in batch:
+            self._delivery_tag += 1
+            self._pending[self._delivery_tag] = (event, time.monotonic())
+            channel.basic_publish(
+                exchange=self.exchange,
+                routing_key=event.routing_key,
+                body=event.body,
+                properties=pika.BasicProperties(
+                    delivery_mode=2,
+                    content_type='application/json',
+                    message_id=event.message_id,
+                    headers=event.headers
+                )
+            )
+            self.published += 1
+
+        if batch:
+            logger.info('📤 [RabbitMQ] Publicados %s eventos (esperando confirmación)', len(batch))
+        if self.outbox is not None and len(batch) >= self.batch_size:
+            # Quedan más en el outbox: siguiente lote en la próxima vuelta del ioloop
+            self._connection.ioloop.call_later(0, self._flush)
+
+    def _next_outbox_batch(self):
+        """
+        Siguiente lote: primero los rechazados cuya pausa ya pasó y luego las filas nuevas
+        del outbox, en orden, a partir del cursor. Lo que espera confirmación no se vuelve a leer,
+        y lo de un ticket con un evento anterior rechazado se retiene (ver _hold_blocked).
+        """
+        now = time.monotonic()
+        batch = [event for ready_at, event in self._outbox_retry if ready_at <= now][:self.batch_size]
+        if batch:
+            retried = {event.seq for event in batch}
+            self._outbox_retry = [(ready_at, event) for ready_at, event in self._outbox_retry
+                                  if event.seq not in retried]
+
+        stored = self.outbox.read(after=self._outbox_cursor, limit=self.batch_size - len(batch))
+        if stored:
+            self._outbox_cursor = stored[-1].seq
+            with self._queue_lock:
+                futures = [self._outbox_futures.pop(event.seq, None) for event in stored]
+            batch.extend(_OutgoingEvent(event.routing_key, event.body, event.headers, message_id=event.message_id,
+                                        future=future, seq=event.seq)
+                         for event, future in zip(stored, futures))
+        return self._hold_blocked(batch) if self._outbox_blocked else batch
+
+    def _hold_blocked(self, batch):
+        """Retener los eventos de tickets que tienen un evento anterior rechazado y sin confirmar"""
+        ready = []
+        for event in batch:
+            blocking = self._outbox_blocked.get(ordering_key(event.body))
+            if blocking and min(blocking) < event.seq:
+                self._outbox_held.append(event)
+            else:
+                ready.append(event)
+        return ready
+
+    def _unblock(self, events):
+        """
+        Un rechazado ya confirmado libera lo retenido de su ticket; al armar el siguiente
+        lote se vuelve a retener lo que aún tenga otro rechazado anterior pendiente.
+        """
+        released = set()
+        for event in events:
+            key = ordering_key(event.body)
+            blocking = self._outbox_blocked.get(key)
+            if not blocking or event.seq not in blocking:
+                continue
+            blocking.discard(event.seq)
+            released.add(key)
+            if not blocking:
+                del self._outbox_blocked[key]
+        if not released:
+            return
+        now = time.monotonic()
+        self._outbox_retry.extend((now, event) for event in self._outbox_held
+                                  if ordering_key(event.body) in released)
+        self._outbox_held = [event for event in self._outbox_held if ordering_key(event.body) not in released]
+        self._outbox_retry.sort(key=lambda entry: entry[1].seq)
+        self._connection.ioloop.call_later(0, self._flush)
+
+    def _retry_outbox(self, events):
+        """
+        Reenviar solo los eventos rechazados (nack), después de NACK_RETRY_SECONDS; hasta que
+        se confirmen, los eventos posteriores de su mismo ticket no se publican.
+        """
+        for event in events:
+            key = ordering_key(event.body)
+            if key is not None:
+                self._outbox_blocked.setdefault(key, set()).add(event.seq)
+        ready_at = time.monotonic() + self.NACK_RETRY_SECONDS
+        self._outbox_retry.extend((ready_at, event) for event in events)
+        self._outbox_retry.sort(key=lambda entry: entry[1].seq)
+
+    def _rewind_outbox(self, events):
+        """
+        Conexión perdida: nada queda en vuelo, así que se vuelve a drenar desde el primero
+        de 'events' (sin confirmar) o de los rechazados pendientes.
+        """
+        events = [event for event in events if event.seq is not None]
+        events.extend(event for _, event in self._outbox_retry)
+        events.extend(self._outbox_held)
+        self._outbox_retry = []
+        self._outbox_held = []
+        self._outbox_blocked = {}
+        if not events:
+            return
+        with self._queue_lock:
+            for event in events:
+                if not event.future.done():
+                    self._outbox_futures[event.seq] = event.future
+        self._outbox_cursor = min(self._outbox_cursor, min(event.seq for event in events) - 1)
+
+    def _on_confirm(self, frame):
+        """Ack/Nack del broker; 'multiple' confirma todas las etiquetas <= delivery_tag"""
+        method = frame.method
+        is_ack = isinstance(method, pika.spec.Basic.Ack)
+        if method.multiple:
+            tags = [tag for tag in self._pending if tag <= method.delivery_tag]
+        else:
+            tags = [method.delivery_tag]
+
+        now = time.monotonic()
+        delivered, acked, rejected = [], [], []
+        for tag in tags:
+            entry = self._pending.pop(tag, None)
+            if entry is None:
+                continue
+            event, published_at = entry
+            self._confirm_latencies.append(now - published_at)
+            if is_ack:
+                self.confirmed += 1
+                if event.seq is not None:
+                    delivered.append(event.seq)
+                    acked.append(event)
+                event.future.set_result(event.message_id)
+            else:
+                self.nacked += 1
+                logger.error('❌ [RabbitMQ] Evento rechazado por el broker: %s', event.routing_key)
+                if event.seq is not None:
+                    rejected.append(event)
+                else:
+                    event.future.set_exception(PublishNacked(event.routing_key))
+
+        if self.outbox is not None:
+            self.outbox.mark_delivered(delivered)
+            if self._outbox_blocked:
+                self._unblock(acked)
+            if rejected:
+                # Siguen en el outbox: se reenvían solo ellos después de una pausa
+                self._retry_outbox(rejected)
+                self._connection.ioloop.call_later(self.NACK_RETRY_SECONDS, self._flush)
+
+    def _run(self):
+        """Bucle del hilo: conectar, atender el ioloop y reconectar si se cae"""
+        retry = 0
+        while not self._stopping:
+            try:
+                self._connection = pika.SelectConnection(
+                    parameters=self._parameters_factory(),
+                    on_open_callback=self._on_connection_open,
+                    on_open_error_callback=lambda conn, err: conn.ioloop.stop(),
+                    on_close_callback=self._on_connection_closed
+                )
+                self._connection.ioloop.start()
+            except Exception as e:
+                logger.error('❌ [RabbitMQ] Error en publicador: %s', e)
+
+            self._ready.clear()
+            self._requeue_unconfirmed()
+            if self._stopping:
+                break
+            retry += 1
+            wait_time = min(2 * retry, 30)
+            logger.warning('⚠️  [RabbitMQ] Publicador desconectado. Reintentando en %ss...', wait_time)
+            time.sleep(wait_time)
+
+    def _on_connection_open(self, connection):
+        connection.channel(on_open_callback=self._on_channel_open)
+
+    def _on_channel_open(self, channel):
+        self._channel = channel
+        self._delivery_tag = 0
+        channel.confirm_delivery(ack_nack_callback=self._on_confirm)
+        channel.exchange_declare(exchange=self.exchange, exchange_type='topic', durable=True,
+                                 callback=lambda _frame: self._on_ready())
+
+    def _on_ready(self):
+        self._ready.set()
+        logger.info('✅ [RabbitMQ] Publicador con confirmaciones listo')
+        self._flush()
+
+    def _on_connection_closed(self, connection, reason):
+        self._channel = None
+        connection.ioloop.stop()
+
+    def _close_connection(self):
+        if self._connection is not None and not self._connection.is_closed:
+            self._connection.close()
+        else:
+            self._connection.ioloop.stop()
+
+    def _requeue_unconfirmed(self):
+        """Los eventos sin confirmar al perder la conexión vuelven al frente de la cola"""
+        if not self._pending:
+            return
+        unconfirmed = [event for event, _ in sorted(self._pending.values(), key=lambda e: e[1])]
+        self._pending.clear()
+        if self.outbox is not None:
+            # Siguen en el outbox: al reconectar se drena otra vez desde el más antiguo
+            self._rewind_outbox(unconfirmed)
+            logger.info('↩️  [RabbitMQ] %s eventos sin confirmar se reenviarán desde el outbox', len(unconfirmed))
+            return
+        with self._queue_lock:
+            self._queue.extendleft(reversed(unconfirmed))
+        logger.info('↩️  [RabbitMQ] %s eventos sin confirmar se reintentarán', len(unconfirmed))
@@ -0,0 +1,188 @@
+# ia-svc/services/idempotency.py
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# Estados de un ticket en la caché
+IN_PROGRESS = 'in_progress'
+DONE = 'done'
+
+
+def message_version(message: Dict) -> Optional[int]:
+    """
+    Versión opcional del evento ('version' del mensaje o del ticket, o '__v' del documento).
+    Una versión mayor que la ya procesada indica una re-emisión intencional del ticket.
+    """
+    ticket = message.get('ticket') or {}
+    for value in (message.get('version'), ticket.get('version'), ticket.get('__v')):
+        if value is not None:
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+class IdempotencyCache:
+    """
+    Registro de tickets 'ticket.creado' ya procesados, por ID de ticket (y versión opcional).
+
+    - LRU acotado en memoria: un duplicado se reconoce sin ninguna llamada HTTP.
+    - Almacén local SQLite opcional ('db_path'): los tickets terminados sobreviven a
+      reinicios y se comparten entre procesos de la misma máquina. Las entradas
+      expiran después de 'ttl_seconds'.
+    - Un ticket en proceso también cuenta como duplicado (redelivery mientras se procesa);
+      si el proceso falla se libera para que la re-entrega lo reintente.
+    - El error de cada ticket (y versión) se reporta una sola vez, aunque la re-entrega
+      vuelva a fallar (ver first_error).
+    - Es thread-safe (consumidor en modo hilo).
+    """
+
+    def __init__(self, max_entries: int = 100000, db_path: Optional[str] = None,
+                 ttl_seconds: float = 7 * 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path or None
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # ticket_id -> versión cuyo error ya se reportó
+        self._errors: "OrderedDict[str, Optional[int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+        # Contadores expuestos en /health
+        self.duplicates = 0
+        self.claims = 0
+        self.evictions = 0
+        self.store_hits = 0
+
+        if self.db_path:
+            self._open_store()
+
+    @classmethod
+    def from_env(cls) -> 'IdempotencyCache':
+        """Configuración por variables de entorno (IDEMPOTENCY_*)"""
+        return cls(
+            max_entries=int(os.getenv('IDEMPOTENCY_CACHE_SIZE', 100000)),
+            db_path=os.getenv('IDEMPOTENCY_DB_PATH', ''),
+            ttl_seconds=float(os.getenv('IDEMPOTENCY_TTL_SECONDS', 7 * 24 * 3600))
+        )
+
+    def _open_store(self):
+        try:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute('CREATE TABLE IF NOT EXISTS processed ('
+                       'ticket_id TEXT PRIMARY KEY, version INTEGER, outcome TEXT, processed_at REAL NOT NULL)')
+            removed = db.execute('DELETE FROM processed WHERE processed_at < ?',
+                                 (time.time() - self.ttl_seconds,)).rowcount
+            self._db = db
+            logger.info('🗃️ Almacén de idempotencia: %s (%s expirados eliminados)', self.db_path, removed)
+        except Exception as e:
+            logger.warning('⚠️ No se pudo abrir el almacén de idempotencia %s, solo memoria: %s', self.db_path, e)
+            self._db = None
+
+    def _remember(self, ticket_id: str, state: str, version: Optional[int]):
+        self._entries[ticket_id] = (state, version)
+        self._entries.move_to_end(ticket_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _lookup(self, ticket_id: str) -> Optional[tuple]:
+        entry = self._entries.get(ticket_id)
+        if entry is not None:
+            self._entries.move_to_end(ticket_id)
+            return entry
+        if self._db is None:
+            return None
+        row = self._db.execute('SELECT version, processed_at FROM processed WHERE ticket_id = ?',
+                               (ticket_id,)).fetchone()
+        if row is None or row[1] < time.time() - self.ttl_seconds:
+            return None
+        self.store_hits += 1
+        entry = (DONE, row[0])
+        self._remember(ticket_id, DONE, row[0])
+        return entry
+
+    def claim(self, ticket_id: str, version: Optional[int] = None) -> bool:
+        """
+        Reservar el ticket para procesarlo.
+
+        Returns:
+            False si es un duplicado (ya procesado o en proceso con la misma versión o mayor)
+        """
+        with self._lock:
+            entry = self._lookup(ticket_id)
+            if entry is not None:
+                _state, seen_version = entry
+                if version is None or (seen_version is not None and version <= seen_version):
+                    self.duplicates += 1
+                    return False
+            self._remember(ticket_id, IN_PROGRESS, version)
+            self.claims += 1
+            return True
+
+    def complete(self, ticket_id: str, outcome: str = 'processed'):
+        """Marcar el ticket como procesado (y guardarlo en el almacén local, si hay)"""
+        with self._lock:
+            _state, version = self._entries.get(ticket_id, (None, None))
+            self._remember(ticket_id, DONE, version)
+            if self._db is not None:
+                try:
+                    self._db.execute('INSERT OR REPLACE INTO processed VALUES (?, ?, ?, ?)',
+                                     (ticket_id, version, outcome, time.time()))
+                except sqlite3.Error as e:
+                    logger.warning('⚠️ No se pudo guardar el ticket %s en el almacén de idempotencia: %s', ticket_id, e)
+
+    def release(self, ticket_id: str):
+        """Liberar un ticket cuyo procesamiento falló (la re-entrega lo volverá a procesar)"""
+        with self._lock:
+            entry = self._entries.get(ticket_id)
+            if entry is not None and entry[0] == IN_PROGRESS:
+                del self._entries[ticket_id]
+
+    def first_error(self, ticket_id: str, version: Optional[int] = None) -> bool:
+        """
+        Registrar que el ticket falló.
+
+        Returns:
+            True solo la primera vez para esta versión del ticket (hay que publicar 'ticket.error')
+        """
+        with self._lock:
+            if ticket_id in self._errors and self._errors[ticket_id] == version:
+                self._errors.move_to_end(ticket_id)
+                return False
+            self._errors[ticket_id] = version
+            self._errors.move_to_end(ticket_id)
+            while len(self._errors) > self.max_entries:
+                self._errors.popitem(last=False)
+            return True
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso de la caché"""
+        return {
+            'size': len(self._entries),
+            'claims': self.claims,
+            'duplicates': self.duplicates,
+            'evictions': self.evictions,
+            'store': self.db_path if self._db is not None else None,
+            'store_hits': self.store_hits,
+            'max_entries': self.max_entries
+        }
@@ -1,46 +1,113 @@
 import pika
+from pika.adapters.asyncio_connection import AsyncioConnection
 import json
-from typing import Callable, Any
+import os
+from typing import Callable, Any, List, Optional, Union
 import threading
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 import time
+from contextlib import contextmanager
+
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# Modos de consumo soportados
+CONSUMER_MODE_THREAD = 'thread'    # BlockingConnection en un hilo dedicado
+CONSUMER_MODE_ASYNCIO = 'asyncio'  # AsyncioConnection sobre el event loop de la aplicación
+
+# Políticas de ack en modo 'thread'
+ACK_MODE_AFTER_PROCESSING = 'after_processing'  # ack/nack al terminar el callback (pool acotado)
+ACK_MODE_IMMEDIATE = 'immediate'                # ack al recibir + hilo por mensaje (comportamiento anterior)
 
 class RabbitMQClient:
-    def __init__(self, url: str):
+    def __init__(self, url: str, consumer_mode: Optional[str] = None, max_in_flight: Optional[int] = None,
+                 publisher=None, workers: Optional[int] = None, prefetch_count: Optional[int] = None):
         self.url = url
         self.connection = None
         self.channel = None
         self._consumer_cancelled = False
         
+        # Publicador dedicado (EventPublisher): conexión propia con confirmaciones
+        self.publisher = publisher
+        
+        self.consumer_mode = (consumer_mode or os.getenv('RABBITMQ_CONSUMER_MODE', CONSUMER_MODE_THREAD)).lower()
+        # Máximo de mensajes procesándose a la vez en modo asyncio (= prefetch del canal)
+        self.max_in_flight = max_in_flight or int(os.getenv('RABBITMQ_MAX_IN_FLIGHT', 10))
+        
+        # Modo 'thread': pool de workers acotado y prefetch del mismo tamaño
+        self.ack_mode = os.getenv('RABBITMQ_ACK_MODE', ACK_MODE_AFTER_PROCESSING).lower()
+        self.workers = workers or int(os.getenv('RABBITMQ_WORKERS', 8))
+        self.prefetch_count = prefetch_count or int(os.getenv('RABBITMQ_PREFETCH', self.workers))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._worker_local = threading.local()
+        
+        # Estado del modo asyncio
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._async_connection = None
+        self._async_channel = None
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._tasks = set()
+        self._reconnect_attempt = 0
+        
+        # Mensajes listos en la cola del broker (se consulta cada RABBITMQ_BACKLOG_POLL_SECONDS)
+        self.backlog: Optional[int] = None
+        self.backlog_poll_seconds = float(os.getenv('RABBITMQ_BACKLOG_POLL_SECONDS', 15))
+        
+    def _build_parameters(self) -> pika.URLParameters:
+        """Parámetros de conexión comunes a ambos modos"""
+        params = pika.URLParameters(self.url)
+        params.socket_timeout = 15
+        params.heartbeat = 60
+        params.blocked_connection_timeout = 300
+        params.connection_attempts = 3
+        params.retry_delay = 2
+        
+        if self.url.startswith('amqps://'):
+            import ssl
+            context = ssl.create_default_context()
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+            params.ssl_options = pika.SSLOptions(context)
+        return params
+    
+    def _display_url(self) -> str:
+        return self.url.split('@')[-1] if '@' in self.url else 'localhost'
+        
     def connect(self):
         """Establecer conexión con RabbitMQ"""
         if not self.connection or self.connection.is_closed:
-            print(f"🔌 [RabbitMQ] Conectando a {self.url.split('@')[-1] if '@' in self.url else 'localhost'}...")
+            logger.info('🔌 [RabbitMQ] Conectando a %s...', self._display_url())
             
-            params = pika.URLParameters(self.url)
-            params.socket_timeout = 15
-            params.heartbeat = 60
-            params.blocked_connection_timeout = 300
-            params.connection_attempts = 3
-            params.retry_delay = 2
-            
-            if self.url.startswith('amqps://'):
-                import ssl
-                context = ssl.create_default_context()
-                context.check_hostname = False
-                context.verify_mode = ssl.CERT_NONE
-                params.ssl_options = pika.SSLOptions(context)
+            params = self._build_parameters()
 
             try:
                 self.connection = pika.BlockingConnection(params)
                 self.channel = self.connection.channel()
                 self.channel.exchange_declare(exchange='tickets', exchange_type='topic', durable=True)
-                print('✅ [RabbitMQ] Conectado exitosamente')
+                logger.info('✅ [RabbitMQ] Conectado exitosamente')
             except Exception as e:
-                print(f'❌ [RabbitMQ] Error en conexión: {e}')
+                logger.error('❌ [RabbitMQ] Error en conexión: %s', e)
                 raise
             
+    @contextmanager
+    def temporary_channel(self):
+        """
+        Canal bloqueante de corta duración para declaraciones puntuales. Su conexión se cierra
+        al salir, así que no queda un socket sin atender (heartbeats) junto al consumidor asyncio.
+        """
+        connection = pika.BlockingConnection(self._build_parameters())
+        try:
+            channel = connection.channel()
+            channel.exchange_declare(exchange='tickets', exchange_type='topic', durable=True)
+            yield channel
+        finally:
+            if connection.is_open:
+                connection.close()
+            
     def stop_consuming(self):
         """Detener consumo de forma segura"""
         try:
@@ -48,7 +115,7 @@ class RabbitMQClient:
             if self.channel and hasattr(self.channel, 'stop_consuming'):
                 self.channel.stop_consuming()
         except Exception as e:
-            print(f'⚠️  [RabbitMQ] Error deteniendo: {e}')
+            logger.warning('⚠️  [RabbitMQ] Error deteniendo: %s', e)
 
     def close(self):
         """Cerrar conexión de forma segura"""
@@ -56,49 +123,159 @@ class RabbitMQClient:
             self.stop_consuming()
             if self.connection and not self.connection.is_closed:
                 self.connection.close()
-            print('🔗 [RabbitMQ] Conexión cerrada')
+            if self._async_connection and not self._async_connection.is_closed:
+                self._async_connection.close()
+            logger.info('🔗 [RabbitMQ] Conexión cerrada')
         except Exception as e:
-            print(f'⚠️  [RabbitMQ] Error al cerrar: {e}')
+            logger.warning('⚠️  [RabbitMQ] Error al cerrar: %s', e)
         finally:
             self.connection = None
             self.channel = None
+            self._async_connection = None
+            self._async_channel = None
+    
+    def is_connected(self) -> bool:
+        """Hay alguna conexión abierta (bloqueante o asyncio)"""
+        for connection in (self.connection, self._async_connection):
+            if connection and not connection.is_closed:
+                return True
+        return False
+    
+    def _on_loop_thread(self) -> bool:
+        """True si se llama desde el event loop del consumidor asyncio"""
+        try:
+            return self._loop is not None and asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
             
-    def publish(self, routing_key: str, message: dict):
-        """Publicar mensaje en exchange"""
+    def publish(self, routing_key: str, message: dict, headers: Optional[dict] = None):
+        """
+        Publicar mensaje en exchange.
+        
+        Con un publicador dedicado devuelve el Future de la confirmación del broker;
+        sin él se publica sobre el canal del consumidor (sin confirmación).
+        """
+        if self.publisher is not None:
+            return self.publisher.publish(routing_key, message, headers=headers)
         try:
-            if not self.connection or self.connection.is_closed:
-                self.connect()
+            if self._async_channel is not None and self._async_channel.is_open and self._on_loop_thread():
+                # Modo asyncio: publicar sin bloquear el event loop
+                channel = self._async_channel
+            else:
+                if not self.connection or self.connection.is_closed:
+                    self.connect()
+                channel = self.channel
             payload = json.dumps(message)
-            self.channel.basic_publish(
+            channel.basic_publish(
                 exchange='tickets',
                 routing_key=routing_key,
                 body=payload,
                 properties=pika.BasicProperties(
                     delivery_mode=2,
-                    content_type='application/json'
+                    content_type='application/json',
+                    headers=headers
                 )
             )
-            print(f'✅ [RabbitMQ] Publicado: {routing_key}')
+            logger.info('✅ [RabbitMQ] Publicado: %s', routing_key)
         except Exception as e:
-            print(f'❌ [RabbitMQ] Error publicando: {e}')
+            logger.error('❌ [RabbitMQ] Error publicando: %s', e)
             
-    def _handle_message(self, callback: Callable[[dict], Any], message: dict):
+    def _handle_message(self, callback: Callable[..., Any], *args):
         """Procesar mensaje en thread separado"""
+        self._track_in_flight(1)
         try:
             if asyncio.iscoroutinefunction(callback):
                 loop = asyncio.new_event_loop()
                 asyncio.set_event_loop(loop)
                 try:
-                    loop.run_until_complete(callback(message))
+                    loop.run_until_complete(callback(*args))
                 finally:
                     loop.close()
             else:
-                callback(message)
+                callback(*args)
         except Exception as e:
-            print(f'❌ [RabbitMQ] Error procesando mensaje: {e}')
+            logger.error('❌ [RabbitMQ] Error procesando mensaje: %s', e)
+        finally:
+            self._track_in_flight(-1)
+    
+    def _track_in_flight(self, delta: int):
+        with self._in_flight_lock:
+            self._in_flight += delta
+    
+    def _get_worker_loop(self) -> asyncio.AbstractEventLoop:
+        """Event loop persistente del worker actual (uno por hilo del pool, no uno por mensaje)"""
+        loop = getattr(self._worker_local, 'loop', None)
+        if loop is None or loop.is_closed():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            self._worker_local.loop = loop
+        return loop
+    
+    def _run_callback(self, callback: Callable[..., Any], *args):
+        """Ejecutar el callback en el worker actual; las excepciones se propagan"""
+        if asyncio.iscoroutinefunction(callback):
+            self._get_worker_loop().run_until_complete(callback(*args))
+        else:
+            callback(*args)
+    
+    def _process_and_settle(self, connection, channel, delivery_tag: int, redelivered: bool,
+                            callback: Callable[..., Any], *args):
+        """
+        Procesar el mensaje en un worker del pool y hacer ack/nack al terminar.
+        
+        El ack se agenda en el hilo de la conexión (pika no es thread-safe).
+        Si el callback falla se reencola una vez; si ya era una reentrega se descarta
+        (o va a la dead-letter exchange si la cola tiene una configurada).
+        """
+        success = True
+        self._track_in_flight(1)
+        try:
+            self._run_callback(callback, *args)
+        except Exception as e:
+            success = False
+            logger.error('❌ [RabbitMQ] Error procesando mensaje: %s', e)
+        finally:
+            self._track_in_flight(-1)
+        
+        def settle():
+            if not channel.is_open:
+                # El canal se cerró: el broker reentregará el mensaje
+                return
+            if success:
+                channel.basic_ack(delivery_tag=delivery_tag)
+            else:
+                requeue = not redelivered
+                logger.info('↩️  [RabbitMQ] Nack mensaje %s (requeue=%s)', delivery_tag, requeue)
+                channel.basic_nack(delivery_tag=delivery_tag, requeue=requeue)
+        
+        try:
+            connection.add_callback_threadsafe(settle)
+        except Exception as e:
+            logger.warning('⚠️  [RabbitMQ] No se pudo confirmar mensaje %s: %s', delivery_tag, e)
 
-    def start_consuming(self, queue_name: str, routing_key: str, callback: Callable[[dict], Any]):
-        """Iniciar consumo de mensajes con reintentos"""
+    def start_consuming(self, queue_name: str, routing_key: Union[str, List[str]], callback: Callable[..., Any],
+                        exclusive: bool = False, with_routing_key: bool = False):
+        """
+        Iniciar consumo de mensajes con reintentos
+        
+        En modo 'thread' bloquea el hilo que lo llama (ejecutarlo en un hilo dedicado).
+        En modo 'asyncio' debe llamarse desde el event loop de la aplicación y retorna
+        de inmediato; los mensajes se procesan como tareas del mismo loop.
+        
+        Args:
+            queue_name: Nombre de la cola
+            routing_key: Routing key (o lista de routing keys) a vincular con el exchange
+            callback: Función que recibe el mensaje (o routing_key, mensaje si with_routing_key)
+            exclusive: Cola propia de esta instancia (se borra al desconectar). Útil para
+                       eventos que cada réplica debe recibir (invalidación de cachés).
+            with_routing_key: Pasar también la routing key al callback
+        """
+        routing_keys = [routing_key] if isinstance(routing_key, str) else list(routing_key)
+        
+        if self.consumer_mode == CONSUMER_MODE_ASYNCIO:
+            self._start_consuming_asyncio(queue_name, routing_keys, callback, exclusive, with_routing_key)
+            return
+        
         self._consumer_cancelled = False
         retry_count = 0
         max_retries = 10
@@ -109,48 +286,73 @@ class RabbitMQClient:
                 self.connect()
                 
                 # Declarar cola y vincular a exchange
-                self.channel.queue_declare(queue=queue_name, durable=True)
-                self.channel.queue_bind(
-                    exchange='tickets',
-                    queue=queue_name,
-                    routing_key=routing_key
-                )
+                if exclusive:
+                    declared = self.channel.queue_declare(queue=queue_name, durable=False, exclusive=True, auto_delete=True)
+                else:
+                    declared = self.channel.queue_declare(queue=queue_name, durable=True)
+                self.backlog = declared.method.message_count
+                for key in routing_keys:
+                    self.channel.queue_bind(
+                        exchange='tickets',
+                        queue=queue_name,
+                        routing_key=key
+                    )
                 
-                print(f'✅ [RabbitMQ] Escuchando en cola: {queue_name}')
+                logger.info('✅ [RabbitMQ] Escuchando en cola: %s', queue_name)
                 
                 def message_handler(ch, method, properties, body):
                     """Callback para manejar mensajes recibidos"""
-                    print('═══════════════════════════════════════════════════════════')
-                    print(f'📨 [RABBITMQ-IA] Mensaje recibido!')
-                    print(f'   Routing Key: {method.routing_key}')
-                    print(f'   Body Size: {len(body)} bytes')
-                    
                     try:
                         message = json.loads(body)
-                        ticket_id = message.get('ticket', {}).get('id', 'NO_ID')
-                        print(f'   Ticket ID: {ticket_id}')
-                        print(f'   Message keys: {list(message.keys())}')
-                        print('═══════════════════════════════════════════════════════════')
+                        ticket_id = (message.get('ticket') or {}).get('id', 'NO_ID')
+                        logger.debug('📨 [RabbitMQ] Mensaje recibido: %s (%s bytes, ticket %s)',
+                                     method.routing_key, len(body), ticket_id,
+                                     extra={'routing_key': method.routing_key, 'ticket_id': ticket_id})
                         
-                        # Ejecutar callback en thread separado
-                        threading.Thread(
-                            target=partial(self._handle_message, callback, message),
-                            daemon=True
-                        ).start()
+                        args = (method.routing_key, message) if with_routing_key else (message,)
                     except json.JSONDecodeError as je:
-                        print(f'❌ [RabbitMQ] Error decodificando JSON: {je}')
-                    except Exception as e:
-                        print(f'❌ [RabbitMQ] Error procesando: {e}')
-                    finally:
+                        logger.error('❌ [RabbitMQ] Error decodificando JSON: %s', je)
                         ch.basic_ack(delivery_tag=method.delivery_tag)
+                        return
+                    
+                    if self.ack_mode == ACK_MODE_IMMEDIATE:
+                        # Ejecutar callback en thread separado
+                        try:
+                            threading.Thread(
+                                target=partial(self._handle_message, callback, *args),
+                                daemon=True
+                            ).start()
+                        except Exception as e:
+                            logger.error('❌ [RabbitMQ] Error procesando: %s', e)
+                        finally:
+                            ch.basic_ack(delivery_tag=method.delivery_tag)
+                        return
+                    
+                    # Pool acotado: el ack llega cuando el callback termina
+                    self._executor.submit(
+                        self._process_and_settle, connection, ch,
+                        method.delivery_tag, method.redelivered, callback, *args
+                    )
+                
+                connection = self.connection
+                if self.ack_mode == ACK_MODE_IMMEDIATE:
+                    prefetch_count = 1
+                else:
+                    # El broker deja de entregar cuando hay 'prefetch_count' mensajes sin ack
+                    prefetch_count = self.prefetch_count
+                    if self._executor is None:
+                        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f'rabbitmq-{queue_name}')
+                    logger.info('⚙️  [RabbitMQ] Workers: %s, prefetch: %s', self.workers, prefetch_count)
                 
                 # Configurar consumo
-                self.channel.basic_qos(prefetch_count=1)
+                self.channel.basic_qos(prefetch_count=prefetch_count)
                 self.channel.basic_consume(
                     queue=queue_name,
                     on_message_callback=message_handler
                 )
                 
+                self._schedule_backlog_poll(queue_name)
+                
                 # Empezar a consumir
                 self.channel.start_consuming()
                 
@@ -162,11 +364,11 @@ class RabbitMQClient:
                     
                 retry_count += 1
                 if retry_count >= max_retries:
-                    print(f'❌ [RabbitMQ] Máximo de reintentos alcanzado ({max_retries})')
+                    logger.error('❌ [RabbitMQ] Máximo de reintentos alcanzado (%s)', max_retries)
                     break
                 
                 wait_time = min(5 * retry_count, 30)  # 5s, 10s, 15s... máx 30s
-                print(f'⚠️  [RabbitMQ] Desconectado. Reintentando en {wait_time}s... (intento {retry_count}/{max_retries})')
+                logger.warning('⚠️  [RabbitMQ] Desconectado. Reintentando en %ss... (intento %s/%s)', wait_time, retry_count, max_retries)
                 time.sleep(wait_time)
                 
             except Exception as e:
@@ -175,9 +377,164 @@ class RabbitMQClient:
                     
                 retry_count += 1
                 if retry_count >= max_retries:
-                    print(f'❌ [RabbitMQ] Error crítico después de {max_retries} reintentos: {e}')
+                    logger.error('❌ [RabbitMQ] Error crítico después de %s reintentos: %s', max_retries, e)
                     break
                 
                 wait_time = min(5 * retry_count, 30)
-                print(f'⚠️  [RabbitMQ] Error: {e}. Reintentando en {wait_time}s...')
-                time.sleep(wait_time)
\ No newline at end of file
+                logger.warning('⚠️  [RabbitMQ] Error: %s. Reintentando en %ss...', e, wait_time)
+                time.sleep(wait_time)
+        
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    # ------------------------------------------------------------------
+    # Modo asyncio: AsyncioConnection sobre el event loop de la aplicación
+    # ------------------------------------------------------------------
+    
+    def _start_consuming_asyncio(self, queue_name: str, routing_keys: List[str], callback: Callable[..., Any],
+                                 exclusive: bool, with_routing_key: bool):
+        """Abrir la conexión asyncio y registrar el consumidor (no bloquea)"""
+        self._consumer_cancelled = False
+        self._loop = asyncio.get_running_loop()
+        consumer = (queue_name, routing_keys, callback, exclusive, with_routing_key)
+        
+        logger.info('🔌 [RabbitMQ] Conectando (asyncio) a %s...', self._display_url())
+        self._async_connection = AsyncioConnection(
+            parameters=self._build_parameters(),
+            on_open_callback=lambda conn: conn.channel(on_open_callback=partial(self._on_async_channel_open, consumer)),
+            on_open_error_callback=lambda conn, err: self._schedule_async_reconnect(consumer, err),
+            on_close_callback=lambda conn, reason: self._schedule_async_reconnect(consumer, reason),
+            custom_ioloop=self._loop
+        )
+    
+    def _on_async_channel_open(self, consumer, channel):
+        """Declarar exchange, cola y bindings; luego empezar a consumir"""
+        queue_name, routing_keys, callback, exclusive, with_routing_key = consumer
+        self._async_channel = channel
+        
+        def start(_frame=None):
+            # El prefetch limita los mensajes sin ack => limita los handlers en vuelo
+            channel.basic_qos(prefetch_count=self.max_in_flight, callback=lambda _f: channel.basic_consume(
+                queue=queue_name,
+                on_message_callback=partial(self._on_async_message, callback, with_routing_key)
+            ))
+            self._reconnect_attempt = 0
+            self._schedule_async_backlog_poll(channel, queue_name)
+            logger.info('✅ [RabbitMQ] Escuchando (asyncio) en cola: %s (máx. en vuelo: %s)', queue_name, self.max_in_flight)
+        
+        def bind(keys, _frame=None):
+            if not keys:
+                start()
+                return
+            channel.queue_bind(queue=queue_name, exchange='tickets', routing_key=keys[0],
+                               callback=partial(bind, keys[1:]))
+        
+        def declare_queue(_frame=None):
+            if exclusive:
+                channel.queue_declare(queue=queue_name, durable=False, exclusive=True, auto_delete=True,
+                                      callback=partial(bind, routing_keys))
+            else:
+                channel.queue_declare(queue=queue_name, durable=True, callback=partial(bind, routing_keys))
+        
+        channel.exchange_declare(exchange='tickets', exchange_type='topic', durable=True, callback=declare_queue)
+    
+    def _on_async_message(self, callback: Callable[..., Any], with_routing_key: bool, channel, method, properties, body):
+        """Recibir un mensaje y procesarlo como tarea del event loop"""
+        try:
+            message = json.loads(body)
+        except json.JSONDecodeError as je:
+            logger.error('❌ [RabbitMQ] Error decodificando JSON: %s', je)
+            channel.basic_ack(delivery_tag=method.delivery_tag)
+            return
+        
+        args = (method.routing_key, message) if with_routing_key else (message,)
+        task = self._loop.create_task(
+            self._dispatch_async(callback, args, channel, method.delivery_tag, method.redelivered)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _dispatch_async(self, callback: Callable[..., Any], args: tuple, channel, delivery_tag: int,
+                              redelivered: bool = False):
+        """Ejecutar el callback y confirmar el mensaje al terminar (nack con la misma política que el modo thread)"""
+        self._track_in_flight(1)
+        success = True
+        try:
+            if asyncio.iscoroutinefunction(callback):
+                await callback(*args)
+            else:
+                # Callbacks síncronos en el pool por defecto para no bloquear el loop
+                await self._loop.run_in_executor(None, partial(callback, *args))
+        except Exception as e:
+            success = False
+            logger.error('❌ [RabbitMQ] Error procesando mensaje: %s', e)
+        finally:
+            self._track_in_flight(-1)
+            if channel.is_open:
+                if success:
+                    channel.basic_ack(delivery_tag=delivery_tag)
+                else:
+                    channel.basic_nack(delivery_tag=delivery_tag, requeue=not redelivered)
+    
+    def _schedule_async_reconnect(self, consumer, reason):
+        """Reconectar con espera creciente si la conexión asyncio se pierde"""
+        self._async_channel = None
+        if self._consumer_cancelled:
+            return
+        self._reconnect_attempt += 1
+        wait_time = min(5 * self._reconnect_attempt, 30)
+        logger.warning('⚠️  [RabbitMQ] Conexión asyncio perdida (%s). Reintentando en %ss...', reason, wait_time)
+        self._loop.call_later(wait_time, partial(self._start_consuming_asyncio_safe, consumer))
+    
+    def _start_consuming_asyncio_safe(self, consumer):
+        if self._consumer_cancelled:
+            return
+        queue_name, routing_keys, callback, exclusive, with_routing_key = consumer
+        try:
+            self._start_consuming_asyncio(queue_name, routing_keys, callback, exclusive, with_routing_key)
+        except Exception as e:
+            self._schedule_async_reconnect(consumer, e)
+    
+    # ------------------------------------------------------------------
+    # Backlog: consulta pasiva de la cola (message_count) cada cierto tiempo
+    # ------------------------------------------------------------------
+    
+    def _schedule_backlog_poll(self, queue_name: str):
+        """Modo 'thread': la consulta corre en el hilo de la conexión bloqueante"""
+        if self.backlog_poll_seconds <= 0:
+            return
+        connection = self.connection
+        
+        def poll():
+            if self._consumer_cancelled or not self.channel or not self.channel.is_open:
+                return
+            try:
+                self.backlog = self.channel.queue_declare(queue=queue_name, passive=True).method.message_count
+            except Exception as e:
+                logger.debug('[RabbitMQ] No se pudo leer el backlog de %s: %s', queue_name, e)
+                return
+            connection.call_later(self.backlog_poll_seconds, poll)
+        
+        connection.call_later(self.backlog_poll_seconds, poll)
+    
+    def _schedule_async_backlog_poll(self, channel, queue_name: str):
+        """Modo 'asyncio': consulta no bloqueante reprogramada en el event loop"""
+        if self.backlog_poll_seconds <= 0:
+            return
+        
+        def on_declare(frame):
+            self.backlog = frame.method.message_count
+            self._loop.call_later(self.backlog_poll_seconds, poll)
+        
+        def poll():
+            if self._consumer_cancelled or channel is not self._async_channel or not channel.is_open:
+                return
+            channel.queue_declare(queue=queue_name, passive=True, callback=on_declare)
+        
+        poll()
+    
+    @property
+    def in_flight(self) -> int:
+        """Mensajes procesándose en este momento (ambos modos)"""
+        return self._in_flight
@@ -0,0 +1,152 @@
+# ia-svc/services/records.py
+"""
+Registros compactos (__slots__) de tickets y agentes para las fotografías en memoria.
+
+Solo guardan los campos que usa la asignación: estados, prioridades, grupos e IDs de
+agente se internan (una sola copia de cada cadena por proceso) y las fechas se guardan
+ya convertidas a epoch. La conversión desde el JSON de tickets-svc / usuarios-svc se
+hace en una sola pasada por lote; el JSON original se puede liberar en seguida.
+"""
+import sys
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:  # Sin NumPy las fechas se leen una por una
+    np = None
+    NUMPY_AVAILABLE = False
+
+_EPOCH = datetime(1970, 1, 1)
+NAN = float('nan')
+
+
+def to_epoch(value) -> float:
+    """
+    Segundos desde 1970 de una fecha ISO (o datetime), en hora de pared y al segundo:
+    la zona horaria se ignora igual que en el resto de las métricas. NaN si falta o
+    no se puede leer.
+    """
+    if not value:
+        return NAN
+    try:
+        if isinstance(value, str):
+            fecha = datetime.fromisoformat(value[:19])
+        else:
+            fecha = value.replace(tzinfo=None, microsecond=0)
+        return (fecha - _EPOCH).total_seconds()
+    except Exception:
+        return NAN
+
+
+def now_epoch() -> float:
+    """Ahora, con la misma referencia (UTC) que las fechas de tickets-svc"""
+    return to_epoch(datetime.utcnow())
+
+
+def epoch_column(values: Sequence) -> List[float]:
+    """to_epoch de una columna completa; con NumPy las fechas ISO se leen en bloque"""
+    if NUMPY_AVAILABLE:
+        try:
+            parsed = np.array([value[:19] if value else None for value in values], dtype='datetime64[s]')
+            return np.where(np.isnat(parsed), NAN, parsed.astype('int64').astype('float64')).tolist()
+        except (TypeError, ValueError):  # Alguna fecha ilegible o que no es texto: una por una
+            pass
+    return [to_epoch(value) for value in values]
+
+
+def intern(value):
+    """Una sola copia por proceso de las cadenas que se repiten (estados, prioridades, grupos, IDs)"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def extract_agent_id(ticket: Dict) -> Optional[str]:
+    """
+    Obtiene el ID del agente asignado de un ticket.
+    'agenteAsignado' puede venir como string (ID) o como objeto poblado ({_id, nombre, ...}).
+    """
+    agente_asignado = ticket.get('agenteAsignado')
+    if not agente_asignado:
+        return None
+    if isinstance(agente_asignado, dict):
+        return agente_asignado.get('_id')
+    return agente_asignado
+
+
+class TicketRecord:
+    """
+    Ticket con los campos que usan las métricas.
+
+    'assigned_at' es la fecha de asignación (o la de creación si no hay) y es desde
+    donde se mide la edad del ticket. Las fechas son epoch; NaN si faltan o no se
+    pudieron leer.
+    """
+
+    __slots__ = ('id', 'agent_id', 'estado', 'prioridad', 'created_at', 'assigned_at', 'updated_at')
+
+    def __init__(self, id: Optional[str], agent_id: Optional[str] = None, estado: Optional[str] = None,
+                 prioridad: Optional[str] = None, created_at: float = NAN, assigned_at: float = NAN,
+                 updated_at: float = NAN):
+        self.id = id
+        self.agent_id = intern(agent_id)
+        self.estado = intern(estado)
+        self.prioridad = intern(prioridad)
+        self.created_at = created_at
+        self.assigned_at = assigned_at
+        self.updated_at = updated_at
+
+    @classmethod
+    def from_json(cls, raw: Dict) -> 'TicketRecord':
+        return cls.from_json_batch([raw])[0]
+
+    @classmethod
+    def from_json_batch(cls, raws: Iterable[Dict]) -> List['TicketRecord']:
+        """Convertir una página (o una empresa completa) de tickets de tickets-svc"""
+        raws = raws if isinstance(raws, list) else list(raws)
+        created = epoch_column([raw.get('createdAt') for raw in raws])
+        assigned = epoch_column([raw.get('fechaAsignacion') or raw.get('createdAt') for raw in raws])
+        updated = epoch_column([raw.get('updatedAt') for raw in raws])
+        return [
+            cls(raw.get('_id') or raw.get('id'), extract_agent_id(raw), raw.get('estado'), raw.get('prioridad'),
+                created_at, assigned_at, updated_at)
+            for raw, created_at, assigned_at, updated_at in zip(raws, created, assigned, updated)
+        ]
+
+    def copy(self) -> 'TicketRecord':
+        return TicketRecord(self.id, self.agent_id, self.estado, self.prioridad,
+                            self.created_at, self.assigned_at, self.updated_at)
+
+    def __repr__(self) -> str:
+        return f'TicketRecord({self.id!r}, agente={self.agent_id!r}, estado={self.estado!r}, prioridad={self.prioridad!r})'
+
+
+class AgentRecord:
+    """Agente del roster: solo ID, nombre y grupos de atención (internados)"""
+
+    __slots__ = ('id', 'nombre', 'grupos')
+
+    def __init__(self, id: str, nombre: Optional[str] = None, grupos: Iterable[str] = ()):
+        self.id = intern(id)
+        self.nombre = nombre
+        self.grupos = tuple(intern(grupo) for grupo in grupos)
+
+    @classmethod
+    def from_json(cls, raw: Dict) -> 'AgentRecord':
+        """Usuario de usuarios-svc ('_id' o 'id', 'nombre', 'gruposDeAtencion')"""
+        return cls(raw.get('_id') or raw.get('id'), raw.get('nombre'), raw.get('gruposDeAtencion') or ())
+
+    @classmethod
+    def coerce(cls, value) -> 'AgentRecord':
+        """Aceptar tanto registros como dicts del JSON"""
+        return value if isinstance(value, cls) else cls.from_json(value)
+
+    def to_dict(self, metrics: Optional[Dict] = None) -> Dict:
+        """Representación para respuestas y eventos (con las métricas de la asignación, si se pasan)"""
+        data = {'_id': self.id, 'id': self.id, 'nombre': self.nombre, 'gruposDeAtencion': list(self.grupos)}
+        if metrics is not None:
+            data['metrics'] = metrics
+        return data
+
+    def __repr__(self) -> str:
+        return f'AgentRecord({self.id!r}, {self.nombre!r})'
@@ -0,0 +1,168 @@
+# ia-svc/services/resilience.py
+"""
+Resiliencia de las llamadas upstream: circuit breaker por host, reintentos con
+backoff exponencial y jitter, y presupuesto de tiempo (deadline) por ticket.
+
+- CircuitBreaker: cerrado -> abierto tras 'failure_threshold' fallos seguidos; abierto
+  rechaza al instante durante 'reset_timeout' segundos; luego medio abierto deja pasar
+  una sola petición de prueba que lo cierra (éxito) o lo vuelve a abrir (fallo).
+- RetryPolicy: espera aleatoria entre 0 y min(max_delay, base_delay * 2^intento)
+  ("full jitter"), para que los reintentos de muchos tickets no lleguen sincronizados.
+- deadline(): presupuesto de tiempo del ticket en un contextvar; se propaga entre await
+  y tareas de asyncio, y recorta timeouts y esperas de todas las llamadas del ticket.
+"""
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Valor numérico de cada estado para el gauge de Prometheus
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar('ia_deadline', default=None)
+
+
+class UpstreamUnavailable(Exception):
+    """El upstream no se llamó (o se dejó de reintentar) por el circuit breaker o el presupuesto"""
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f'Circuito abierto para {host} (reintento en {retry_in:.1f}s)')
+        self.host = host
+        self.retry_in = retry_in
+
+
+class DeadlineExceeded(UpstreamUnavailable):
+    def __init__(self, host: str):
+        super().__init__(f'Presupuesto de tiempo agotado antes de llamar a {host}')
+        self.host = host
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Presupuesto de tiempo para todo lo que se ejecute dentro del bloque.
+    Un presupuesto anidado nunca extiende al exterior. None o <= 0 = sin presupuesto.
+    """
+    if not seconds or seconds <= 0:
+        yield
+        return
+    expires_at = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(expires_at if outer is None else min(outer, expires_at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_budget() -> Optional[float]:
+    """Segundos que le quedan al presupuesto actual (None = sin presupuesto)"""
+    expires_at = _deadline.get()
+    if expires_at is None:
+        return None
+    return expires_at - time.monotonic()
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker de un host upstream.
+
+    Args:
+        name: Nombre lógico del host
+        failure_threshold: Fallos seguidos que abren el circuito
+        reset_timeout: Segundos abierto antes de dejar pasar una petición de prueba
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+        # Contadores expuestos en /health
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.failure_threshold > 0
+
+    def allow(self) -> bool:
+        """¿Se puede llamar al host ahora? (en medio abierto, solo una prueba a la vez)"""
+        if not self.enabled or self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self._probing = False
+        if self._probing:
+            self.rejected += 1
+            return False
+        self._probing = True
+        return True
+
+    def retry_in(self) -> float:
+        """Segundos hasta la siguiente petición de prueba"""
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def abandon(self):
+        """La petición permitida no llegó a completarse (cancelada o sin presupuesto): sin veredicto"""
+        self._probing = False
+
+    def record_success(self):
+        self.failures = 0
+        self._probing = False
+        self.state = CLOSED
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == HALF_OPEN or (self.enabled and self.failures >= self.failure_threshold):
+            if self.state != OPEN:
+                self.times_opened += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict:
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'rejected': self.rejected,
+            'times_opened': self.times_opened,
+            'failure_threshold': self.failure_threshold,
+            'reset_timeout': self.reset_timeout
+        }
+
+
+class RetryPolicy:
+    """
+    Reintentos con backoff exponencial y jitter completo.
+
+    Args:
+        max_attempts: Intentos totales (1 = sin reintentos)
+        base_delay: Espera base en segundos
+        max_delay: Tope de la espera entre intentos
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.1, max_delay: float = 2.0,
+                 rng: Optional[random.Random] = None):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = rng or random.Random()
+
+    def backoff(self, attempt: int) -> float:
+        """Espera antes del intento 'attempt + 1' (attempt empieza en 1)"""
+        return self._rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
@@ -0,0 +1,94 @@
+# ia-svc/services/roster_cache.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class RosterCache:
+    """
+    Caché por empresa del roster de agentes (respuesta de usuarios-svc ya indexada).
+
+    - Expira cada entrada después de 'ttl_seconds'.
+    - Limita el número de empresas en memoria (desaloja la menos usada, LRU).
+    - Se puede invalidar antes de tiempo por eventos de cambios de usuarios.
+    - Es thread-safe: las invalidaciones llegan desde el hilo del consumidor RabbitMQ.
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0, max_entries: int = 1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Contadores expuestos en /health
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def get(self, empresa_id: str) -> Optional[Any]:
+        """Roster de la empresa si está en caché y vigente; None si no"""
+        if not self.enabled:
+            self.misses += 1
+            return None
+
+        with self._lock:
+            entry = self._entries.get(empresa_id)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[empresa_id]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(empresa_id)
+            self.hits += 1
+            return value
+
+    def set(self, empresa_id: str, value: Any):
+        """Guardar el roster de la empresa"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._entries[empresa_id] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(empresa_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, empresa_id: Optional[str] = None):
+        """
+        Invalidar el roster de una empresa, o de todas si no se indica.
+
+        Args:
+            empresa_id: ID de la empresa (None = vaciar toda la caché)
+        """
+        with self._lock:
+            if empresa_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(empresa_id, None)
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso de la caché"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 3) if total else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'ttl_seconds': self.ttl_seconds,
+            'max_entries': self.max_entries
+        }
@@ -0,0 +1,243 @@
+# ia-svc/services/service_catalog.py
+import json
+import re
+import unicodedata
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Similitud mínima (Jaccard de trigramas) para aceptar una coincidencia aproximada
+DEFAULT_FUZZY_THRESHOLD = 0.5
+
+# Máximo de consultas aproximadas memorizadas por índice
+FUZZY_CACHE_SIZE = 4096
+
+
+def parse_sla_to_minutes(sla_str: str) -> Optional[int]:
+    """
+    Convierte strings de SLA (ej. '4 horas', '20 horas', '2hrs') a minutos.
+    Devuelve None si no se puede parsear.
+    """
+    if not sla_str or 'NA' in sla_str or 'Definición' in sla_str:
+        return None
+
+    # Extraer el primer número que encuentre
+    match = re.search(r'(\d+)', sla_str)
+    if not match:
+        return None
+
+    minutes = int(match.group(1))
+
+    # Si solo es un número, asumimos horas, pero 'hrs' o 'hora' lo confirma
+    if 'min' in sla_str.lower():
+        return minutes
+    elif 'hrs' in sla_str.lower() or 'hora' in sla_str.lower():
+        return minutes * 60
+    else:
+        # Asumir horas si no se especifica (como en "4")
+        return minutes * 60
+
+
+def normalize_service_name(name: Optional[str]) -> str:
+    """
+    Llave de búsqueda de un servicio: sin acentos, sin mayúsculas y con
+    espacios colapsados ("  Robo de equipo CÓMPUTO " -> "robo de equipo computo").
+    """
+    if not name:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', name)
+    without_accents = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(without_accents.casefold().split())
+
+
+def name_trigrams(key: str) -> Set[str]:
+    """Trigramas de caracteres de un nombre ya normalizado (con relleno en los bordes)"""
+    padded = f'  {key} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FrozenClassification(dict):
+    """
+    Clasificación precalculada e inmutable.
+
+    Es un dict (se serializa a JSON tal cual) pero rechaza cualquier modificación,
+    de modo que el mismo objeto se puede devolver a todos los llamadores sin copiarlo.
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('La clasificación del catálogo es de solo lectura; usa dict(clasificacion) para modificarla')
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (FrozenClassification, (dict(self),))
+
+
+def build_classification(entry: Dict, default: Optional[Dict] = None) -> FrozenClassification:
+    """
+    Clasificación en el formato que espera tickets-svc a partir de una entrada del catálogo.
+
+    Acepta tanto el formato de catalogo.json (tipo/prioridad capitalizados, 'sla',
+    'gruposDeAtencion') como el del mapa interno ('sla_cliente_min', 'grupo_atencion').
+    Los campos ausentes se toman de 'default'.
+    """
+    default = default or {}
+
+    grupo = entry.get('grupo_atencion') or entry.get('gruposDeAtencion')
+    if isinstance(grupo, list):
+        grupo = grupo[0] if grupo else None
+
+    if 'sla_cliente_min' in entry:
+        sla_min = entry['sla_cliente_min']
+    else:
+        sla_min = parse_sla_to_minutes(str(entry.get('sla') or ''))
+    if sla_min is None:
+        sla_min = default.get('tiempoResolucion')
+
+    tipo = entry.get('tipo')
+    prioridad = entry.get('prioridad')
+
+    return FrozenClassification({
+        'tipo': tipo.lower() if tipo else default.get('tipo'),
+        'prioridad': prioridad.lower() if prioridad else default.get('prioridad'),
+        'categoria': entry.get('categoria') or default.get('categoria'),
+        'grupo_atencion': grupo or default.get('grupo_atencion'),
+        'tiempoResolucion': sla_min,
+        'tiempoRespuesta': sla_min
+    })
+
+
+class ServiceCatalogIndex:
+    """
+    Índice inmutable del catálogo de servicios.
+
+    Todo el trabajo (normalizar nombres, parsear SLA, armar el resultado) se hace
+    una sola vez al construirlo; classify_ticket queda en una búsqueda en un dict.
+    """
+
+    def __init__(self, entries: Iterable[Dict], default: Dict, source: str = 'memoria'):
+        self.source = source
+        self.loaded_at = datetime.utcnow()
+        self.default = FrozenClassification(build_classification(default), servicioCatalogo=None, confianza=0.0)
+        self.duplicates: List[str] = []
+
+        by_key: Dict[str, FrozenClassification] = {}
+        names: Dict[str, str] = {}
+        for entry in entries:
+            name = entry.get('nombre')
+            key = normalize_service_name(name)
+            if not key:
+                continue
+            if key in by_key:
+                # Gana la primera aparición (mismo criterio que el mapa interno)
+                self.duplicates.append(name)
+                continue
+            by_key[key] = FrozenClassification(build_classification(entry, self.default),
+                                               servicioCatalogo=name, confianza=1.0)
+            names[key] = name
+
+        self._by_key = by_key
+        self._names = names
+
+        # Índice invertido trigrama -> posiciones en _keys, para la búsqueda aproximada
+        self._keys: List[str] = list(by_key)
+        self._trigram_counts: List[int] = []
+        postings: Dict[str, List[int]] = {}
+        for position, key in enumerate(self._keys):
+            grams = name_trigrams(key)
+            self._trigram_counts.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(position)
+        self._postings = postings
+        self._fuzzy_cache: Dict[str, Optional[FrozenClassification]] = {}
+
+    @classmethod
+    def from_file(cls, path: str, default: Dict) -> 'ServiceCatalogIndex':
+        """Construir el índice desde un catalogo.json (lista de servicios)"""
+        with open(path, encoding='utf-8') as f:
+            entries = json.load(f)
+        if not isinstance(entries, list):
+            raise ValueError(f"El catálogo {path} debe ser una lista de servicios")
+        return cls(entries, default, source=path)
+
+    @classmethod
+    def from_mapping(cls, catalog_by_name: Dict[str, Dict], default: Dict) -> 'ServiceCatalogIndex':
+        """Construir el índice desde un mapa {nombre: datos} (p. ej. SERVICE_CATALOG_BY_NAME)"""
+        entries = [dict(data, nombre=name) for name, data in catalog_by_name.items()]
+        return cls(entries, default, source='mapa interno')
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def __contains__(self, service_name: str) -> bool:
+        return normalize_service_name(service_name) in self._by_key
+
+    @property
+    def names(self) -> List[str]:
+        """Nombres originales de los servicios indexados"""
+        return list(self._names.values())
+
+    def lookup(self, service_name: Optional[str]) -> Optional[FrozenClassification]:
+        """Clasificación del servicio (insensible a acentos y mayúsculas) o None"""
+        return self._by_key.get(normalize_service_name(service_name))
+
+    def fuzzy_match(self, service_name: Optional[str],
+                    threshold: float = DEFAULT_FUZZY_THRESHOLD) -> Optional[Tuple[str, float]]:
+        """
+        Servicio del catálogo más parecido por similitud de trigramas (Jaccard).
+
+        Solo se recorren las listas de los trigramas de la consulta, así que el costo
+        depende de cuántos servicios comparten trigramas con ella y no del tamaño
+        total del catálogo.
+
+        Returns:
+            (nombre del servicio, similitud entre 0 y 1) o None si ninguno alcanza 'threshold'
+        """
+        key = normalize_service_name(service_name)
+        if not key:
+            return None
+
+        query = name_trigrams(key)
+        shared: Dict[int, int] = {}
+        for gram in query:
+            for position in self._postings.get(gram, ()):
+                shared[position] = shared.get(position, 0) + 1
+
+        best_position, best_score = None, 0.0
+        query_size = len(query)
+        for position, common in shared.items():
+            score = common / (query_size + self._trigram_counts[position] - common)
+            if score > best_score:
+                best_position, best_score = position, score
+
+        if best_position is None or best_score < threshold:
+            return None
+        return self._names[self._keys[best_position]], best_score
+
+    def lookup_fuzzy(self, service_name: Optional[str],
+                     threshold: float = DEFAULT_FUZZY_THRESHOLD) -> Optional[FrozenClassification]:
+        """
+        Clasificación del servicio más parecido, con 'confianza' = similitud y
+        'servicioCatalogo' = nombre con el que coincidió. None si no hay candidato.
+        """
+        key = normalize_service_name(service_name)
+        cache_key = f'{threshold}|{key}'
+        if cache_key in self._fuzzy_cache:
+            return self._fuzzy_cache[cache_key]
+
+        match = self.fuzzy_match(service_name, threshold)
+        result = None
+        if match is not None:
+            name, score = match
+            result = FrozenClassification(self.lookup(name), confianza=round(score, 3))
+
+        if len(self._fuzzy_cache) >= FUZZY_CACHE_SIZE:
+            self._fuzzy_cache.clear()
+        self._fuzzy_cache[cache_key] = result
+        return result
@@ -0,0 +1,147 @@
+# ia-svc/services/sharding.py
+"""
+Reparto de tickets entre procesos consumidores por empresa (afinidad de cachés).
+
+Un anillo de hash consistente asigna cada empresaId a un shard; el enrutador
+(worker.py) republica cada 'ticket.creado' con la routing key 'ia.shard.<n>' en el
+exchange 'tickets' y cada proceso consume la cola durable de su shard. Así el roster
+y el libro mayor de una empresa viven calientes en un solo proceso, y al cambiar el
+número de shards solo se mueve ~1/N de las empresas.
+
+Las routing keys no empiezan con 'ticket.' para no llegar a los consumidores de
+'ticket.#' de otros servicios.
+"""
+import asyncio
+import bisect
+import hashlib
+import os
+import signal
+from typing import Dict, List, Optional
+
+from services.rabbitmq_client import RabbitMQClient, CONSUMER_MODE_ASYNCIO
+
+# Exchange y routing keys de los shards
+EXCHANGE = 'tickets'
+SHARD_ROUTING_PREFIX = 'ia.shard'
+SHARD_QUEUE_PREFIX = 'ia_tickets.shard'
+
+
+def shard_routing_key(shard: int) -> str:
+    return f'{SHARD_ROUTING_PREFIX}.{shard}'
+
+
+def shard_queue(shard: int) -> str:
+    return f'{SHARD_QUEUE_PREFIX}.{shard}'
+
+
+def shard_path(path: str, shard: int) -> str:
+    """
+    Archivo local propio del shard ('data/event_outbox.db' -> 'data/event_outbox.shard-0.db'):
+    cada proceso drena solo su outbox y, al relanzarse, recupera lo que dejó pendiente.
+    """
+    root, ext = os.path.splitext(path)
+    return f'{root}.shard-{shard}{ext}'
+
+
+def company_of(message: Dict) -> str:
+    """empresaId de un mensaje 'ticket.creado' (cadena vacía si no trae)"""
+    empresa_id = (message.get('ticket') or {}).get('empresaId') or message.get('empresaId') or ''
+    if isinstance(empresa_id, dict):
+        empresa_id = empresa_id.get('_id') or ''
+    return str(empresa_id)
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class ShardRing:
+    """
+    Anillo de hash consistente con nodos virtuales.
+
+    Args:
+        shards: Número de shards (procesos consumidores)
+        replicas: Nodos virtuales por shard (reparto más parejo entre empresas)
+    """
+
+    def __init__(self, shards: int, replicas: int = 100):
+        if shards < 1:
+            raise ValueError('Se necesita al menos un shard')
+        self.shards = shards
+        points = sorted((_hash(f'shard-{shard}#{replica}'), shard)
+                        for shard in range(shards) for replica in range(replicas))
+        self._points: List[int] = [point for point, _ in points]
+        self._owners: List[int] = [shard for _, shard in points]
+
+    def shard_for(self, key: Optional[str]) -> int:
+        """Shard dueño de la llave (empresaId)"""
+        if self.shards == 1:
+            return 0
+        index = bisect.bisect(self._points, _hash(key or ''))
+        return self._owners[index % len(self._owners)]
+
+
+def declare_shard_queues(client: RabbitMQClient, shards: int):
+    """
+    Declarar la cola durable de cada shard y su binding, para que nada de lo que
+    enrute el enrutador se pierda aunque el proceso del shard aún no haya arrancado.
+    Se usa una conexión aparte que se cierra al terminar.
+    """
+    with client.temporary_channel() as channel:
+        for shard in range(shards):
+            channel.queue_declare(queue=shard_queue(shard), durable=True)
+            channel.queue_bind(exchange=EXCHANGE, queue=shard_queue(shard), routing_key=shard_routing_key(shard))
+
+
+class ShardRouter:
+    """
+    Enrutador de 'ticket.creado' hacia las colas de los shards.
+
+    Consume la cola 'ia_tickets' (modo asyncio, ack al terminar) y republica cada mensaje
+    con confirmación del broker; el mensaje original solo se confirma cuando el broker
+    aceptó la copia, así que una caída a la mitad no pierde tickets.
+
+    Las copias se publican en el orden de llegada y sus confirmaciones se esperan en
+    paralelo: hasta 'confirm_window' mensajes en vuelo (= prefetch del consumidor).
+
+    Args:
+        url: URL de RabbitMQ
+        shards: Número de shards
+        publisher: EventPublisher con confirmaciones (ya iniciado o no)
+        confirm_timeout: Segundos máximos esperando la confirmación de cada copia
+        confirm_window: Copias esperando confirmación a la vez (default: IA_ROUTER_CONFIRM_WINDOW o 100)
+    """
+
+    def __init__(self, url: str, shards: int, publisher, consumer: Optional[RabbitMQClient] = None,
+                 confirm_timeout: float = 30.0, confirm_window: Optional[int] = None):
+        self.ring = ShardRing(shards)
+        self.publisher = publisher
+        self.confirm_window = confirm_window or int(os.getenv('IA_ROUTER_CONFIRM_WINDOW', 100))
+        self.consumer = consumer or RabbitMQClient(url, consumer_mode=CONSUMER_MODE_ASYNCIO,
+                                                   max_in_flight=self.confirm_window)
+        self.confirm_timeout = confirm_timeout
+        self.routed = [0] * shards
+
+    async def route(self, message: Dict):
+        """Republicar el mensaje en la cola de su shard y esperar la confirmación"""
+        shard = self.ring.shard_for(company_of(message))
+        # publish() corre antes del primer await: las copias salen en el orden de llegada
+        future = self.publisher.publish(shard_routing_key(shard), message)
+        await asyncio.wait_for(asyncio.wrap_future(future), self.confirm_timeout)
+        self.routed[shard] += 1
+        return shard
+
+    def run(self, queue_name: str = 'ia_tickets', routing_key: str = 'ticket.creado'):
+        """Declarar las colas de los shards y consumir hasta SIGTERM/SIGINT (bloquea el hilo que lo llama)"""
+        self.publisher.start()
+        declare_shard_queues(self.consumer, self.ring.shards)
+        asyncio.run(self._consume(queue_name, routing_key))
+
+    async def _consume(self, queue_name: str, routing_key: str):
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, stop.set)
+        self.consumer.start_consuming(queue_name=queue_name, routing_key=routing_key, callback=self.route)
+        await stop.wait()
+        self.consumer.close()
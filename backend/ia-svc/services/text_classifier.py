@@ -0,0 +1,287 @@
+# ia-svc/services/text_classifier.py
+"""
+Clasificador de texto ligero (opcional) sobre titulo/descripcion del ticket.
+
+- Características: bolsa de palabras con hashing (palabras + bigramas), tf logarítmico
+  y normalización L2. No hay vocabulario que guardar.
+- Modelo: regresión logística multinomial (softmax) entrenada con NumPy puro.
+- Clases: nombres de servicio del catálogo; la clasificación completa sale del catálogo.
+- Artefacto: directorio con weights.npy, bias.npy y meta.json. Los .npy se abren con
+  mmap_mode='r', así que arrancar no copia los pesos y varios procesos comparten las
+  mismas páginas del archivo.
+
+Entrenamiento:
+    python -m services.text_classifier --catalog data/catalogo.json \\
+        --tickets historico.jsonl --out data/text_classifier
+"""
+import argparse
+import json
+import os
+import zlib
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:  # El clasificador de texto es opcional
+    np = None
+    NUMPY_AVAILABLE = False
+
+from logger import get_logger
+from services.service_catalog import normalize_service_name
+
+logger = get_logger(__name__)
+
+DEFAULT_N_FEATURES = 2 ** 16
+ARTIFACT_VERSION = 1
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Palabras normalizadas (sin acentos/mayúsculas) más bigramas de palabras"""
+    words = [w for w in ''.join(c if c.isalnum() else ' ' for c in normalize_service_name(text)).split()
+             if len(w) > 1]
+    return words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+
+
+def ticket_text(ticket: Dict) -> str:
+    """Texto de un ticket para el modelo"""
+    return f"{ticket.get('titulo') or ''} {ticket.get('descripcion') or ''}".strip()
+
+
+class HashingVectorizer:
+    """Convierte textos en matrices dispersas (filas, columnas, valores) de tamaño fijo"""
+
+    def __init__(self, n_features: int = DEFAULT_N_FEATURES):
+        self.n_features = n_features
+
+    def _index(self, token: str) -> Tuple[int, float]:
+        h = zlib.crc32(token.encode('utf-8'))
+        # El bit alto decide el signo para reducir el sesgo de las colisiones
+        return h % self.n_features, (1.0 if h & 0x80000000 else -1.0)
+
+    def transform(self, texts: Sequence[str]):
+        """
+        Returns:
+            (rows, cols, vals) ordenados por fila, con tf logarítmico y norma L2 por fila
+        """
+        rows: List[int] = []
+        cols: List[int] = []
+        vals: List[float] = []
+        for row, text in enumerate(texts):
+            counts: Dict[int, float] = {}
+            for token in tokenize(text):
+                col, sign = self._index(token)
+                counts[col] = counts.get(col, 0.0) + sign
+            for col, value in counts.items():
+                if value:
+                    rows.append(row)
+                    cols.append(col)
+                    vals.append(value)
+
+        rows_a = np.asarray(rows, dtype=np.int64)
+        cols_a = np.asarray(cols, dtype=np.int64)
+        vals_a = np.asarray(vals, dtype=np.float32)
+        vals_a = np.sign(vals_a) * np.log1p(np.abs(vals_a))
+
+        norms = np.zeros(len(texts), dtype=np.float32)
+        np.add.at(norms, rows_a, vals_a * vals_a)
+        norms = np.sqrt(norms)
+        norms[norms == 0] = 1.0
+        return rows_a, cols_a, vals_a / norms[rows_a]
+
+
+class TextClassifier:
+    """Softmax lineal sobre características con hashing"""
+
+    def __init__(self, weights, bias, labels: List[str], n_features: int, meta: Optional[Dict] = None):
+        self.weights = weights          # (n_features, n_clases), float32 (posiblemente mmap)
+        self.bias = bias                # (n_clases,)
+        self.labels = list(labels)
+        self.vectorizer = HashingVectorizer(n_features)
+        self.meta = meta or {}
+
+    # ------------------------------------------------------------------
+    # Inferencia
+    # ------------------------------------------------------------------
+
+    def _logits(self, rows, cols, vals, n_rows: int):
+        logits = np.tile(np.asarray(self.bias, dtype=np.float32), (n_rows, 1))
+        if len(cols):
+            contributions = self.weights[cols] * vals[:, None]
+            starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+            logits[rows[starts]] += np.add.reduceat(contributions, starts, axis=0)
+        return logits
+
+    @staticmethod
+    def _softmax(logits):
+        logits = logits - logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict_proba(self, texts: Sequence[str]):
+        """Probabilidades (n_textos, n_clases) para un lote de textos"""
+        rows, cols, vals = self.vectorizer.transform(texts)
+        return self._softmax(self._logits(rows, cols, vals, len(texts)))
+
+    def predict(self, texts: Sequence[str]) -> List[Tuple[str, float]]:
+        """(servicio, probabilidad) más probable para cada texto del lote"""
+        if not texts:
+            return []
+        probs = self.predict_proba(texts)
+        best = probs.argmax(axis=1)
+        return [(self.labels[i], float(probs[row, i])) for row, i in enumerate(best)]
+
+    # ------------------------------------------------------------------
+    # Entrenamiento
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def train(cls, texts: Sequence[str], labels: Sequence[str], n_features: int = DEFAULT_N_FEATURES,
+              epochs: int = 30, learning_rate: float = 20.0, l2: float = 1e-4,
+              batch_size: int = 32, seed: int = 0) -> 'TextClassifier':
+        """Entrenar con descenso de gradiente por mini-lotes (entropía cruzada + L2)"""
+        classes = sorted(set(labels))
+        class_index = {label: i for i, label in enumerate(classes)}
+        y = np.asarray([class_index[label] for label in labels], dtype=np.int64)
+
+        model = cls(np.zeros((n_features, len(classes)), dtype=np.float32),
+                    np.zeros(len(classes), dtype=np.float32), classes, n_features)
+        vectorizer = model.vectorizer
+        rng = np.random.default_rng(seed)
+        texts = list(texts)
+
+        for _ in range(epochs):
+            order = rng.permutation(len(texts))
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                rows, cols, vals = vectorizer.transform([texts[i] for i in batch])
+                probs = cls._softmax(model._logits(rows, cols, vals, len(batch)))
+                probs[np.arange(len(batch)), y[batch]] -= 1.0
+                probs /= len(batch)
+
+                # Gradiente solo sobre las filas de pesos que aparecen en el lote
+                touched, inverse = np.unique(cols, return_inverse=True)
+                grad_w = np.zeros((len(touched), len(classes)), dtype=np.float32)
+                np.add.at(grad_w, inverse, vals[:, None] * probs[rows])
+                grad_w += l2 * model.weights[touched]
+
+                model.weights[touched] -= learning_rate * grad_w
+                model.bias -= learning_rate * probs.sum(axis=0)
+
+        model.meta = {
+            'version': ARTIFACT_VERSION,
+            'trained_at': datetime.utcnow().isoformat() + 'Z',
+            'samples': len(texts),
+            'epochs': epochs
+        }
+        return model
+
+    # ------------------------------------------------------------------
+    # Artefacto
+    # ------------------------------------------------------------------
+
+    def save(self, directory: str):
+        """Guardar weights.npy, bias.npy y meta.json en 'directory'"""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'weights.npy'), np.ascontiguousarray(self.weights, dtype=np.float32))
+        np.save(os.path.join(directory, 'bias.npy'), np.asarray(self.bias, dtype=np.float32))
+        meta = dict(self.meta, labels=self.labels, n_features=self.vectorizer.n_features)
+        with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, directory: str) -> 'TextClassifier':
+        """Abrir el artefacto con los pesos mapeados en memoria (sin copiarlos)"""
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != ARTIFACT_VERSION:
+            raise ValueError(f"Versión de artefacto no soportada: {meta.get('version')}")
+        weights = np.load(os.path.join(directory, 'weights.npy'), mmap_mode='r')
+        bias = np.load(os.path.join(directory, 'bias.npy'))
+        if weights.shape != (meta['n_features'], len(meta['labels'])):
+            raise ValueError(f"Forma de pesos inesperada: {weights.shape}")
+        return cls(weights, bias, meta['labels'], meta['n_features'], meta)
+
+
+def load_text_classifier(directory: Optional[str]) -> Optional[TextClassifier]:
+    """Cargar el modelo si NumPy y el artefacto están disponibles; None si no"""
+    if not directory or not os.path.exists(os.path.join(directory, 'meta.json')):
+        return None
+    if not NUMPY_AVAILABLE:
+        logger.warning('⚠️ Modelo de texto disponible pero NumPy no está instalado. Se omite.')
+        return None
+    try:
+        model = TextClassifier.load(directory)
+    except Exception as e:
+        logger.warning('⚠️ No se pudo cargar el modelo de texto %s: %s', directory, e)
+        return None
+    logger.info('🧠 Modelo de texto cargado: %s servicios (%s)', len(model.labels), directory)
+    return model
+
+
+def build_training_set(catalog: Iterable[Dict], tickets: Iterable[Dict]) -> Tuple[List[str], List[str]]:
+    """
+    Ejemplos (texto, servicio) a partir del catálogo y de tickets históricos.
+
+    Cada servicio aporta su nombre y su categoría como ejemplo; cada ticket histórico
+    con 'servicioNombre' conocido aporta su titulo + descripcion.
+    """
+    services = {}
+    for entry in catalog:
+        name = entry.get('nombre')
+        if name:
+            services[normalize_service_name(name)] = name
+
+    texts, labels = [], []
+    for key, name in services.items():
+        texts.append(name)
+        labels.append(name)
+    for entry in catalog:
+        name = entry.get('nombre')
+        if name and entry.get('categoria'):
+            texts.append(f"{entry['categoria']} {name}")
+            labels.append(services[normalize_service_name(name)])
+
+    for ticket in tickets:
+        name = services.get(normalize_service_name(ticket.get('servicioNombre')))
+        text = ticket_text(ticket)
+        if name and text:
+            texts.append(text)
+            labels.append(name)
+    return texts, labels
+
+
+def _read_records(path: str) -> List[Dict]:
+    """Leer un arreglo JSON o un archivo NDJSON"""
+    with open(path, encoding='utf-8') as f:
+        content = f.read()
+    if content.lstrip().startswith('['):
+        return json.loads(content)
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Entrenar el clasificador de texto de tickets')
+    parser.add_argument('--catalog', default=os.path.join(os.path.dirname(__file__), '..', 'data', 'catalogo.json'))
+    parser.add_argument('--tickets', help='Tickets históricos (JSON o NDJSON) con titulo, descripcion y servicioNombre')
+    parser.add_argument('--out', default=os.path.join(os.path.dirname(__file__), '..', 'data', 'text_classifier'))
+    parser.add_argument('--features', type=int, default=DEFAULT_N_FEATURES)
+    parser.add_argument('--epochs', type=int, default=30)
+    args = parser.parse_args(argv)
+
+    if not NUMPY_AVAILABLE:
+        parser.error('NumPy es necesario para entrenar el modelo')
+
+    catalog = _read_records(args.catalog)
+    tickets = _read_records(args.tickets) if args.tickets else []
+    texts, labels = build_training_set(catalog, tickets)
+    print(f"Entrenando con {len(texts)} ejemplos, {len(set(labels))} servicios...")
+
+    model = TextClassifier.train(texts, labels, n_features=args.features, epochs=args.epochs)
+    model.save(args.out)
+    print(f"✅ Modelo guardado en {args.out}")
+
+
+if __name__ == '__main__':
+    main()
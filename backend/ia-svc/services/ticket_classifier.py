@@ -1,31 +1,25 @@
 # Modulos por separado/ia-svc/services/ticket_classifier.py
 import os
-from typing import Dict, Optional
-import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
 
-def parse_sla_to_minutes(sla_str: str) -> Optional[int]:
-    """
-    Convierte strings de SLA (ej. '4 horas', '20 horas', '2hrs') a minutos.
-    Devuelve None si no se puede parsear.
-    """
-    if not sla_str or 'NA' in sla_str or 'Definición' in sla_str:
-        return None
-    
-    # Extraer el primer número que encuentre
-    match = re.search(r'(\d+)', sla_str)
-    if not match:
-        return None
-        
-    minutes = int(match.group(1))
-    
-    # Si solo es un número, asumimos horas, pero 'hrs' o 'hora' lo confirma
-    if 'min' in sla_str.lower():
-        return minutes
-    elif 'hrs' in sla_str.lower() or 'hora' in sla_str.lower():
-        return minutes * 60
-    else:
-        # Asumir horas si no se especifica (como en "4")
-        return minutes * 60
+from logger import get_logger
+from services.service_catalog import (
+    ServiceCatalogIndex, FrozenClassification, DEFAULT_FUZZY_THRESHOLD, parse_sla_to_minutes
+)
+from services.text_classifier import TextClassifier, load_text_classifier, ticket_text
+
+logger = get_logger(__name__)
+
+# Catálogo completo generado por tickets-svc/generate_catalog.py
+DEFAULT_CATALOG_PATH = Path(__file__).resolve().parent.parent / 'data' / 'catalogo.json'
+
+# Artefacto del modelo de texto (opcional, ver services/text_classifier.py)
+DEFAULT_TEXT_MODEL_PATH = Path(__file__).resolve().parent.parent / 'data' / 'text_classifier'
+
+# Evento que pide recargar el catálogo (exchange 'tickets')
+CATALOG_UPDATED_ROUTING_KEY = 'catalogo.actualizado'
 
 """
 ======================================================================
@@ -101,41 +95,265 @@ DEFAULT_CLASSIFICATION = {
     "grupo_atencion": "Mesa de Servicio" # Grupo de atención por defecto
 }
 
+def resolve_catalog_path(path: Optional[str] = None) -> str:
+    """Ruta del catalogo.json: argumento, SERVICE_CATALOG_PATH o data/catalogo.json"""
+    return path or os.getenv('SERVICE_CATALOG_PATH') or str(DEFAULT_CATALOG_PATH)
+
+
+def load_service_catalog(path: Optional[str] = None) -> ServiceCatalogIndex:
+    """
+    Construir el índice del catálogo de servicios.
+
+    Usa el catalogo.json indicado (o SERVICE_CATALOG_PATH / data/catalogo.json);
+    si no existe o no se puede leer, usa SERVICE_CATALOG_BY_NAME.
+    """
+    path = resolve_catalog_path(path)
+    if os.path.exists(path):
+        try:
+            return ServiceCatalogIndex.from_file(path, DEFAULT_CLASSIFICATION)
+        except Exception as e:
+            logger.warning('⚠️ No se pudo cargar el catálogo %s: %s. Usando mapa interno.', path, e)
+    else:
+        logger.warning('⚠️ Catálogo %s no encontrado. Usando mapa interno.', path)
+    return ServiceCatalogIndex.from_mapping(SERVICE_CATALOG_BY_NAME, DEFAULT_CLASSIFICATION)
+
+
+def validate_catalog(index: ServiceCatalogIndex):
+    """
+    Validar un índice recién construido antes de ponerlo en servicio.
+
+    Raises:
+        ValueError: si el índice está vacío o alguna clasificación quedó incompleta
+    """
+    if len(index) == 0:
+        raise ValueError("El catálogo no contiene servicios")
+    for name in index.names:
+        classification = index.lookup(name)
+        if not classification.get('grupo_atencion') or not classification.get('prioridad'):
+            raise ValueError(f"Servicio '{name}' sin grupo de atención o prioridad")
+
+
 class TicketClassifier:
-    def __init__(self):
-        # El vectorizador y el modelo ya no son necesarios para esta lógica
-        print("Clasificador de tickets basado en Catálogo de Servicios INICIADO.")
+    def __init__(self, catalog_path: Optional[str] = None, fuzzy_threshold: Optional[float] = None,
+                 text_model: Optional[TextClassifier] = None):
+        self.catalog_path = resolve_catalog_path(catalog_path)
+        # Modelo de texto para tickets sin 'servicioNombre' reconocible (opcional)
+        if text_model is None:
+            text_model = load_text_classifier(os.getenv('TEXT_CLASSIFIER_PATH') or str(DEFAULT_TEXT_MODEL_PATH))
+        self.text_model = text_model
+        self.text_min_confidence = float(os.getenv('TEXT_CLASSIFIER_MIN_CONFIDENCE', 0.2))
+        # Similitud mínima para la coincidencia aproximada de 'servicioNombre' (0 = desactivada)
+        if fuzzy_threshold is None:
+            fuzzy_threshold = float(os.getenv('SERVICE_CATALOG_FUZZY_THRESHOLD', DEFAULT_FUZZY_THRESHOLD))
+        self.fuzzy_threshold = fuzzy_threshold
+        # Índice precompilado del catálogo (inmutable). Las recargas construyen uno
+        # nuevo aparte y reemplazan la referencia de una sola vez.
+        self.catalog = load_service_catalog(self.catalog_path)
+        self._catalog_signature = self._file_signature()
+        self._reload_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+        self.reloads = 0
+        self.reload_errors = 0
+        logger.info('Clasificador de tickets basado en Catálogo de Servicios INICIADO (%s servicios, fuente: %s).',
+                    len(self.catalog), self.catalog.source)
+
+    def _file_signature(self) -> Optional[tuple]:
+        """(mtime, tamaño) del archivo del catálogo, o None si no existe"""
+        try:
+            stat = os.stat(self.catalog_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload_catalog(self, entries: Optional[List[Dict]] = None, force: bool = False) -> bool:
+        """
+        Reconstruir el índice y reemplazarlo de forma atómica.
+
+        El índice nuevo se construye y valida sin tocar el actual; los lectores
+        siguen clasificando con el anterior hasta el intercambio de referencia.
+
+        Args:
+            entries: Servicios ya recibidos (p. ej. en el evento); si no, se lee el archivo
+            force: Recargar aunque el archivo no haya cambiado
+
+        Returns:
+            True si se instaló un índice nuevo
+        """
+        with self._reload_lock:
+            signature = self._file_signature()
+            if entries is None and not force and signature == self._catalog_signature:
+                return False
+            try:
+                if entries is not None:
+                    index = ServiceCatalogIndex(entries, DEFAULT_CLASSIFICATION, source='evento')
+                else:
+                    index = ServiceCatalogIndex.from_file(self.catalog_path, DEFAULT_CLASSIFICATION)
+                validate_catalog(index)
+            except Exception as e:
+                self.reload_errors += 1
+                # Se conserva el índice anterior; no se reintenta hasta que el archivo cambie otra vez
+                self._catalog_signature = signature
+                logger.warning('⚠️ Catálogo no recargado, se conserva el anterior: %s', e)
+                return False
+
+            self.catalog = index
+            self._catalog_signature = signature
+            self.reloads += 1
+            logger.info('♻️ Catálogo recargado: %s servicios (fuente: %s)', len(index), index.source)
+            return True
+
+    def start_watching(self, interval: Optional[float] = None):
+        """
+        Vigilar el archivo del catálogo en segundo plano (mtime) y recargarlo al cambiar.
+
+        Args:
+            interval: Segundos entre revisiones (default: SERVICE_CATALOG_WATCH_SECONDS, 0 = desactivado)
+        """
+        if interval is None:
+            interval = float(os.getenv('SERVICE_CATALOG_WATCH_SECONDS', 30))
+        if interval <= 0 or (self._watcher and self._watcher.is_alive()):
+            return
+        self._stop_watching.clear()
+
+        def watch():
+            while not self._stop_watching.wait(interval):
+                try:
+                    self.reload_catalog()
+                except Exception as e:
+                    logger.warning('⚠️ Error vigilando el catálogo: %s', e)
+
+        self._watcher = threading.Thread(target=watch, name='catalog-watcher', daemon=True)
+        self._watcher.start()
+        logger.info('👀 Vigilando catálogo %s cada %gs', self.catalog_path, interval)
+
+    def stop_watching(self):
+        """Detener la vigilancia del archivo del catálogo"""
+        self._stop_watching.set()
+        if self._watcher:
+            self._watcher.join(timeout=1)
+            self._watcher = None
+
+    def catalog_stats(self) -> Dict:
+        """Estado del catálogo para /health"""
+        catalog = self.catalog
+        return {
+            'services': len(catalog),
+            'source': catalog.source,
+            'loaded_at': catalog.loaded_at.isoformat(),
+            'reloads': self.reloads,
+            'reload_errors': self.reload_errors,
+            'text_model': {
+                'services': len(self.text_model.labels),
+                'trained_at': self.text_model.meta.get('trained_at')
+            } if self.text_model is not None else None
+        }
             
-    def classify_ticket(self, ticket_data: Dict) -> Dict[str, str]:
+    def classify_ticket(self, ticket_data: Dict) -> FrozenClassification:
         """
         Clasifica el ticket consultando el 'servicioNombre' en el catálogo.
         'ticket_data' es el diccionario recibido de RabbitMQ.
+
+        Devuelve la clasificación precalculada (de solo lectura) con los campos
+        que espera tickets-svc: tipo, prioridad, categoria, grupo_atencion,
+        tiempoResolucion y tiempoRespuesta, más 'servicioCatalogo' y 'confianza'
+        (1.0 exacta, similitud si fue aproximada, probabilidad si la dio el modelo
+        de texto, 0.0 si se usó el default).
         """
         service_name = ticket_data.get('servicioNombre')
-        
-        classification_data = DEFAULT_CLASSIFICATION.copy()
+        catalog = self.catalog
+        classification = catalog.lookup(service_name)
 
-        if service_name and service_name in SERVICE_CATALOG_BY_NAME:
+        if classification is not None:
             # ¡Éxito! Encontramos el servicio en el catálogo.
-            print(f"Ticket clasificado por catálogo: {service_name}")
-            classification_data = SERVICE_CATALOG_BY_NAME[service_name].copy()
-        
-        else:
-            # Fallback: El servicio no vino o no está en el mapa.
-            print(f"Advertencia: Servicio '{service_name}' no encontrado. Usando default.")
-
-        # Reformatear para el 'ia-svc/main.py' y el Ticket.model.js
-        # Tu CSV usa "SLA Cliente" para el tiempo de resolución.
-        # Asumimos que tiempoRespuesta y tiempoResolucion son el mismo por ahora
-        sla_min = classification_data.get('sla_cliente_min')
-        
-        return {
-            'tipo': classification_data.get('tipo'),
-            'prioridad': classification_data.get('prioridad'),
-            'categoria': classification_data.get('categoria'),
-            'grupo_atencion': classification_data.get('grupo_atencion'),
-            
-            # Estos son los campos que tu Ticket.model.js espera
-            'tiempoResolucion': sla_min,
-            'tiempoRespuesta': sla_min # Ajusta si tienes otro campo para SLA de respuesta
-        }
\ No newline at end of file
+            logger.debug('Ticket clasificado por catálogo: %s', service_name)
+            return classification
+
+        classification = self._fuzzy_lookup(service_name, catalog)
+        if classification is not None:
+            logger.info("Ticket clasificado por similitud: '%s' -> '%s' (confianza %s)",
+                        service_name, classification['servicioCatalogo'], classification['confianza'])
+            return classification
+
+        classification = self._predict_from_text([ticket_data], catalog)[0]
+        if classification is not None:
+            logger.info("Ticket clasificado por texto: '%s' (confianza %s)",
+                        classification['servicioCatalogo'], classification['confianza'])
+            return classification
+
+        # Fallback: El servicio no vino o no está en el catálogo.
+        logger.warning("Advertencia: Servicio '%s' no encontrado. Usando default.", service_name)
+        return catalog.default
+
+    def classify_batch(self, tickets: Iterable[Dict]) -> List[FrozenClassification]:
+        """
+        Clasifica muchos tickets de una vez, devolviendo los resultados en el mismo orden.
+
+        El catálogo se consulta una sola vez por 'servicioNombre' distinto; los tickets
+        del mismo servicio comparten el resultado ya construido. Los que no se
+        resuelven por catálogo pasan juntos por el modelo de texto (si existe).
+        """
+        # Todo el lote se clasifica con el mismo índice aunque haya una recarga en medio
+        catalog = self.catalog
+        by_service: Dict[Optional[str], FrozenClassification] = {}
+        results = []
+        unresolved = []
+        for index, ticket_data in enumerate(tickets):
+            service_name = ticket_data.get('servicioNombre')
+            classification = by_service.get(service_name)
+            if classification is None:
+                classification = self._classify_service(service_name, catalog)
+                by_service[service_name] = classification
+            if classification is catalog.default:
+                unresolved.append((index, ticket_data))
+            results.append(classification)
+
+        by_text = 0
+        if unresolved:
+            predictions = self._predict_from_text([ticket for _, ticket in unresolved], catalog)
+            for (index, _), classification in zip(unresolved, predictions):
+                if classification is not None:
+                    results[index] = classification
+                    by_text += 1
+
+        missing = len(unresolved) - by_text
+        logger.info('Lote clasificado: %s tickets, %s servicios distintos, %s por texto, %s con default',
+                    len(results), len(by_service), by_text, missing)
+        return results
+
+    def _classify_service(self, service_name: Optional[str],
+                          catalog: Optional[ServiceCatalogIndex] = None) -> FrozenClassification:
+        """Clasificación precalculada de un servicio (o la default)"""
+        catalog = catalog or self.catalog
+        return (catalog.lookup(service_name)
+                or self._fuzzy_lookup(service_name, catalog)
+                or catalog.default)
+
+    def _fuzzy_lookup(self, service_name: Optional[str],
+                      catalog: ServiceCatalogIndex) -> Optional[FrozenClassification]:
+        """Coincidencia aproximada por trigramas (None si está desactivada o no alcanza el umbral)"""
+        if not service_name or self.fuzzy_threshold <= 0:
+            return None
+        return catalog.lookup_fuzzy(service_name, self.fuzzy_threshold)
+
+    def _predict_from_text(self, tickets: List[Dict],
+                           catalog: ServiceCatalogIndex) -> List[Optional[FrozenClassification]]:
+        """
+        Clasificar por titulo/descripcion con el modelo de texto, en un solo lote vectorizado.
+        None para los tickets sin texto, sin modelo o por debajo de la confianza mínima.
+        """
+        results: List[Optional[FrozenClassification]] = [None] * len(tickets)
+        if self.text_model is None:
+            return results
+
+        texts = [ticket_text(ticket) for ticket in tickets]
+        positions = [i for i, text in enumerate(texts) if text]
+        if not positions:
+            return results
+
+        predictions = self.text_model.predict([texts[i] for i in positions])
+        for position, (service_name, probability) in zip(positions, predictions):
+            base = catalog.lookup(service_name)
+            if base is not None and probability >= self.text_min_confidence:
+                results[position] = FrozenClassification(base, confianza=round(probability, 3))
+        return results
@@ -0,0 +1,243 @@
+# ia-svc/services/ticket_fetcher.py
+"""
+Descarga paginada y concurrente de tickets desde tickets-svc.
+
+GET /tickets pagina por offset (pagina/limite), devuelve 'total' y ordena por
+createdAt descendente. Sobre eso:
+
+- Cada consulta pide la página 1, calcula cuántas faltan con 'total' y las pide en
+  paralelo (a lo sumo 'concurrency' peticiones en vuelo por descarga).
+- Si la respuesta trae 'nextCursor' se sigue el cursor en lugar del offset.
+- Los filtros que tickets-svc entiende (empresaId, estado, agenteAsignado, asignado)
+  se mandan en la consulta; la ventana de fechas y la proyección de campos solo se
+  mandan si se configuran (TICKETS_SINCE_PARAM, TICKETS_FIELDS_PARAM).
+- Con ventana de fechas las páginas se piden por tandas y la descarga se corta en
+  cuanto una página llega a tickets más viejos que la ventana.
+- Los tickets se entregan como iterador asíncrono, página por página, sin duplicados.
+"""
+import asyncio
+import math
+import os
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence
+
+from services.records import to_epoch
+from services.ticket_snapshot import ACTIVE_STATES, CLOSED_STATES, RECENT_DAYS
+from services.upstream_client import UpstreamClient
+
+# Campos de un ticket que usa la asignación (proyección, si tickets-svc la soporta)
+SCORING_FIELDS = ('_id', 'empresaId', 'agenteAsignado', 'estado', 'prioridad',
+                  'createdAt', 'fechaAsignacion', 'updatedAt')
+
+_DONE = object()
+
+
+class TicketFetcher:
+    """
+    Capa de descarga de tickets sobre UpstreamClient.
+
+    Args:
+        upstream: Cliente HTTP compartido (host 'tickets' registrado)
+        page_size: Tickets por página (TICKETS_PAGE_SIZE, default 500)
+        concurrency: Páginas en vuelo por descarga (TICKETS_FETCH_CONCURRENCY, default 4)
+        since_param: Parámetro de tickets-svc para 'creados desde' (vacío = no soportado)
+        fields_param: Parámetro de tickets-svc para la proyección de campos (vacío = no soportado)
+    """
+
+    def __init__(self, upstream: UpstreamClient,
+                 page_size: Optional[int] = None,
+                 concurrency: Optional[int] = None,
+                 since_param: Optional[str] = None,
+                 fields_param: Optional[str] = None):
+        self.upstream = upstream
+        self.page_size = page_size or int(os.getenv('TICKETS_PAGE_SIZE', 500))
+        self.concurrency = max(1, concurrency or int(os.getenv('TICKETS_FETCH_CONCURRENCY', 4)))
+        self.since_param = since_param if since_param is not None else os.getenv('TICKETS_SINCE_PARAM', '')
+        self.fields_param = fields_param if fields_param is not None else os.getenv('TICKETS_FIELDS_PARAM', '')
+
+    def _params(self, empresa_id: Optional[str], estado: Optional[str], agente_id: Optional[str],
+                assigned_only: bool, since: Optional[datetime]) -> Dict[str, str]:
+        params = {'limite': str(self.page_size)}
+        if empresa_id:
+            params['empresaId'] = empresa_id
+        if estado:
+            params['estado'] = estado
+        if agente_id:
+            params['agenteAsignado'] = agente_id
+        elif assigned_only:
+            params['asignado'] = 'true'
+        if since is not None and self.since_param:
+            params[self.since_param] = since.isoformat() + 'Z'
+        if self.fields_param:
+            params[self.fields_param] = ','.join(SCORING_FIELDS)
+        return params
+
+    async def _get_page(self, params: Dict[str, str], semaphore: asyncio.Semaphore,
+                        pagina: Optional[int] = None, cursor: Optional[str] = None) -> Dict:
+        params = dict(params)
+        if cursor is not None:
+            params['cursor'] = cursor
+        else:
+            params['pagina'] = str(pagina)
+        async with semaphore:
+            response = await self.upstream.get('tickets', '/tickets', route='tickets.list', params=params)
+        response.raise_for_status()
+        data = response.json()
+        if isinstance(data, list):
+            return {'data': data}
+        return data
+
+    async def pages(self, empresa_id: Optional[str] = None, estado: Optional[str] = None,
+                    agente_id: Optional[str] = None, assigned_only: bool = False,
+                    since: Optional[datetime] = None,
+                    semaphore: Optional[asyncio.Semaphore] = None) -> AsyncIterator[List[Dict]]:
+        """
+        Páginas de UNA consulta filtrada.
+
+        Args:
+            empresa_id: Empresa (None = todas)
+            estado: Estado exacto
+            agente_id: Solo los tickets de este agente
+            assigned_only: Solo tickets con agente asignado
+            since: Solo tickets creados desde esta fecha (corta la descarga al pasarla)
+            semaphore: Límite de peticiones compartido con otras consultas
+        """
+        semaphore = semaphore or asyncio.Semaphore(self.concurrency)
+        params = self._params(empresa_id, estado, agente_id, assigned_only, since)
+        since_epoch = to_epoch(since) if since is not None else None
+
+        first = await self._get_page(params, semaphore, pagina=1)
+        page = first.get('data') or []
+        yield self._in_window(page, since_epoch)
+        if since_epoch is not None and self._passed_window(page, since_epoch):
+            return
+
+        cursor = first.get('nextCursor')
+        if cursor:
+            # Paginación por cursor: necesariamente secuencial
+            while cursor:
+                data = await self._get_page(params, semaphore, cursor=cursor)
+                page = data.get('data') or []
+                yield self._in_window(page, since_epoch)
+                if not page or (since_epoch is not None and self._passed_window(page, since_epoch)):
+                    return
+                cursor = data.get('nextCursor')
+            return
+
+        total = first.get('total')
+        if total is None:
+            # Sin total: página por página hasta una incompleta
+            pagina = 1
+            while len(page) >= self.page_size:
+                pagina += 1
+                page = (await self._get_page(params, semaphore, pagina=pagina)).get('data') or []
+                yield self._in_window(page, since_epoch)
+                if since_epoch is not None and self._passed_window(page, since_epoch):
+                    return
+            return
+
+        last_page = math.ceil(int(total) / self.page_size)
+        remaining = list(range(2, last_page + 1))
+        # Con ventana de fechas se pide por tandas para poder cortar al salir de la ventana;
+        # sin ventana se piden todas a la vez (el semáforo limita las que van en vuelo)
+        wave = self.concurrency if since_epoch is not None else len(remaining)
+        for start in range(0, len(remaining), max(wave, 1)):
+            tasks = [asyncio.ensure_future(self._get_page(params, semaphore, pagina=pagina))
+                     for pagina in remaining[start:start + wave]]
+            passed = False
+            try:
+                for next_page in asyncio.as_completed(tasks):
+                    page = (await next_page).get('data') or []
+                    yield self._in_window(page, since_epoch)
+                    passed = passed or (since_epoch is not None and self._passed_window(page, since_epoch))
+            finally:
+                for task in tasks:
+                    task.cancel()
+            if passed:
+                return
+
+    @staticmethod
+    def _in_window(page: List[Dict], since_epoch: Optional[float]) -> List[Dict]:
+        if since_epoch is None:
+            return page
+        return [t for t in page if not to_epoch(t.get('createdAt')) < since_epoch]
+
+    @staticmethod
+    def _passed_window(page: List[Dict], since_epoch: float) -> bool:
+        """La página ya llega a tickets creados antes de la ventana (vienen por createdAt descendente)"""
+        return bool(page) and to_epoch(page[-1].get('createdAt')) < since_epoch
+
+    async def iter_tickets(self, empresa_id: Optional[str] = None,
+                           states: Optional[Iterable[str]] = None,
+                           agente_id: Optional[str] = None,
+                           assigned_only: bool = False,
+                           since: Optional[datetime] = None) -> AsyncIterator[List[Dict]]:
+        """
+        Tickets de varias consultas (una por estado) descargadas en paralelo, por páginas
+        y sin duplicados. Sin 'states' se hace una sola consulta sin filtro de estado.
+        """
+        queries = [dict(estado=estado, agente_id=agente_id, assigned_only=assigned_only, since=since)
+                   for estado in (states or [None])]
+        async for page in self._merge(empresa_id, queries):
+            yield page
+
+    async def scoring_tickets(self, empresa_id: Optional[str] = None,
+                              window_days: int = RECENT_DAYS,
+                              agente_id: Optional[str] = None) -> AsyncIterator[List[Dict]]:
+        """
+        Lo que necesita el cálculo de métricas: todos los tickets activos (también sin
+        asignar, para que el libro mayor pueda seguir sus eventos) y solo los cerrados
+        con agente creados dentro de la ventana de 'window_days' días.
+        """
+        since = datetime.utcnow() - timedelta(days=window_days)
+        queries = [dict(estado=estado, agente_id=agente_id) for estado in ACTIVE_STATES]
+        queries += [dict(estado=estado, agente_id=agente_id, assigned_only=True, since=since)
+                    for estado in CLOSED_STATES]
+        async for page in self._merge(empresa_id, queries):
+            yield page
+
+    async def _merge(self, empresa_id: Optional[str], queries: Sequence[Dict]) -> AsyncIterator[List[Dict]]:
+        """Correr las consultas a la vez (semáforo compartido) y entregar sus páginas al llegar"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        queue: asyncio.Queue = asyncio.Queue()
+        seen = set()
+
+        async def run(query):
+            try:
+                async for page in self.pages(empresa_id, semaphore=semaphore, **query):
+                    await queue.put(page)
+            except Exception as e:
+                await queue.put(e)
+            finally:
+                await queue.put(_DONE)
+
+        producers = [asyncio.ensure_future(run(query)) for query in queries]
+        pending = len(producers)
+        try:
+            while pending:
+                item = await queue.get()
+                if item is _DONE:
+                    pending -= 1
+                    continue
+                if isinstance(item, Exception):
+                    raise item
+                # El offset se corre si entran tickets nuevos durante la descarga: sin duplicados
+                page = []
+                for ticket in item:
+                    ticket_id = ticket.get('_id') or ticket.get('id')
+                    if ticket_id is None or ticket_id not in seen:
+                        seen.add(ticket_id)
+                        page.append(ticket)
+                if page:
+                    yield page
+        finally:
+            for producer in producers:
+                producer.cancel()
+
+    @staticmethod
+    async def collect(pages: AsyncIterator[List[Dict]]) -> List[Dict]:
+        """Juntar todas las páginas de un iterador en una lista"""
+        tickets: List[Dict] = []
+        async for page in pages:
+            tickets.extend(page)
+        return tickets
@@ -0,0 +1,301 @@
+# ia-svc/services/ticket_snapshot.py
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:  # Sin NumPy las columnas son listas y las reducciones un bucle
+    np = None
+    NUMPY_AVAILABLE = False
+
+# extract_agent_id y to_epoch se re-exportan por compatibilidad
+from services.records import NAN, TicketRecord, extract_agent_id, now_epoch, to_epoch
+
+# Estados considerados "carga activa" de un agente
+ACTIVE_STATES = ('abierto', 'en_proceso', 'en_espera')
+
+# Estados considerados "trabajo terminado"
+CLOSED_STATES = ('resuelto', 'cerrado')
+
+# Todos los estados relevantes para métricas de eficiencia
+ALL_STATES = ACTIVE_STATES + CLOSED_STATES
+
+# Peso ponderado por prioridad
+PRIORITY_WEIGHTS = {
+    'critica': 3,
+    'crítica': 3,
+    'alta': 2,
+    'media': 1,
+    'baja': 0.5
+}
+
+
+def priority_weight(prioridad: Optional[str]) -> float:
+    """Peso de un ticket según su prioridad (default: media)"""
+    return PRIORITY_WEIGHTS.get((prioridad or 'media').lower(), 1)
+
+
+# Código interno de cada estado: activos primero, luego cerrados (-1 = estado no relevante)
+STATE_CODES = {estado: code for code, estado in enumerate(ALL_STATES)}
+_N_ACTIVE = len(ACTIVE_STATES)
+
+# Ventanas de las métricas de eficiencia y de tickets estancados
+STAGNANT_HOURS = 48
+RECENT_DAYS = 30
+VELOCITY_DAYS = 7
+
+
+class TicketColumns:
+    """
+    Tickets asignados de una empresa en columnas: agente (índice), estado (código),
+    peso por prioridad y fechas como epoch (tomadas de los TicketRecord).
+
+    Las métricas de todos los agentes
+    salen de reducciones agrupadas por agente (np.bincount) sobre las columnas.
+    Las filas se sobrescriben o liberan por ticket, así que el libro mayor las
+    mantiene al día evento por evento sin reconstruir nada.
+    """
+
+    def __init__(self, capacity: int = 0):
+        self.agent_ids: List[str] = []
+        self._agent_index: Dict[str, int] = {}
+        self._rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._size = 0
+        self._capacity = 0
+        self.agent = self.state = self.weight = None
+        self.assigned_at = self.created_at = self.updated_at = None
+        self._grow(max(capacity, 16))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _grow(self, capacity: int):
+        extra = capacity - self._capacity
+        if NUMPY_AVAILABLE:
+            def extend(column, fill, dtype):
+                tail = np.full(extra, fill, dtype=dtype)
+                return tail if column is None else np.concatenate([column, tail])
+        else:
+            def extend(column, fill, dtype):
+                return (column or []) + [fill] * extra
+        self.agent = extend(self.agent, -1, 'int32')
+        self.state = extend(self.state, -1, 'int8')
+        self.weight = extend(self.weight, 0.0, 'float64')
+        self.assigned_at = extend(self.assigned_at, NAN, 'float64')
+        self.created_at = extend(self.created_at, NAN, 'float64')
+        self.updated_at = extend(self.updated_at, NAN, 'float64')
+        self._capacity = capacity
+
+    def _agent(self, agent_id: str) -> int:
+        index = self._agent_index.get(agent_id)
+        if index is None:
+            index = self._agent_index[agent_id] = len(self.agent_ids)
+            self.agent_ids.append(agent_id)
+        return index
+
+    def set(self, ticket: TicketRecord):
+        """Escribir (o sobrescribir) la fila de un ticket asignado"""
+        row = self._rows.get(ticket.id)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                if self._size == self._capacity:
+                    self._grow(self._capacity * 2)
+                row = self._size
+                self._size += 1
+            self._rows[ticket.id] = row
+
+        self.agent[row] = self._agent(ticket.agent_id)
+        self.state[row] = STATE_CODES.get(ticket.estado, -1)
+        self.weight[row] = priority_weight(ticket.prioridad)
+        self.assigned_at[row] = ticket.assigned_at
+        self.created_at[row] = ticket.created_at
+        self.updated_at[row] = ticket.updated_at
+
+    def extend(self, tickets: Iterable[TicketRecord]):
+        """
+        Agregar muchos tickets asignados de una vez.
+        Las columnas se arman como listas y se copian en bloque (fotografías y bootstrap).
+        """
+        new_tickets: List[TicketRecord] = []
+        for ticket in tickets:
+            row = self._rows.get(ticket.id)
+            if row is None:
+                self._rows[ticket.id] = self._size + len(new_tickets)
+                new_tickets.append(ticket)
+            elif row >= self._size:  # Repetido dentro del mismo lote: gana el último
+                new_tickets[row - self._size] = ticket
+            else:
+                self.set(ticket)
+
+        added = len(new_tickets)
+        if not added:
+            return
+        rows = {
+            'agent': [self._agent(t.agent_id) for t in new_tickets],
+            'state': [STATE_CODES.get(t.estado, -1) for t in new_tickets],
+            'weight': [priority_weight(t.prioridad) for t in new_tickets],
+            'assigned_at': [t.assigned_at for t in new_tickets],
+            'created_at': [t.created_at for t in new_tickets],
+            'updated_at': [t.updated_at for t in new_tickets],
+        }
+        if self._size + added > self._capacity:
+            self._grow(max(self._capacity * 2, self._size + added))
+        start, end = self._size, self._size + added
+        for name, values in rows.items():
+            getattr(self, name)[start:end] = values
+        self._size = end
+
+    def discard(self, ticket_id: str):
+        """Liberar la fila de un ticket (queda disponible para el siguiente)"""
+        row = self._rows.pop(ticket_id, None)
+        if row is None:
+            return
+        self.agent[row] = -1
+        self.state[row] = -1
+        self._free.append(row)
+
+    def agent_totals(self, agent_ids: Sequence[str], now: Optional[float] = None) -> Dict[str, Dict]:
+        """
+        Totales por agente en una sola pasada:
+            active_count, active_weighted, age_days_sum (tickets activos),
+            stagnant_count (activos sin actualizar en STAGNANT_HOURS),
+            recent_count / recent_closed (creados en RECENT_DAYS),
+            velocity_closed (cerrados creados en VELOCITY_DAYS)
+
+        Args:
+            agent_ids: Agentes a reportar (los que no tienen tickets salen en cero)
+            now: Epoch de referencia (default: ahora, en UTC)
+        """
+        if now is None:
+            now = now_epoch()
+        sums = self._totals_numpy(now) if NUMPY_AVAILABLE else self._totals_python(now)
+
+        totals = {}
+        for agent_id in agent_ids:
+            index = self._agent_index.get(agent_id)
+            totals[agent_id] = {
+                name: (float(values[index]) if index is not None else 0.0)
+                for name, values in sums.items()
+            }
+            for name in ('active_count', 'stagnant_count', 'recent_count', 'recent_closed', 'velocity_closed'):
+                totals[agent_id][name] = int(totals[agent_id][name])
+        return totals
+
+    def _totals_numpy(self, now: float) -> Dict:
+        n, groups = self._size, len(self.agent_ids)
+        agent, state = self.agent[:n], self.state[:n]
+        created_at = self.created_at[:n]
+
+        active = (agent >= 0) & (state >= 0) & (state < _N_ACTIVE)
+        closed = (agent >= 0) & (state >= _N_ACTIVE)
+        ages = (now - self.assigned_at[:n]) / 86400
+        ages[np.isnan(ages)] = 0.0
+        # Las comparaciones con NaN (fecha ausente) dan False
+        stagnant = active & ((now - self.updated_at[:n]) / 3600 > STAGNANT_HOURS)
+        recent = (active | closed) & (created_at >= now - RECENT_DAYS * 86400)
+        velocity_closed = recent & closed & (created_at >= now - VELOCITY_DAYS * 86400)
+
+        def by_agent(mask, weights=None):
+            return np.bincount(agent[mask], weights=None if weights is None else weights[mask], minlength=groups)
+
+        return {
+            'active_count': by_agent(active),
+            'active_weighted': by_agent(active, self.weight[:n]),
+            'age_days_sum': by_agent(active, ages),
+            'stagnant_count': by_agent(stagnant),
+            'recent_count': by_agent(recent),
+            'recent_closed': by_agent(recent & closed),
+            'velocity_closed': by_agent(velocity_closed),
+        }
+
+    def _totals_python(self, now: float) -> Dict:
+        groups = len(self.agent_ids)
+        sums = {name: [0.0] * groups for name in (
+            'active_count', 'active_weighted', 'age_days_sum', 'stagnant_count',
+            'recent_count', 'recent_closed', 'velocity_closed')}
+        recent_since = now - RECENT_DAYS * 86400
+        velocity_since = now - VELOCITY_DAYS * 86400
+
+        for row in range(self._size):
+            index, code = self.agent[row], self.state[row]
+            if index < 0 or code < 0:
+                continue
+            if code < _N_ACTIVE:
+                age = (now - self.assigned_at[row]) / 86400
+                sums['active_count'][index] += 1
+                sums['active_weighted'][index] += self.weight[row]
+                sums['age_days_sum'][index] += 0.0 if age != age else age
+                if (now - self.updated_at[row]) / 3600 > STAGNANT_HOURS:
+                    sums['stagnant_count'][index] += 1
+            created_at = self.created_at[row]
+            if created_at >= recent_since:
+                sums['recent_count'][index] += 1
+                if code >= _N_ACTIVE:
+                    sums['recent_closed'][index] += 1
+                    if created_at >= velocity_since:
+                        sums['velocity_closed'][index] += 1
+        return sums
+
+
+class TicketSnapshot:
+    """
+    Fotografía de los tickets de una empresa indexada por agente asignado.
+
+    Se construye UNA vez por asignación (una sola llamada a tickets-svc) y se
+    agrupa en una sola pasada, de modo que las métricas de todos los agentes
+    del grupo se calculan sobre el mismo índice sin volver a descargar nada.
+    Del JSON solo se guardan TicketRecord compactos de los tickets asignados.
+    """
+
+    def __init__(self, empresa_id: str, tickets: Iterable[Dict]):
+        self.empresa_id = empresa_id
+        self._by_agent: Dict[str, List[TicketRecord]] = defaultdict(list)
+        self.columns = TicketColumns()
+
+        records = TicketRecord.from_json_batch(tickets)
+        self.total_tickets = len(records)
+        assigned = []
+        for position, record in enumerate(records):
+            if record.agent_id:
+                if record.id is None:
+                    record.id = f'#{position}'
+                self._by_agent[record.agent_id].append(record)
+                assigned.append(record)
+        self.columns.extend(assigned)
+
+    def __len__(self) -> int:
+        return self.total_tickets
+
+    @property
+    def agent_ids(self) -> List[str]:
+        """IDs de agentes con al menos un ticket en la fotografía"""
+        return list(self._by_agent.keys())
+
+    def tickets_for(self, agent_id: str, states: Iterable[str] = ACTIVE_STATES) -> List[TicketRecord]:
+        """
+        Tickets del agente filtrados por estado.
+
+        Args:
+            agent_id: ID del agente
+            states: Estados a incluir (default: activos)
+        """
+        agent_tickets = self._by_agent.get(agent_id)
+        if not agent_tickets:
+            return []
+        states = set(states)
+        return [t for t in agent_tickets if t.estado in states]
+
+    def active_load(self, agent_id: str) -> Tuple[int, float]:
+        """
+        Carga activa del agente: (número de tickets activos, peso por prioridad)
+        """
+        active_tickets = self.tickets_for(agent_id, ACTIVE_STATES)
+        return len(active_tickets), sum(priority_weight(t.prioridad) for t in active_tickets)
+
+    def agent_totals(self, agent_ids: Sequence[str], now: Optional[float] = None) -> Dict[str, Dict]:
+        """Totales de métricas de varios agentes (ver TicketColumns.agent_totals)"""
+        return self.columns.agent_totals(agent_ids, now)
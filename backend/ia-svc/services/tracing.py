@@ -0,0 +1,272 @@
+# ia-svc/services/tracing.py
+"""
+Trazas por ticket al estilo OpenTelemetry, sin colector obligatorio.
+
+- El span actual viaja en un contextvar, así que se propaga solo entre await y
+  tareas de asyncio del mismo ticket.
+- Solo se registran spans hijos dentro de una traza abierta (start_trace); fuera de
+  ella span() no hace nada, de modo que clasificar lotes o atender /health no cuesta.
+- El contexto se propaga en el header W3C 'traceparent' (peticiones upstream y
+  headers de los eventos publicados).
+- Exportadores: anillo en memoria (consultable en /debug/traces) y, opcionalmente,
+  un archivo JSONL escrito por un hilo de fondo.
+
+Variables de entorno: TRACING_ENABLED (true), TRACING_BUFFER_TRACES (500),
+TRACING_EXPORT_PATH (sin valor = solo memoria).
+"""
+import contextvars
+import json
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# Límite de spans por traza en el anillo (un ticket con cientos de agentes no crece sin control)
+MAX_SPANS_PER_TRACE = 1000
+
+_TRACEPARENT_RE = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+
+_current_span: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('ia_current_span', default=None)
+
+
+class Span:
+    """Unidad de trabajo con nombre, duración, atributos y estado"""
+
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'attributes', 'start_time',
+                 '_start', 'duration_ms', 'status', 'error', 'root')
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None,
+                 attributes: Optional[Dict] = None, root: bool = False):
+        self.root = root
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.status = 'ok'
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def finish(self):
+        self.duration_ms = round((time.perf_counter() - self._start) * 1000, 3)
+
+    @property
+    def traceparent(self) -> str:
+        return f'00-{self.trace_id}-{self.span_id}-01'
+
+    def to_dict(self) -> Dict:
+        return {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'parentId': self.parent_id,
+            'root': self.root,
+            'name': self.name,
+            'start': self.start_time,
+            'durationMs': self.duration_ms,
+            'status': self.status,
+            'error': self.error,
+            'attributes': self.attributes
+        }
+
+
+class RingBufferExporter:
+    """Últimas 'max_traces' trazas en memoria, agrupadas por trace_id"""
+
+    def __init__(self, max_traces: int = 500):
+        self.max_traces = max_traces
+        self._traces: 'OrderedDict[str, List[Dict]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            spans = self._traces.get(span.trace_id)
+            if spans is None:
+                spans = self._traces[span.trace_id] = []
+                while len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+            if len(spans) < MAX_SPANS_PER_TRACE:
+                spans.append(span.to_dict())
+
+    def get_trace(self, trace_id: str) -> Optional[List[Dict]]:
+        with self._lock:
+            spans = self._traces.get(trace_id)
+            return list(spans) if spans is not None else None
+
+    def traces(self, limit: int = 20, ticket_id: Optional[str] = None,
+               min_duration_ms: float = 0.0) -> List[Dict]:
+        """
+        Resumen de las trazas más recientes con su raíz terminada.
+
+        Args:
+            limit: Máximo de trazas a devolver
+            ticket_id: Solo las del ticket indicado
+            min_duration_ms: Solo las que duraron al menos esto (tickets lentos)
+        """
+        with self._lock:
+            candidates = [(trace_id, list(spans)) for trace_id, spans in reversed(self._traces.items())]
+
+        result = []
+        for trace_id, spans in candidates:
+            root = next((s for s in spans if s['root']), None)
+            if root is None:
+                continue
+            if ticket_id is not None and root['attributes'].get('ticket_id') != ticket_id:
+                continue
+            if root['durationMs'] < min_duration_ms:
+                continue
+            result.append({
+                'traceId': trace_id,
+                'name': root['name'],
+                'ticketId': root['attributes'].get('ticket_id'),
+                'start': root['start'],
+                'durationMs': root['durationMs'],
+                'status': root['status'],
+                'spans': len(spans)
+            })
+            if len(result) >= limit:
+                break
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._traces.clear()
+
+
+class JsonlFileExporter:
+    """Un span por línea en un archivo JSONL; la escritura la hace un hilo de fondo"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name='tracing-exporter', daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span):
+        self._queue.put(span.to_dict())
+
+    def close(self, timeout: float = 2.0):
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                return
+            try:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+                    # Vaciar lo que se acumuló mientras se escribía, con el archivo abierto
+                    while True:
+                        try:
+                            record = self._queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if record is None:
+                            return
+                        f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+            except OSError as e:
+                logger.warning('⚠️ [Tracing] No se pudo escribir %s: %s', self.path, e)
+
+
+class Tracer:
+    """Crea spans, mantiene el span actual y los entrega a los exportadores al terminar"""
+
+    def __init__(self, exporters: Optional[List] = None, enabled: bool = True):
+        self.enabled = enabled
+        self.exporters = list(exporters or [])
+
+    @classmethod
+    def from_env(cls) -> 'Tracer':
+        enabled = os.getenv('TRACING_ENABLED', 'true').lower() == 'true'
+        exporters = [RingBufferExporter(int(os.getenv('TRACING_BUFFER_TRACES', 500)))]
+        path = os.getenv('TRACING_EXPORT_PATH')
+        if enabled and path:
+            exporters.append(JsonlFileExporter(path))
+        return cls(exporters, enabled)
+
+    @property
+    def buffer(self) -> Optional[RingBufferExporter]:
+        """Exportador en memoria (el que consulta /debug/traces)"""
+        return next((e for e in self.exporters if isinstance(e, RingBufferExporter)), None)
+
+    @contextmanager
+    def _activate(self, span: Span) -> Iterator[Span]:
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = 'error'
+            span.error = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            _current_span.reset(token)
+            span.finish()
+            for exporter in self.exporters:
+                exporter.export(span)
+
+    @contextmanager
+    def start_trace(self, name: str, traceparent: Optional[str] = None, **attributes) -> Iterator[Optional[Span]]:
+        """
+        Abrir una traza nueva (span raíz). Si llega un 'traceparent' válido, la raíz
+        continúa esa traza como hija del span remoto.
+        """
+        if not self.enabled:
+            yield None
+            return
+        trace_id, parent_id = secrets.token_hex(16), None
+        parsed = parse_traceparent(traceparent)
+        if parsed:
+            trace_id, parent_id = parsed
+        with self._activate(Span(name, trace_id, parent_id, attributes, root=True)) as span:
+            yield span
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Optional[Span]]:
+        """Span hijo del actual; sin traza abierta no registra nada"""
+        parent = _current_span.get()
+        if parent is None or not self.enabled:
+            yield None
+            return
+        with self._activate(Span(name, parent.trace_id, parent.span_id, attributes)) as span:
+            yield span
+
+
+def parse_traceparent(value: Optional[str]):
+    """(trace_id, span_id) de un header 'traceparent' W3C, o None si no es válido"""
+    if not value:
+        return None
+    match = _TRACEPARENT_RE.match(value.strip().lower())
+    if not match or match.group(1) == '0' * 32 or match.group(2) == '0' * 16:
+        return None
+    return match.group(1), match.group(2)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def inject(headers: Optional[Dict] = None) -> Dict:
+    """Agregar 'traceparent' del span actual a 'headers' (si hay traza abierta)"""
+    headers = dict(headers or {})
+    span = _current_span.get()
+    if span is not None:
+        headers['traceparent'] = span.traceparent
+    return headers
+
+
+TRACER = Tracer.from_env()
@@ -0,0 +1,254 @@
+# ia-svc/services/upstream_client.py
+import asyncio
+import os
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from logger import get_logger
+from services.metrics import UPSTREAM_LATENCY, UPSTREAM_RETRIES, UPSTREAM_CIRCUIT_STATE
+from services.resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceeded, RetryPolicy, OPEN, STATE_VALUES, remaining_budget
+)
+from services.tracing import TRACER, inject
+
+logger = get_logger(__name__)
+
+# Timeouts por ruta (segundos). La llave es el nombre lógico de la ruta.
+DEFAULT_ROUTE_TIMEOUTS = {
+    'usuarios.list': 10.0,
+    'tickets.list': 10.0,
+    'tickets.classify': 15.0,
+    'tickets.assign': 15.0,
+}
+
+DEFAULT_TIMEOUT = 10.0
+
+# Respuestas que cuentan como fallo del upstream (circuit breaker) y se reintentan
+FAILURE_STATUSES = frozenset({500, 502, 503, 504})
+
+# Métodos que se reintentan ante cualquier error de transporte o 5xx (solo lecturas):
+# PUT asignar-ia publica eventos y notifica en tickets-svc en cada llamada, así que repetir
+# una escritura que quizá llegó al servidor puede duplicar sus efectos
+RETRY_METHODS = frozenset({'GET'})
+
+# Errores en los que la petición nunca salió hacia el servidor: también se reintentan las escrituras
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class UpstreamClient:
+    """
+    Capa única de acceso HTTP a los servicios upstream (usuarios-svc, tickets-svc).
+
+    Mantiene un httpx.AsyncClient por host con su propio pool de conexiones
+    (límite por host + keep-alive), de modo que las peticiones reutilizan
+    conexiones calientes en lugar de abrir TCP/TLS en cada llamada.
+    Su ciclo de vida sigue al 'lifespan' de FastAPI: start() al iniciar, close() al cerrar.
+
+    Cada host tiene su circuit breaker: con el circuito abierto las llamadas fallan al
+    instante (CircuitOpenError) en lugar de esperar el timeout completo. Las lecturas se
+    reintentan ante errores de transporte y 5xx; las escrituras solo si la conexión no se
+    llegó a establecer. Siempre con backoff y jitter, dentro del presupuesto de tiempo del
+    ticket (services.resilience.deadline).
+    """
+
+    def __init__(self,
+                 service_token: str,
+                 route_timeouts: Optional[Dict[str, float]] = None,
+                 max_connections: Optional[int] = None,
+                 max_keepalive_connections: Optional[int] = None,
+                 keepalive_expiry: Optional[float] = None,
+                 http2: Optional[bool] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None,
+                 retry: Optional[RetryPolicy] = None,
+                 breaker_failures: Optional[int] = None,
+                 breaker_reset_seconds: Optional[float] = None):
+        self.service_token = service_token
+        self.route_timeouts = dict(DEFAULT_ROUTE_TIMEOUTS)
+        if route_timeouts:
+            self.route_timeouts.update(route_timeouts)
+
+        self.limits = httpx.Limits(
+            max_connections=max_connections or int(os.getenv('UPSTREAM_MAX_CONNECTIONS', 50)),
+            max_keepalive_connections=max_keepalive_connections or int(os.getenv('UPSTREAM_MAX_KEEPALIVE', 20)),
+            keepalive_expiry=keepalive_expiry or float(os.getenv('UPSTREAM_KEEPALIVE_EXPIRY', 30.0))
+        )
+        if http2 is None:
+            http2 = os.getenv('UPSTREAM_HTTP2', 'false').lower() == 'true'
+        self.http2 = http2 and self._http2_available()
+
+        # Transport inyectable (p. ej. httpx.MockTransport en pruebas)
+        self._transport = transport
+        self._hosts: Dict[str, str] = {}
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+        self.retry = retry or RetryPolicy(
+            max_attempts=int(os.getenv('UPSTREAM_RETRY_ATTEMPTS', 3)),
+            base_delay=float(os.getenv('UPSTREAM_RETRY_BASE_DELAY', 0.1)),
+            max_delay=float(os.getenv('UPSTREAM_RETRY_MAX_DELAY', 2.0))
+        )
+        self.breaker_failures = (breaker_failures if breaker_failures is not None
+                                 else int(os.getenv('UPSTREAM_BREAKER_FAILURES', 5)))
+        self.breaker_reset_seconds = (breaker_reset_seconds if breaker_reset_seconds is not None
+                                      else float(os.getenv('UPSTREAM_BREAKER_RESET_SECONDS', 30.0)))
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    @staticmethod
+    def _http2_available() -> bool:
+        """HTTP/2 es opcional: requiere el paquete 'h2'"""
+        try:
+            import h2  # noqa: F401
+            return True
+        except ImportError:
+            logger.warning("⚠️ UPSTREAM_HTTP2 activo pero el paquete 'h2' no está instalado. Usando HTTP/1.1")
+            return False
+
+    def _get_headers(self) -> Dict[str, str]:
+        """Headers para autenticación entre servicios"""
+        return {
+            'Authorization': f'Bearer {self.service_token}',
+            'X-Service-Name': 'ia-svc',
+            'Content-Type': 'application/json'
+        }
+
+    def register(self, name: str, base_url: str):
+        """
+        Registrar un host upstream.
+
+        Args:
+            name: Nombre lógico del host (ej: "tickets")
+            base_url: URL base (ej: "http://tickets-svc:3002")
+        """
+        self._hosts[name] = base_url.rstrip('/')
+        breaker = self.breakers[name] = CircuitBreaker(name, self.breaker_failures, self.breaker_reset_seconds)
+        UPSTREAM_CIRCUIT_STATE.set_function(lambda b=breaker: STATE_VALUES[b.state], host=name)
+
+    def _build_client(self, name: str) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=self._hosts[name],
+            headers=self._get_headers(),
+            limits=self.limits,
+            timeout=DEFAULT_TIMEOUT,
+            http2=self.http2,
+            transport=self._transport
+        )
+
+    def _get_client(self, name: str) -> httpx.AsyncClient:
+        if name not in self._hosts:
+            raise KeyError(f"Host upstream no registrado: {name}")
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            # Creación perezosa (p. ej. uso fuera del lifespan)
+            client = self._build_client(name)
+            self._clients[name] = client
+        return client
+
+    async def start(self):
+        """Abrir los pools de conexiones de todos los hosts registrados"""
+        for name in self._hosts:
+            self._get_client(name)
+        logger.info('✅ [Upstream] Pools HTTP listos: %s (http2=%s)', ', '.join(self._hosts), self.http2)
+
+    async def close(self):
+        """Cerrar todos los pools de conexiones"""
+        for client in self._clients.values():
+            if not client.is_closed:
+                await client.aclose()
+        self._clients.clear()
+        logger.info('🔗 [Upstream] Pools HTTP cerrados')
+
+    async def request(self, host: str, method: str, path: str, route: Optional[str] = None, **kwargs) -> httpx.Response:
+        """
+        Ejecutar una petición sobre el pool del host, con circuit breaker y reintentos.
+
+        Args:
+            host: Nombre lógico del host registrado
+            method: Método HTTP
+            path: Ruta relativa a la URL base del host
+            route: Nombre lógico de la ruta para elegir su timeout
+
+        Raises:
+            CircuitOpenError: El circuito del host está abierto (no se hizo la petición)
+            DeadlineExceeded: No queda presupuesto de tiempo para llamar al host
+        """
+        timeout = kwargs.pop('timeout', self.route_timeouts.get(route, DEFAULT_TIMEOUT))
+        client = self._get_client(host)
+        breaker = self.breakers[host]
+        idempotent = method.upper() in RETRY_METHODS
+        attempt = 0
+        while True:
+            attempt += 1
+            if not breaker.allow():
+                raise CircuitOpenError(host, breaker.retry_in())
+            remaining = remaining_budget()
+            if remaining is not None and remaining <= 0:
+                breaker.abandon()
+                raise DeadlineExceeded(host)
+
+            # El timeout de la ruta nunca excede lo que le queda al presupuesto del ticket
+            attempt_timeout = timeout
+            if remaining is not None and isinstance(timeout, (int, float)):
+                attempt_timeout = min(timeout, remaining)
+
+            error, response = None, None
+            try:
+                response = await self._send(client, host, method, path, route, attempt, timeout=attempt_timeout, **kwargs)
+            except httpx.TransportError as e:
+                error = e
+            except BaseException:
+                breaker.abandon()
+                raise
+
+            if error is None and response.status_code not in FAILURE_STATUSES:
+                breaker.record_success()
+                return response
+            breaker.record_failure()
+
+            # ¿Vale la pena otro intento? (lectura o escritura que no salió, intentos, circuito y presupuesto)
+            retryable = idempotent or isinstance(error, NOT_SENT_ERRORS)
+            delay = self.retry.backoff(attempt)
+            remaining = remaining_budget()
+            if (not retryable or attempt >= self.retry.max_attempts or breaker.state == OPEN
+                    or (remaining is not None and delay >= remaining)):
+                if error is not None:
+                    raise error
+                return response
+
+            UPSTREAM_RETRIES.inc(host=host)
+            logger.debug('🔁 [Upstream] Reintento %s de %s %s %s en %.0f ms (%s)', attempt + 1, method, host, path,
+                         delay * 1000, error or response.status_code)
+            await asyncio.sleep(delay)
+
+    async def _send(self, client: httpx.AsyncClient, host: str, method: str, path: str, route: Optional[str],
+                    attempt: int, **kwargs) -> httpx.Response:
+        """Un intento: petición HTTP medida y con su span"""
+        start = time.perf_counter()
+        status = 'error'
+        with TRACER.span(f'http {method}', host=host, path=path, route=route) as span:
+            if span is not None:
+                # Propagar el contexto de la traza al servicio upstream
+                kwargs['headers'] = inject(kwargs.get('headers'))
+                if attempt > 1:
+                    span.set_attribute('attempt', attempt)
+            try:
+                response = await client.request(method, path, **kwargs)
+                status = str(response.status_code)
+                return response
+            finally:
+                UPSTREAM_LATENCY.observe(time.perf_counter() - start, host=host, status=status)
+                if span is not None:
+                    span.set_attribute('status', status)
+
+    def stats(self) -> Dict[str, Dict]:
+        """Estado del circuit breaker de cada host"""
+        return {name: breaker.stats() for name, breaker in self.breakers.items()}
+
+    async def get(self, host: str, path: str, route: Optional[str] = None, **kwargs) -> httpx.Response:
+        return await self.request(host, 'GET', path, route=route, **kwargs)
+
+    async def patch(self, host: str, path: str, route: Optional[str] = None, **kwargs) -> httpx.Response:
+        return await self.request(host, 'PATCH', path, route=route, **kwargs)
+
+    async def put(self, host: str, path: str, route: Optional[str] = None, **kwargs) -> httpx.Response:
+        return await self.request(host, 'PUT', path, route=route, **kwargs)
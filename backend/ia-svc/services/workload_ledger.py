@@ -0,0 +1,305 @@
+# ia-svc/services/workload_ledger.py
+import math
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from services.records import TicketRecord, intern, now_epoch, to_epoch
+from services.ticket_snapshot import ACTIVE_STATES, TicketColumns, priority_weight
+
+# Routing keys del ciclo de vida de tickets publicadas por tickets-svc
+TICKET_LIFECYCLE_ROUTING_KEYS = [
+    'ticket.creado',
+    'ticket.asignado',
+    'ticket.asignado_automaticamente',
+    'ticket.delegado',
+    'ticket.estado_actualizado',
+    'ticket.prioridad_actualizada',
+    'ticket.clasificado',
+    'ticket.eliminado',
+]
+
+
+def _event_time(message: Dict, data: Dict) -> float:
+    """Fecha del evento ('updatedAt' del ticket o 'timestamp' del mensaje); si no trae, la de recepción"""
+    event_time = to_epoch(data.get('updatedAt') or message.get('timestamp'))
+    return now_epoch() if math.isnan(event_time) else event_time
+
+
+class CompanyWorkload:
+    """
+    Carga de trabajo de una empresa indexada por agente.
+
+    Expone la misma interfaz que TicketSnapshot (tickets_for / active_load /
+    agent_totals), pero se mantiene incrementalmente a partir de eventos: los
+    contadores activos de cada agente se leen en O(1) y cada evento reescribe
+    solo la fila del ticket en las columnas.
+    """
+
+    def __init__(self, empresa_id: str):
+        self.empresa_id = empresa_id
+        self.loaded_at = datetime.utcnow()
+        self._by_agent: Dict[str, Dict[str, TicketRecord]] = {}
+        self._active_count: Dict[str, int] = {}
+        self._active_weighted: Dict[str, float] = {}
+        # Todos los tickets de la empresa, asignados o no (los mantiene WorkloadLedger)
+        self.ticket_ids: Set[str] = set()
+        self.columns = TicketColumns()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return sum(len(tickets) for tickets in self._by_agent.values())
+
+    @property
+    def agent_ids(self) -> List[str]:
+        return list(self._by_agent.keys())
+
+    def _index(self, ticket: TicketRecord) -> bool:
+        agent_id = ticket.agent_id
+        if not agent_id:
+            return False
+        self._by_agent.setdefault(agent_id, {})[ticket.id] = ticket
+        if ticket.estado in ACTIVE_STATES:
+            self._active_count[agent_id] = self._active_count.get(agent_id, 0) + 1
+            self._active_weighted[agent_id] = self._active_weighted.get(agent_id, 0) + priority_weight(ticket.prioridad)
+        return True
+
+    def _load(self, tickets: Iterable[TicketRecord]):
+        """Carga inicial: índice por agente y columnas en bloque"""
+        self.columns.extend([ticket for ticket in tickets if self._index(ticket)])
+
+    def _add(self, ticket: TicketRecord):
+        if self._index(ticket):
+            self.columns.set(ticket)
+
+    def _remove(self, ticket: TicketRecord):
+        agent_id = ticket.agent_id
+        if not agent_id:
+            return
+        agent_tickets = self._by_agent.get(agent_id)
+        if not agent_tickets or agent_tickets.pop(ticket.id, None) is None:
+            return
+        if not agent_tickets:
+            del self._by_agent[agent_id]
+        self.columns.discard(ticket.id)
+        if ticket.estado in ACTIVE_STATES:
+            self._active_count[agent_id] = max(self._active_count.get(agent_id, 0) - 1, 0)
+            self._active_weighted[agent_id] = max(self._active_weighted.get(agent_id, 0) - priority_weight(ticket.prioridad), 0)
+
+    def tickets_for(self, agent_id: str, states: Iterable[str] = ACTIVE_STATES) -> List[TicketRecord]:
+        """Tickets del agente filtrados por estado"""
+        states = set(states)
+        with self._lock:
+            agent_tickets = self._by_agent.get(agent_id)
+            if not agent_tickets:
+                return []
+            return [t for t in agent_tickets.values() if t.estado in states]
+
+    def active_load(self, agent_id: str) -> Tuple[int, float]:
+        """Carga activa del agente en O(1): (tickets activos, peso por prioridad)"""
+        return self._active_count.get(agent_id, 0), self._active_weighted.get(agent_id, 0)
+
+    def agent_totals(self, agent_ids: Sequence[str], now: Optional[float] = None) -> Dict[str, Dict]:
+        """Totales de métricas de varios agentes (ver TicketColumns.agent_totals)"""
+        with self._lock:
+            return self.columns.agent_totals(agent_ids, now)
+
+
+class WorkloadLedger:
+    """
+    Libro mayor en memoria de la carga de trabajo por empresa y por agente.
+
+    - Se inicializa (bootstrap) desde tickets-svc y se reconcilia periódicamente.
+    - Entre reconciliaciones se actualiza con los eventos del ciclo de vida de tickets.
+    - AgentAssigner lee de aquí en lugar de consultar tickets-svc en cada asignación.
+
+    Los eventos llegan desde el hilo del consumidor RabbitMQ; todas las mutaciones
+    se hacen bajo el lock de la empresa afectada. Un evento más viejo que la última
+    actualización conocida del ticket se descarta, y los eventos que llegan mientras se
+    descarga una fotografía se vuelven a aplicar encima de ella (ver reloading()).
+    """
+
+    def __init__(self):
+        self._companies: Dict[str, CompanyWorkload] = {}
+        # ticket_id -> (empresa_id, ticket) para eventos que no traen empresaId
+        self._tickets: Dict[str, Tuple[str, TicketRecord]] = {}
+        self._lock = threading.RLock()
+        # Eventos (routing_key, ticket, fecha) recibidos mientras hay descargas en curso
+        self._journal: List[Tuple[str, Dict, float]] = []
+        self._reloads = 0
+        self.events_applied = 0
+        self.events_ignored = 0
+        self.last_reconcile: Optional[datetime] = None
+
+    def has_company(self, empresa_id: str) -> bool:
+        return empresa_id in self._companies
+
+    def company(self, empresa_id: str) -> Optional[CompanyWorkload]:
+        return self._companies.get(empresa_id)
+
+    def company_ids(self) -> List[str]:
+        return list(self._companies.keys())
+
+    @contextmanager
+    def reloading(self):
+        """
+        Marcar una descarga de fotografías en curso.
+
+        Mientras dura, los eventos aplicados también se anotan en un diario; el valor
+        entregado se pasa como 'since' a load_company / load_companies / load_all para
+        volver a aplicar encima de la fotografía los eventos que llegaron durante la descarga.
+        """
+        with self._lock:
+            self._reloads += 1
+            since = len(self._journal)
+        try:
+            yield since
+        finally:
+            with self._lock:
+                self._reloads -= 1
+                if not self._reloads:
+                    self._journal.clear()
+
+    def load_company(self, empresa_id: str, tickets: Iterable[Dict], since: Optional[int] = None) -> CompanyWorkload:
+        """
+        Reemplazar el estado de una empresa con una fotografía completa de tickets-svc
+        (bootstrap o reconciliación).
+
+        Args:
+            since: Posición del diario al empezar la descarga (ver reloading()); los eventos
+                   de la empresa anotados desde entonces se aplican sobre la fotografía
+        """
+        workload = CompanyWorkload(empresa_id)
+        records = [record for record in TicketRecord.from_json_batch(tickets) if record.id]
+        workload._load(records)
+        entries = {record.id: (empresa_id, record) for record in records}
+        workload.ticket_ids.update(entries)
+
+        with self._lock:
+            previous = self._companies.get(empresa_id)
+            if previous is not None:
+                for ticket_id in previous.ticket_ids:
+                    self._tickets.pop(ticket_id, None)
+            self._tickets.update(entries)
+            self._companies[empresa_id] = workload
+            if since is not None:
+                self._replay(empresa_id, since)
+        return workload
+
+    def _replay(self, empresa_id: str, since: int):
+        """Volver a aplicar los eventos de la empresa anotados desde 'since'"""
+        for routing_key, data, event_time in self._journal[since:]:
+            entry = self._tickets.get(data.get('id') or data.get('_id'))
+            owner = entry[0] if entry is not None else data.get('empresaId')
+            if owner == empresa_id:
+                self._apply(routing_key, data, event_time)
+
+    def load_all(self, tickets: Iterable[Dict], since: Optional[int] = None) -> int:
+        """
+        Cargar tickets de varias empresas de una sola vez (bootstrap global).
+
+        Returns:
+            Número de empresas cargadas
+        """
+        by_company: Dict[str, List[Dict]] = {}
+        for ticket in tickets:
+            empresa_id = ticket.get('empresaId')
+            if isinstance(empresa_id, dict):
+                empresa_id = empresa_id.get('_id')
+            if empresa_id:
+                by_company.setdefault(str(empresa_id), []).append(ticket)
+
+        return self.load_companies(by_company, since=since)
+
+    def load_companies(self, by_company: Dict[str, List[Dict]], since: Optional[int] = None) -> int:
+        """Reemplazar varias empresas con sus fotografías (reconciliación de un shard)"""
+        for empresa_id, company_tickets in by_company.items():
+            self.load_company(empresa_id, company_tickets, since=since)
+        self.last_reconcile = datetime.utcnow()
+        return len(by_company)
+
+    def apply_event(self, routing_key: str, message: dict) -> bool:
+        """
+        Aplicar un evento del ciclo de vida de un ticket.
+
+        Returns:
+            True si el evento modificó el libro mayor
+        """
+        data = message.get('ticket') or {}
+        if not (data.get('id') or data.get('_id')):
+            self.events_ignored += 1
+            return False
+
+        event_time = _event_time(message, data)
+        with self._lock:
+            if self._reloads:
+                self._journal.append((routing_key, data, event_time))
+            applied = self._apply(routing_key, data, event_time)
+
+        if applied:
+            self.events_applied += 1
+        else:
+            self.events_ignored += 1
+        return applied
+
+    def _apply(self, routing_key: str, data: Dict, event_time: float) -> bool:
+        """Aplicar el evento (bajo self._lock). False si se ignora: ticket desconocido o evento viejo"""
+        ticket_id = data.get('id') or data.get('_id')
+        entry = self._tickets.get(ticket_id)
+
+        if entry is None:
+            # Ticket desconocido: solo se agrega si conocemos su empresa
+            empresa_id = data.get('empresaId')
+            workload = self._companies.get(empresa_id) if empresa_id else None
+            if workload is None or routing_key == 'ticket.eliminado':
+                return False
+            ticket = TicketRecord(ticket_id, None, 'abierto', data.get('prioridad'),
+                                  created_at=event_time, assigned_at=event_time, updated_at=event_time)
+        else:
+            empresa_id, ticket = entry
+            workload = self._companies[empresa_id]
+            # Evento anterior a la última actualización conocida (reentrega tardía o fotografía más nueva)
+            if routing_key != 'ticket.eliminado' and event_time < ticket.updated_at:
+                return False
+
+        with workload._lock:
+            # Sacar el ticket con su estado anterior y volver a agregarlo actualizado
+            workload._remove(ticket)
+            agent_id = ticket.agent_id
+            ticket = ticket.copy()
+
+            if routing_key == 'ticket.eliminado':
+                self._tickets.pop(ticket_id, None)
+                workload.ticket_ids.discard(ticket_id)
+                return True
+
+            new_agent_id = agent_id
+            if routing_key in ('ticket.asignado', 'ticket.asignado_automaticamente'):
+                new_agent_id = data.get('agenteId') or agent_id
+            elif routing_key == 'ticket.delegado':
+                new_agent_id = data.get('becarioId') or agent_id
+
+            if new_agent_id != agent_id:
+                ticket.assigned_at = event_time
+            if data.get('estado'):
+                ticket.estado = intern(data['estado'])
+            if data.get('prioridad'):
+                ticket.prioridad = intern(data['prioridad'])
+            ticket.agent_id = intern(new_agent_id)
+            ticket.updated_at = event_time
+
+            workload._add(ticket)
+            workload.ticket_ids.add(ticket_id)
+            self._tickets[ticket_id] = (empresa_id, ticket)
+        return True
+
+    def stats(self) -> Dict:
+        """Estado del libro mayor para /health"""
+        return {
+            'companies': len(self._companies),
+            'tickets': len(self._tickets),
+            'events_applied': self.events_applied,
+            'events_ignored': self.events_ignored,
+            'last_reconcile': self.last_reconcile.isoformat() if self.last_reconcile else None
+        }
@@ -10,7 +10,12 @@ import os
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
+from datetime import datetime, timedelta
+
 from services.agent_assigner import AgentAssigner
+from services import ticket_snapshot
+from services.records import AgentRecord, TicketRecord, to_epoch
+from services.ticket_snapshot import TicketSnapshot, ALL_STATES, CLOSED_STATES
 
 
 class TestAgentAssigner:
@@ -207,3 +212,259 @@ class TestAgentAssigner:
         agent_overloaded = {"cargaActual": 50}
         assert agent_overloaded["cargaActual"] == 50
         assert agent_overloaded["cargaActual"] > 10  # Should be considered overloaded
+
+
+class TestTicketSnapshot:
+    """Test suite for the shared company ticket snapshot"""
+
+    @pytest.fixture
+    def agent_assigner(self):
+        """Create AgentAssigner instance for testing"""
+        return AgentAssigner("http://localhost:3001", "http://localhost:3002")
+
+    @pytest.fixture
+    def group_agents(self):
+        """Agents of a single attention group"""
+        return [
+            {"_id": "agent1", "nombre": "Juan Pérez", "rol": "soporte"},
+            {"_id": "agent2", "nombre": "María García", "rol": "soporte"},
+            {"_id": "agent3", "nombre": "Pedro López", "rol": "soporte"},
+        ]
+
+    @pytest.fixture
+    def company_tickets(self):
+        """Company tickets with string and populated agenteAsignado"""
+        return [
+            {"_id": "t1", "agenteAsignado": "agent1", "estado": "abierto", "prioridad": "alta"},
+            {"_id": "t2", "agenteAsignado": {"_id": "agent1", "nombre": "Juan"}, "estado": "en_proceso", "prioridad": "media"},
+            {"_id": "t3", "agenteAsignado": "agent1", "estado": "cerrado", "prioridad": "baja"},
+            {"_id": "t4", "agenteAsignado": {"_id": "agent2"}, "estado": "en_espera", "prioridad": "crítica"},
+            {"_id": "t5", "agenteAsignado": None, "estado": "abierto", "prioridad": "media"},
+        ]
+
+    @pytest.mark.unit
+    def test_groups_tickets_by_agent(self, company_tickets):
+        """Tickets are grouped in one pass regardless of agenteAsignado shape"""
+        snapshot = TicketSnapshot("empresa1", company_tickets)
+
+        assert len(snapshot) == 5
+        assert sorted(snapshot.agent_ids) == ["agent1", "agent2"]
+        assert [t.id for t in snapshot.tickets_for("agent1")] == ["t1", "t2"]
+        assert [t.id for t in snapshot.tickets_for("agent1", ALL_STATES)] == ["t1", "t2", "t3"]
+        assert snapshot.tickets_for("unknown") == []
+
+    @pytest.mark.unit
+    async def test_assign_ticket_fetches_company_tickets_once(self, agent_assigner, group_agents, company_tickets):
+        """Upstream ticket calls stay constant no matter how many agents are scored"""
+        snapshot = TicketSnapshot("empresa1", company_tickets)
+        agent_assigner.get_available_agents = AsyncMock(return_value=group_agents)
+        agent_assigner.get_company_snapshot = AsyncMock(return_value=snapshot)
+
+        best_agent = await agent_assigner.assign_ticket({
+            "empresaId": "empresa1",
+            "grupo_atencion": "Mesa de Servicio"
+        })
+
+        agent_assigner.get_company_snapshot.assert_awaited_once_with("empresa1")
+        assert best_agent["_id"] == "agent3"  # Sin carga activa
+        assert best_agent["metrics"]["active_count"] == 0
+
+    @pytest.mark.unit
+    async def test_metrics_from_snapshot(self, agent_assigner, company_tickets):
+        """Metrics are computed from the shared snapshot without extra fetches"""
+        snapshot = TicketSnapshot("empresa1", company_tickets)
+        agent_assigner.get_company_snapshot = AsyncMock()
+
+        metrics = await agent_assigner.calculate_agent_metrics("agent1", "empresa1", snapshot)
+
+        agent_assigner.get_company_snapshot.assert_not_awaited()
+        assert metrics["active_count"] == 2
+        assert metrics["active_weighted"] == 3  # alta (2) + media (1)
+
+
+def _iso(moment):
+    return moment.isoformat() + "Z"
+
+
+def _reference_metrics(assigner, tickets, agent_id, now):
+    """Cálculo ticket por ticket (parseando fechas) contra el que se comparan las columnas"""
+    def parse(value):
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+        except (AttributeError, ValueError):
+            return None
+
+    mine = [t for t in tickets if t.get("agenteAsignado") == agent_id]
+    active = [t for t in mine if t["estado"] in ("abierto", "en_proceso", "en_espera")]
+    recent = [t for t in mine if t["estado"] in ALL_STATES
+              and parse(t.get("createdAt")) and parse(t["createdAt"]) >= now - timedelta(days=30)]
+    ages = [(now - (parse(t.get("fechaAsignacion")) or parse(t.get("createdAt")) or now)).total_seconds() / 86400
+            for t in active]
+    avg_age = sum(ages) / len(ages) if ages else 0.0
+    stagnant = sum(1 for t in active if parse(t.get("updatedAt"))
+                   and (now - parse(t["updatedAt"])).total_seconds() / 3600 > 48)
+    closed_7 = [t for t in recent if t["estado"] in CLOSED_STATES and parse(t["createdAt"]) >= now - timedelta(days=7)]
+    closed_30 = [t for t in recent if t["estado"] in CLOSED_STATES]
+    velocity = len(closed_7) / 7.0
+    efficiency = len(closed_30) / len(recent) if recent else 1.0
+    penalty = assigner._calculate_gaming_penalty({
+        "avg_ticket_age_days": avg_age, "stagnant_count": stagnant,
+        "resolution_velocity": velocity, "efficiency_ratio": efficiency,
+    })
+    return {
+        "active_count": len(active),
+        "active_weighted": sum(ticket_snapshot.priority_weight(t.get("prioridad")) for t in active),
+        "avg_ticket_age_days": round(avg_age, 2),
+        "stagnant_count": stagnant,
+        "resolution_velocity": round(velocity, 2),
+        "efficiency_ratio": round(efficiency, 2),
+        "gaming_penalty": round(penalty, 2),
+    }
+
+
+class TestColumnarMetrics:
+    """Test suite for the columnar snapshot and grouped metric computation"""
+
+    @pytest.fixture
+    def agent_assigner(self):
+        return AgentAssigner("http://localhost:3001", "http://localhost:3002")
+
+    @pytest.fixture
+    def dated_tickets(self):
+        """Tickets with ages, stale updates and closures spread over the last 60 days"""
+        now = datetime.utcnow()
+        states = ["abierto", "en_proceso", "en_espera", "resuelto", "cerrado", "cancelado"]
+        priorities = ["baja", "media", "alta", "critica", None]
+        tickets = []
+        for i in range(90):
+            created = now - timedelta(hours=i * 16)
+            tickets.append({
+                "_id": f"t{i}",
+                "agenteAsignado": f"agent{i % 4}" if i % 9 else None,
+                "estado": states[i % len(states)],
+                "prioridad": priorities[i % len(priorities)],
+                "createdAt": _iso(created),
+                "fechaAsignacion": _iso(created + timedelta(hours=2)) if i % 5 else None,
+                "updatedAt": _iso(created + timedelta(hours=i % 70)) if i % 7 else "no es fecha",
+            })
+        return tickets
+
+    @pytest.mark.unit
+    def test_to_epoch_handles_missing_and_invalid_dates(self):
+        assert to_epoch("1970-01-02T00:00:00Z") == 86400
+        assert to_epoch(datetime(1970, 1, 1, 0, 1)) == 60
+        assert to_epoch(None) != to_epoch(None)  # NaN
+        assert to_epoch("ayer") != to_epoch("ayer")
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("numpy_available", [True, False])
+    def test_group_metrics_match_per_ticket_computation(self, agent_assigner, dated_tickets, monkeypatch, numpy_available):
+        """Grouped column reductions give the same metrics as parsing every ticket"""
+        if numpy_available and not ticket_snapshot.NUMPY_AVAILABLE:
+            pytest.skip("numpy no instalado")
+        monkeypatch.setattr(ticket_snapshot, "NUMPY_AVAILABLE", numpy_available)
+        snapshot = TicketSnapshot("empresa1", dated_tickets)
+        now = datetime.utcnow()
+
+        metrics = agent_assigner.calculate_group_metrics(["agent0", "agent1", "agent2", "agent3", "nadie"], snapshot)
+
+        for agent_id in ("agent0", "agent1", "agent2", "agent3"):
+            assert metrics[agent_id] == pytest.approx(_reference_metrics(agent_assigner, dated_tickets, agent_id, now), abs=0.011)
+        assert metrics["nadie"]["active_count"] == 0
+        assert metrics["nadie"]["efficiency_ratio"] == 1.0
+
+    @pytest.mark.unit
+    def test_columns_reuse_freed_rows(self):
+        """Rows are overwritten in place, freed rows are reused and batch duplicates keep the last one"""
+        columns = ticket_snapshot.TicketColumns(capacity=2)
+        for i in range(40):
+            columns.set(TicketRecord(f"t{i}", "agent1", "abierto", "alta"))
+        for i in range(20):
+            columns.discard(f"t{i}")
+        columns.set(TicketRecord("nuevo", "agent2", "en_proceso"))
+        columns.extend([
+            TicketRecord("a", "agent3", "abierto"),
+            TicketRecord("a", "agent3", "cerrado"),
+            TicketRecord("nuevo", "agent2", "cerrado"),
+        ])
+
+        totals = columns.agent_totals(["agent1", "agent2", "agent3"])
+
+        assert len(columns) == 22
+        assert (totals["agent1"]["active_count"], totals["agent1"]["active_weighted"]) == (20, 40)
+        assert totals["agent2"]["active_count"] == 0
+        assert totals["agent3"]["active_count"] == 0
+
+class TestAssignBatch:
+    """Test suite for batch assignment with projected load"""
+
+    @pytest.fixture
+    def agent_assigner(self):
+        """AgentAssigner with mocked roster and an empty company snapshot"""
+        assigner = AgentAssigner("http://localhost:3001", "http://localhost:3002")
+        agents = {
+            "Mesa de Servicio": [
+                {"_id": "agent1", "nombre": "Juan Pérez"},
+                {"_id": "agent2", "nombre": "María García"},
+                {"_id": "agent3", "nombre": "Pedro López"},
+            ],
+            "Redes": [{"_id": "agent1", "nombre": "Juan Pérez"}],
+        }
+        assigner.get_available_agents = AsyncMock(
+            side_effect=lambda grupo, empresa: [dict(a) for a in agents.get(grupo, [])]
+        )
+        assigner.get_company_snapshot = AsyncMock(side_effect=lambda empresa: TicketSnapshot(empresa, []))
+        return assigner
+
+    @pytest.mark.unit
+    async def test_spreads_tickets_evenly(self, agent_assigner):
+        tickets = [{"id": f"t{i}", "empresaId": "e1", "grupo_atencion": "Mesa de Servicio"} for i in range(6)]
+
+        decisions = await agent_assigner.assign_batch(tickets)
+
+        assert [d["ticketId"] for d in decisions] == [f"t{i}" for i in range(6)]
+        counts = {}
+        for decision in decisions:
+            counts[decision["agent"]["id"]] = counts.get(decision["agent"]["id"], 0) + 1
+        assert counts == {"agent1": 2, "agent2": 2, "agent3": 2}
+
+    @pytest.mark.unit
+    async def test_one_workload_view_per_company(self, agent_assigner):
+        tickets = [
+            {"id": "t1", "empresaId": "e1", "grupo_atencion": "Mesa de Servicio"},
+            {"id": "t2", "empresaId": "e1", "grupo_atencion": "Redes"},
+            {"id": "t3", "empresaId": "e2", "grupo_atencion": "Mesa de Servicio"},
+            {"id": "t4", "empresaId": "e1", "grupo_atencion": "Mesa de Servicio"},
+        ]
+
+        await agent_assigner.assign_batch(tickets)
+
+        assert agent_assigner.get_company_snapshot.await_count == 2
+        assert agent_assigner.get_available_agents.await_count == 3
+
+    @pytest.mark.unit
+    async def test_projected_load_shared_across_groups(self, agent_assigner):
+        tickets = [
+            {"id": "t1", "empresaId": "e1", "grupo_atencion": "Mesa de Servicio", "prioridad": "baja"},
+            {"id": "t2", "empresaId": "e1", "grupo_atencion": "Redes"},
+        ]
+
+        decisions = await agent_assigner.assign_batch(tickets)
+
+        # agent1 gana el empate en Mesa de Servicio y llega a Redes con esa carga proyectada
+        assert decisions[0]["agent"]["id"] == "agent1"
+        assert decisions[1]["agent"]["id"] == "agent1"
+        assert decisions[1]["agent"]["cargaActual"] == 1
+
+    @pytest.mark.unit
+    async def test_invalid_tickets_reported_in_place(self, agent_assigner):
+        tickets = [
+            {"id": "t1", "grupo_atencion": "Mesa de Servicio"},
+            {"id": "t2", "empresaId": "e1", "grupo_atencion": "Inexistente"},
+            {"id": "t3", "empresaId": "e1", "grupo_atencion": "Mesa de Servicio"},
+        ]
+
+        decisions = await agent_assigner.assign_batch(tickets)
+
+        assert [d["success"] for d in decisions] == [False, False, True]
+        assert "empresaId" in decisions[0]["error"]
@@ -0,0 +1,130 @@
+"""
+Unit Tests for the benchmark suite
+Tests the synthetic fixtures, the in-process upstream stubs and regression detection
+"""
+import json
+import pytest
+from datetime import datetime, timedelta
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from benchmarks.synthetic import FakeUpstreams, make_company, make_company_tickets
+from benchmarks import run as bench
+from benchmarks import loadgen
+from logger import get_level
+from services.upstream_client import UpstreamClient
+from services.agent_assigner import AgentAssigner
+from services.ticket_snapshot import ACTIVE_STATES, RECENT_DAYS
+
+
+@pytest.mark.unit
+class TestSynthetic:
+    """Tests de los datos sintéticos y upstreams falsos"""
+
+    def test_data_is_reproducible(self):
+        """Test que la misma semilla genera los mismos tickets"""
+        first = make_company_tickets('e1', 50, ['a1', 'a2'], seed=3)
+        second = make_company_tickets('e1', 50, ['a1', 'a2'], seed=3)
+
+        assert [t['estado'] for t in first] == [t['estado'] for t in second]
+        assert [t['agenteAsignado'] for t in first] == [t['agenteAsignado'] for t in second]
+
+    async def test_assigner_pages_through_fake_tickets(self):
+        """Test que el asignador pagina contra tickets-svc falso"""
+        company = make_company('e1', n_agents=5, n_tickets=2500, groups=['Mesa de Servicio'])
+        upstreams = FakeUpstreams({'e1': company})
+        upstream = UpstreamClient('token', transport=upstreams.transport())
+        upstream.register('usuarios', 'http://usuarios-svc:3001')
+        upstream.register('tickets', 'http://tickets-svc:3002')
+        assigner = AgentAssigner('http://usuarios-svc:3001', 'http://tickets-svc:3002', upstream=upstream)
+
+        tickets = await assigner.fetch_company_tickets('e1')
+        best = await assigner.assign_ticket({'empresaId': 'e1', 'grupo_atencion': 'Mesa de Servicio'})
+        await upstream.close()
+
+        # Activos completos (más de 1000) y cerrados con agente solo dentro de la ventana
+        since = datetime.utcnow() - timedelta(days=RECENT_DAYS)
+
+        def expected(margin):
+            return {t['_id'] for t in company['tickets']
+                    if t['estado'] in ACTIVE_STATES
+                    or (t['agenteAsignado'] and datetime.fromisoformat(t['createdAt'][:19]) >= since + margin)}
+
+        fetched = {t['_id'] for t in tickets}
+        assert len(fetched) == len(tickets) > 1000
+        assert expected(timedelta(minutes=1)) <= fetched <= expected(timedelta(minutes=-1))
+        assert upstreams.requests['GET tickets-svc/tickets'] >= 3
+        assert best['_id'].startswith('e1-agente-')
+
+
+@pytest.mark.unit
+class TestBenchmarkRunner:
+    """Tests del ejecutor de benchmarks"""
+
+    def test_compare_flags_regressions(self):
+        """Test que solo se marcan caídas mayores a la tolerancia"""
+        baseline = {'results': [
+            {'name': 'assign_ticket', 'params': {'agents': 10}, 'ops_per_sec': 100.0},
+            {'name': 'classify_ticket', 'params': {'case': 'exact'}, 'ops_per_sec': 1000.0},
+        ]}
+        results = [
+            {'name': 'assign_ticket', 'params': {'agents': 10}, 'ops_per_sec': 70.0},
+            {'name': 'classify_ticket', 'params': {'case': 'exact'}, 'ops_per_sec': 950.0},
+            {'name': 'nuevo', 'params': {}, 'ops_per_sec': 1.0},
+        ]
+
+        regressions = bench.compare(results, baseline, max_regression=0.15)
+
+        assert [r['name'] for r in regressions] == ['assign_ticket']
+        assert regressions[0]['change'] == pytest.approx(-0.3)
+
+    def test_tiny_run_writes_machine_readable_report(self, tmp_path):
+        """Test que una corrida mínima produce el JSON con todos los casos"""
+        output = tmp_path / 'resultados.json'
+
+        code = bench.main(['--agents', '3', '--tickets', '40', '--repeat', '1', '--min-time', '0',
+                           '--output', str(output)])
+
+        report = json.loads(output.read_text(encoding='utf-8'))
+        assert code == 0
+        assert report['schema'] == bench.SCHEMA_VERSION
+        names = {r['name'] for r in report['results']}
+        assert names == set(bench.BENCHMARKS)
+        assert all(r['ops_per_sec'] > 0 for r in report['results'])
+
+
+@pytest.mark.unit
+class TestLoadGenerator:
+    """Tests del generador de carga extremo a extremo"""
+
+    def test_percentile_uses_nearest_rank(self):
+        """Test de percentiles sobre valores ordenados"""
+        values = [i / 100 for i in range(1, 101)]
+
+        assert loadgen.percentile(values, 0.50) == pytest.approx(0.51)
+        assert loadgen.percentile(values, 0.99) == pytest.approx(0.99)
+        assert loadgen.percentile([], 0.5) is None
+
+    def test_closed_loop_processes_every_published_ticket(self, monkeypatch):
+        """Test que cada 'ticket.creado' termina en 'ticket.procesado' con latencia medida"""
+        import main
+        monkeypatch.setattr(main, 'upstream_client', main.upstream_client)
+        monkeypatch.setattr(main.agent_assigner, 'upstream', main.agent_assigner.upstream)
+        monkeypatch.setattr(main.agent_assigner.fetcher, 'upstream', main.agent_assigner.fetcher.upstream)
+        monkeypatch.setattr(main.rabbitmq_client, 'publisher', main.rabbitmq_client.publisher)
+        monkeypatch.setattr(main, 'idempotency', main.idempotency)
+
+        report = loadgen.main(['--mode', 'closed', '--concurrency', '2', '--duration', '0.3',
+                               '--companies', '2', '--agents', '12', '--tickets', '50',
+                               '--upstream-latency-ms', '0', '--upstream-jitter-ms', '0',
+                               '--log-level', get_level()])
+
+        result = report['results'][0]
+        assert result['sent'] > 0
+        assert result['outcomes']['processed'] == result['sent']
+        assert result['pending'] == 0
+        assert result['latency_ms']['p50'] is not None
+        assert report['upstream']['assigned'] == result['sent']
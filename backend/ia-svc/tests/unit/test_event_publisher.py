@@ -0,0 +1,285 @@
+"""
+Unit Tests for EventPublisher
+Tests batching and publisher-confirm bookkeeping without a live broker
+"""
+import json
+import pytest
+from types import SimpleNamespace
+import sys
+import os
+import threading
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+import pika
+from services.event_outbox import EventOutbox
+from services.event_publisher import EventPublisher, PublishNacked
+
+
+class FakeIOLoop:
+    """Runs thread-safe callbacks inline and records timers"""
+
+    def __init__(self):
+        self.timers = []
+
+    def add_callback_threadsafe(self, callback):
+        callback()
+
+    def call_later(self, delay, callback):
+        self.timers.append((delay, callback))
+
+    def run_timers(self):
+        timers, self.timers = self.timers, []
+        for _, callback in timers:
+            callback()
+
+
+class FakeChannel:
+    def __init__(self):
+        self.is_open = True
+        self.published = []
+
+    def basic_publish(self, exchange, routing_key, body, properties):
+        self.published.append((routing_key, json.loads(body), properties))
+
+
+def confirm(tag, multiple=False, ack=True):
+    method = pika.spec.Basic.Ack(delivery_tag=tag, multiple=multiple) if ack \
+        else pika.spec.Basic.Nack(delivery_tag=tag, multiple=multiple)
+    return SimpleNamespace(method=method)
+
+
+@pytest.fixture
+def publisher():
+    pub = EventPublisher('amqp://localhost', batch_size=3, linger_ms=5)
+    pub._connection = SimpleNamespace(ioloop=FakeIOLoop())
+    pub._channel = FakeChannel()
+    pub._ready.set()
+    return pub
+
+
+@pytest.mark.unit
+class TestEventPublisher:
+    """Test suite for the dedicated confirm-enabled publisher"""
+
+    def test_events_linger_until_timer(self, publisher):
+        publisher.publish('ticket.procesado', {'ticketId': 't1'})
+        publisher.publish('ticket.procesado', {'ticketId': 't2'})
+
+        assert publisher._channel.published == []
+        assert len(publisher._connection.ioloop.timers) == 1
+
+        publisher._connection.ioloop.run_timers()
+
+        assert [body['ticketId'] for _, body, _ in publisher._channel.published] == ['t1', 't2']
+        assert publisher.stats()['awaiting_confirm'] == 2
+
+    def test_full_batch_flushes_immediately(self, publisher):
+        for i in range(3):
+            publisher.publish('ticket.error', {'ticketId': f't{i}'})
+
+        assert len(publisher._channel.published) == 3
+        assert publisher.stats()['queued'] == 0
+
+    def test_messages_are_persistent_with_id(self, publisher):
+        future = publisher.publish('ticket.procesado', {'ticketId': 't1'})
+        publisher._connection.ioloop.run_timers()
+
+        _, _, properties = publisher._channel.published[0]
+        assert properties.delivery_mode == 2
+        assert properties.message_id
+
+        publisher._on_confirm(confirm(1))
+        assert future.result(timeout=0) == properties.message_id
+
+    def test_multiple_ack_confirms_all_lower_tags(self, publisher):
+        futures = [publisher.publish('ticket.procesado', {'ticketId': f't{i}'}) for i in range(3)]
+
+        publisher._on_confirm(confirm(2, multiple=True))
+
+        assert futures[0].done() and futures[1].done()
+        assert not futures[2].done()
+        stats = publisher.stats()
+        assert stats['confirmed'] == 2
+        assert stats['awaiting_confirm'] == 1
+        assert stats['confirm_latency_ms']['p50'] is not None
+
+    def test_nack_fails_future(self, publisher):
+        future = publisher.publish('ticket.sugerencia_asignacion', {'ticketId': 't1'})
+        publisher._connection.ioloop.run_timers()
+
+        publisher._on_confirm(confirm(1, ack=False))
+
+        with pytest.raises(PublishNacked):
+            future.result(timeout=0)
+        assert publisher.stats()['nacked'] == 1
+
+    def test_unconfirmed_events_requeued_in_order(self, publisher):
+        publisher.publish('ticket.procesado', {'ticketId': 't1'})
+        publisher.publish('ticket.procesado', {'ticketId': 't2'})
+        publisher._connection.ioloop.run_timers()
+        publisher._ready.clear()
+        publisher.publish('ticket.procesado', {'ticketId': 't3'})
+
+        publisher._requeue_unconfirmed()
+
+        assert [json.loads(e.body)['ticketId'] for e in publisher._queue] == ['t1', 't2', 't3']
+        assert publisher.stats()['awaiting_confirm'] == 0
+
+    def test_events_wait_for_channel(self):
+        pub = EventPublisher('amqp://localhost', batch_size=1, linger_ms=0)
+        pub.publish('ticket.procesado', {'ticketId': 't1'})
+
+        assert pub.stats()['queued'] == 1
+        assert pub.stats()['connected'] is False
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    box = EventOutbox(str(tmp_path / 'outbox.db'), compact_interval=0)
+    yield box
+    box.close()
+
+
+def connected(pub):
+    pub._connection = SimpleNamespace(ioloop=FakeIOLoop())
+    pub._channel = FakeChannel()
+    pub._delivery_tag = 0
+    pub._on_ready()
+    return pub
+
+
+@pytest.mark.unit
+class TestEventOutbox:
+    """Tests del outbox durable detrás del publicador"""
+
+    def test_events_survive_a_restart(self, tmp_path):
+        """Events published while the broker is down are replayed, in order, by the next process"""
+        path = str(tmp_path / 'outbox.db')
+        first = EventPublisher('amqp://localhost', batch_size=10, linger_ms=0, outbox=EventOutbox(path))
+        for i in range(3):
+            first.publish('ticket.procesado', {'ticketId': f't{i}'}, headers={'traceparent': 'x'})
+        assert first.stats()['outbox']['pending'] == 3
+        first.outbox.close()
+
+        second = connected(EventPublisher('amqp://localhost', batch_size=10, linger_ms=0, outbox=EventOutbox(path)))
+
+        published = second._channel.published
+        assert [body['ticketId'] for _, body, _ in published] == ['t0', 't1', 't2']
+        assert published[0][2].headers == {'traceparent': 'x'}
+        second._on_confirm(confirm(3, multiple=True))
+        assert second.stats()['outbox']['pending'] == 0
+        second.outbox.close()
+
+    def test_ack_deletes_and_resolves_caller_future(self, outbox):
+        pub = connected(EventPublisher('amqp://localhost', batch_size=1, linger_ms=0, outbox=outbox))
+        future = pub.publish('ticket.procesado', {'ticketId': 't1'})
+
+        assert outbox.pending() == 1
+        _, _, properties = pub._channel.published[0]
+        pub._on_confirm(confirm(1))
+
+        assert future.result(timeout=0) == properties.message_id
+        assert outbox.pending() == 0
+        assert outbox.stats()['compactions'] == 1
+
+    def test_connection_loss_replays_unconfirmed_in_order(self, outbox):
+        """Unconfirmed events are sent again after reconnecting, keeping per-ticket order"""
+        pub = connected(EventPublisher('amqp://localhost', batch_size=1, linger_ms=0, outbox=outbox))
+        futures = [pub.publish('ticket.procesado', {'ticketId': 't1', 'paso': i}) for i in range(3)]
+        pub._on_confirm(confirm(1))
+        pub._ready.clear()
+        pub._requeue_unconfirmed()
+
+        connected(pub)
+        pub._connection.ioloop.run_timers()
+
+        assert [body['paso'] for _, body, _ in pub._channel.published] == [1, 2]
+        pub._on_confirm(confirm(2, multiple=True))
+        assert all(f.done() for f in futures)
+        assert outbox.pending() == 0
+
+    def test_flush_between_append_and_return_resolves_caller_future(self, outbox):
+        """A batch that reads the row before publish() returns still carries the caller's Future"""
+        pub = EventPublisher('amqp://localhost', batch_size=10, linger_ms=0, outbox=outbox)
+        append = outbox.append
+        batches, readers = [], []
+
+        def append_then_flush(*args, **kwargs):
+            stored = append(*args, **kwargs)
+            reader = threading.Thread(target=lambda: batches.append(pub._next_outbox_batch()))
+            reader.start()
+            reader.join(timeout=0.2)  # El hilo del publicador corre mientras publish() sigue adentro
+            readers.append(reader)
+            return stored
+
+        outbox.append = append_then_flush
+        future = pub.publish('ticket.procesado', {'ticketId': 't1'})
+        readers[0].join(timeout=5)
+
+        [event] = batches[0]
+        assert event.future is future
+        assert not pub._outbox_futures
+
+    def test_nacked_event_stays_and_is_retried(self, outbox):
+        pub = connected(EventPublisher('amqp://localhost', batch_size=1, linger_ms=0, outbox=outbox))
+        pub.NACK_RETRY_SECONDS = 0
+        future = pub.publish('ticket.error', {'ticketId': 't1'})
+
+        pub._on_confirm(confirm(1, ack=False))
+
+        assert not future.done()
+        assert outbox.pending() == 1
+        pub._connection.ioloop.run_timers()
+        assert len(pub._channel.published) == 2
+        pub._on_confirm(confirm(2))
+        assert future.done() and outbox.pending() == 0
+
+    def test_nack_retries_only_rejected_events(self, outbox):
+        """Events still awaiting confirmation are not read again when another one is nacked"""
+        pub = connected(EventPublisher('amqp://localhost', batch_size=10, linger_ms=0, outbox=outbox))
+        pub.NACK_RETRY_SECONDS = 0
+        futures = [pub.publish('ticket.procesado', {'ticketId': f't{i}'}) for i in range(3)]
+
+        pub._on_confirm(confirm(2, ack=False))  # t1 rechazado; t0 y t2 siguen en vuelo
+        pub._connection.ioloop.run_timers()
+
+        assert [body['ticketId'] for _, body, _ in pub._channel.published] == ['t0', 't1', 't2', 't1']
+        pub._on_confirm(confirm(4, multiple=True))
+        assert all(f.done() for f in futures)
+        assert outbox.pending() == 0
+
+    def test_backlog_drains_in_batches(self, outbox):
+        """A large backlog goes out one batch per ioloop turn"""
+        pub = EventPublisher('amqp://localhost', batch_size=2, linger_ms=0, outbox=outbox)
+        for i in range(5):
+            pub.publish('ticket.procesado', {'ticketId': f't{i}'})
+
+        connected(pub)
+        assert len(pub._channel.published) == 2
+        pub._connection.ioloop.run_timers()
+        pub._connection.ioloop.run_timers()
+
+        assert [body['ticketId'] for _, body, _ in pub._channel.published] == ['t0', 't1', 't2', 't3', 't4']
+
+    def test_nack_holds_back_later_events_of_the_same_ticket(self, outbox):
+        """After a nack, later events of that ticket wait until the rejected one is confirmed"""
+        pub = connected(EventPublisher('amqp://localhost', batch_size=1, linger_ms=0, outbox=outbox))
+        pub.NACK_RETRY_SECONDS = 0
+        pub.publish('ticket.procesado', {'ticketId': 't1', 'paso': 0})
+        pub._on_confirm(confirm(1, ack=False))
+
+        pub.publish('ticket.sugerencia_asignacion', {'ticketId': 't1', 'paso': 1})
+        pub.publish('ticket.procesado', {'ticketId': 't2', 'paso': 0})
+        pub._connection.ioloop.run_timers()
+
+        sent = [(body['ticketId'], body['paso']) for _, body, _ in pub._channel.published]
+        assert sent == [('t1', 0), ('t1', 0), ('t2', 0)]
+
+        pub._on_confirm(confirm(3, multiple=True))
+        pub._connection.ioloop.run_timers()
+
+        assert [(body['ticketId'], body['paso']) for _, body, _ in pub._channel.published][-1] == ('t1', 1)
+        pub._on_confirm(confirm(4))
+        assert outbox.pending() == 0
@@ -0,0 +1,154 @@
+"""
+Unit Tests for the idempotency cache
+Tests duplicate detection for redelivered 'ticket.creado' messages, the LRU bound and the SQLite store
+"""
+import pytest
+import sys
+import os
+from unittest.mock import AsyncMock, MagicMock
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.idempotency import IdempotencyCache, message_version
+
+
+@pytest.mark.unit
+class TestIdempotencyCache:
+    """Tests de la caché de idempotencia"""
+
+    def test_duplicate_is_rejected(self):
+        """Test que un ticket procesado o en proceso no se vuelve a reservar"""
+        cache = IdempotencyCache()
+
+        assert cache.claim("t1") is True
+        assert cache.claim("t1") is False  # Re-entrega mientras se procesa
+        cache.complete("t1")
+        assert cache.claim("t1") is False
+        assert cache.stats()['duplicates'] == 2
+
+    def test_failed_ticket_is_released(self):
+        """Test que un ticket que falló se puede reintentar"""
+        cache = IdempotencyCache()
+        cache.claim("t1")
+        cache.release("t1")
+
+        assert cache.claim("t1") is True
+
+    def test_release_keeps_completed_tickets(self):
+        cache = IdempotencyCache()
+        cache.claim("t1")
+        cache.complete("t1")
+        cache.release("t1")
+
+        assert cache.claim("t1") is False
+
+    def test_newer_version_is_processed_again(self):
+        """Test que una versión mayor del mismo ticket se procesa; una igual o menor no"""
+        cache = IdempotencyCache()
+        cache.claim("t1", version=1)
+        cache.complete("t1")
+
+        assert cache.claim("t1", version=1) is False
+        assert cache.claim("t1") is False
+        assert cache.claim("t1", version=2) is True
+
+    def test_lru_is_bounded(self):
+        """Test que se desaloja el ticket menos usado"""
+        cache = IdempotencyCache(max_entries=2)
+        for ticket_id in ("t1", "t2", "t3"):
+            cache.claim(ticket_id)
+            cache.complete(ticket_id)
+
+        assert cache.stats()['size'] == 2
+        assert cache.stats()['evictions'] == 1
+        assert cache.claim("t1") is True
+
+    def test_store_survives_restart(self, tmp_path):
+        """Test que los tickets terminados se recuerdan entre procesos vía SQLite"""
+        db_path = str(tmp_path / "idempotency.db")
+        first = IdempotencyCache(db_path=db_path)
+        first.claim("t1", version=3)
+        first.complete("t1")
+        first.claim("t2")  # En proceso: no se persiste
+        first.close()
+
+        second = IdempotencyCache(db_path=db_path)
+
+        assert second.claim("t1", version=3) is False
+        assert second.claim("t2") is True
+        assert second.stats()['store_hits'] == 1
+        second.close()
+
+    def test_store_entries_expire(self, tmp_path):
+        db_path = str(tmp_path / "idempotency.db")
+        first = IdempotencyCache(db_path=db_path, ttl_seconds=-1)
+        first.claim("t1")
+        first.complete("t1")
+        first.close()
+
+        second = IdempotencyCache(db_path=db_path, ttl_seconds=-1)
+        assert second.claim("t1") is True
+        second.close()
+
+    def test_error_is_reported_once_per_version(self):
+        cache = IdempotencyCache()
+
+        assert cache.first_error("t1")
+        assert not cache.first_error("t1")
+        assert cache.first_error("t1", version=2)
+
+    def test_message_version(self):
+        assert message_version({"ticket": {"id": "t1"}}) is None
+        assert message_version({"version": "4", "ticket": {"id": "t1"}}) == 4
+        assert message_version({"ticket": {"id": "t1", "__v": 2}}) == 2
+
+
+@pytest.mark.unit
+class TestDuplicateTickets:
+    """Tests del descarte de 'ticket.creado' duplicados en main.process_new_ticket"""
+
+    @pytest.fixture
+    def pipeline(self, monkeypatch):
+        import main
+        monkeypatch.setattr(main, 'idempotency', IdempotencyCache())
+        monkeypatch.setattr(main, 'update_ticket_classification', AsyncMock())
+        monkeypatch.setattr(main, 'assign_ticket_to_agent', AsyncMock())
+        monkeypatch.setattr(main, 'publish_event', MagicMock())
+        monkeypatch.setattr(main.agent_assigner, 'assign_ticket',
+                            AsyncMock(return_value={'_id': 'agent1', 'nombre': 'Juan'}))
+        return main
+
+    async def test_redelivery_makes_no_upstream_calls(self, pipeline):
+        """Test que el duplicado no clasifica, no asigna y no vuelve a publicar"""
+        message = {'ticket': {'id': 'dup-1', 'empresaId': 'e1', 'titulo': 'No tengo VPN'}}
+
+        await pipeline.process_new_ticket(message)
+        await pipeline.process_new_ticket({'ticket': dict(message['ticket'])})
+
+        assert pipeline.agent_assigner.assign_ticket.await_count == 1
+        assert pipeline.assign_ticket_to_agent.await_count == 1
+        assert pipeline.publish_event.call_count == 1
+
+    async def test_failed_ticket_is_retried(self, pipeline):
+        """Test que una re-entrega después de un error sí se procesa"""
+        pipeline.agent_assigner.assign_ticket.side_effect = [Exception('sin agentes'), {'_id': 'agent1'}]
+        message = {'ticket': {'id': 'dup-2', 'empresaId': 'e1'}}
+
+        with pytest.raises(pipeline.TicketProcessingError):
+            await pipeline.process_new_ticket(dict(message))  # El consumidor hace nack y se reencola
+        await pipeline.process_new_ticket(dict(message))
+
+        assert pipeline.agent_assigner.assign_ticket.await_count == 2
+        assert [call.args[0] for call in pipeline.publish_event.call_args_list] == ['ticket.error', 'ticket.procesado']
+
+    async def test_repeated_failure_publishes_one_error(self, pipeline):
+        """Test que un fallo determinista reentregado publica 'ticket.error' una sola vez"""
+        pipeline.agent_assigner.assign_ticket.side_effect = Exception('sin agentes')
+        message = {'ticket': {'id': 'dup-3', 'empresaId': 'e1'}}
+
+        for _ in range(2):  # Primer intento y la reentrega tras el nack
+            with pytest.raises(pipeline.TicketProcessingError):
+                await pipeline.process_new_ticket(dict(message))
+
+        assert [call.args[0] for call in pipeline.publish_event.call_args_list] == ['ticket.error']
@@ -0,0 +1,138 @@
+"""
+Unit Tests for the structured logger
+Tests JSON formatting, lazy formatting, the background queue listener and runtime levels
+"""
+import io
+import json
+import logging
+import logging.handlers
+import pytest
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from logger import JsonFormatter, get_logger, init_logger, shutdown_logger, set_level, get_level
+
+
+@pytest.fixture
+def captured():
+    """Logger inicializado contra un buffer en memoria; se restaura al terminar"""
+    shutdown_logger()
+    stream = io.StringIO()
+    init_logger(level='INFO', fmt='json', stream=stream)
+    yield stream
+    shutdown_logger()
+    logging.getLogger('ia').handlers = []
+    logging.getLogger('ia').setLevel(logging.NOTSET)
+    logging.getLogger('ia.pruebas').setLevel(logging.NOTSET)
+
+
+def flushed_lines(stream):
+    """Detener el listener (vacía la cola) y devolver las líneas JSON escritas"""
+    shutdown_logger()
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+@pytest.mark.unit
+class TestJsonFormatter:
+    """Tests del formato JSON por línea"""
+
+    def test_formats_core_fields_and_extra(self):
+        """Test que incluye campos base y los de 'extra'"""
+        record = logging.LogRecord('ia.main', logging.INFO, __file__, 1, 'Ticket %s asignado', ('T1',), None)
+        record.ticket_id = 'T1'
+
+        entry = json.loads(JsonFormatter('dev').format(record))
+
+        assert entry['level'] == 'INFO'
+        assert entry['logger'] == 'ia.main'
+        assert entry['msg'] == 'Ticket T1 asignado'
+        assert entry['branch'] == 'dev'
+        assert entry['ticket_id'] == 'T1'
+        assert 'args' not in entry
+
+    def test_includes_exception(self):
+        """Test que serializa la excepción"""
+        try:
+            raise RuntimeError('boom')
+        except RuntimeError:
+            record = logging.LogRecord('ia.main', logging.ERROR, __file__, 1, 'falló', (), sys.exc_info())
+
+        entry = json.loads(JsonFormatter('dev').format(record))
+
+        assert 'RuntimeError: boom' in entry['exc']
+
+
+@pytest.mark.unit
+class TestQueueLogging:
+    """Tests del logging a través de la cola"""
+
+    def test_get_logger_uses_service_hierarchy(self):
+        """Test que los módulos cuelgan del logger 'ia'"""
+        assert get_logger('services.agent_assigner').name == 'ia.agent_assigner'
+
+    def test_records_are_written_by_listener(self, captured):
+        """Test que el hilo de fondo escribe los registros"""
+        get_logger('pruebas').info('Hola %s', 'mundo', extra={'empresa_id': 'E1'})
+
+        lines = flushed_lines(captured)
+
+        assert lines[-1]['msg'] == 'Hola mundo'
+        assert lines[-1]['empresa_id'] == 'E1'
+
+    def test_exception_survives_the_queue(self, captured):
+        """Test que la traza llega al JSON aunque pase por la cola"""
+        try:
+            raise RuntimeError('boom')
+        except RuntimeError:
+            get_logger('pruebas').exception('Falló %s', 'algo')
+
+        lines = flushed_lines(captured)
+
+        assert lines[-1]['msg'] == 'Falló algo'
+        assert 'RuntimeError: boom' in lines[-1]['exc']
+
+    def test_suppressed_levels_are_not_formatted(self, captured):
+        """Test que un DEBUG suprimido no evalúa sus argumentos"""
+        class Expensive:
+            calls = 0
+
+            def __str__(self):
+                Expensive.calls += 1
+                return 'caro'
+
+        get_logger('pruebas').debug('Detalle %s', Expensive())
+
+        assert flushed_lines(captured) == []
+        assert Expensive.calls == 0
+
+    def test_init_is_idempotent(self, captured):
+        """Test que inicializar dos veces no duplica handlers"""
+        init_logger()
+
+        handlers = logging.getLogger('ia').handlers
+        assert sum(isinstance(h, logging.handlers.QueueHandler) for h in handlers) == 1
+
+
+@pytest.mark.unit
+class TestRuntimeLevel:
+    """Tests del cambio de nivel en caliente"""
+
+    def test_set_level_for_one_logger(self, captured):
+        """Test que se puede subir el detalle de un solo logger"""
+        set_level('debug', 'pruebas')
+        get_logger('pruebas').debug('visible')
+        get_logger('otro').debug('oculto')
+
+        lines = flushed_lines(captured)
+
+        assert get_level('pruebas') == 'DEBUG'
+        assert get_level() == 'INFO'
+        assert [line['msg'] for line in lines] == ['visible']
+
+    def test_invalid_level_raises(self):
+        """Test que un nivel inexistente es un error"""
+        with pytest.raises(ValueError):
+            set_level('VERBOSO')
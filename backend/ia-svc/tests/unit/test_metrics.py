@@ -0,0 +1,145 @@
+"""
+Unit Tests for the Prometheus metrics
+Tests the text exposition format and the instrumentation of upstream calls and consumers
+"""
+import httpx
+import pytest
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.metrics import MetricsRegistry, UPSTREAM_LATENCY
+from services.upstream_client import UpstreamClient
+from services.resilience import RetryPolicy
+from services.rabbitmq_client import RabbitMQClient
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+@pytest.mark.unit
+class TestExposition:
+    """Tests del formato de exposición"""
+
+    def test_counter_with_labels(self, registry):
+        """Test que un contador se expone por combinación de etiquetas"""
+        counter = registry.counter('ia_test_total', 'Prueba', ['outcome'])
+        counter.inc(outcome='processed')
+        counter.inc(2, outcome='processed')
+        counter.inc(outcome='error')
+
+        text = registry.render()
+
+        assert '# TYPE ia_test_total counter' in text
+        assert 'ia_test_total{outcome="processed"} 3' in text
+        assert 'ia_test_total{outcome="error"} 1' in text
+
+    def test_histogram_buckets_are_cumulative(self, registry):
+        """Test que los buckets son acumulativos y terminan en +Inf"""
+        histogram = registry.histogram('ia_test_seconds', 'Prueba', ['stage'], buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 3.0):
+            histogram.observe(value, stage='classify')
+
+        text = registry.render()
+
+        assert 'ia_test_seconds_bucket{stage="classify",le="0.1"} 1' in text
+        assert 'ia_test_seconds_bucket{stage="classify",le="1"} 3' in text
+        assert 'ia_test_seconds_bucket{stage="classify",le="+Inf"} 4' in text
+        assert 'ia_test_seconds_count{stage="classify"} 4' in text
+        assert 'ia_test_seconds_sum{stage="classify"} 4.25' in text
+
+    def test_time_observes_even_on_error(self, registry):
+        """Test que time() registra la duración aunque el bloque falle"""
+        histogram = registry.histogram('ia_test_seconds', 'Prueba', ['stage'])
+
+        with pytest.raises(RuntimeError):
+            with histogram.time(stage='put_assignment'):
+                raise RuntimeError('boom')
+
+        assert histogram.count(stage='put_assignment') == 1
+
+    def test_gauge_function_is_read_at_scrape(self, registry):
+        """Test que los gauges con función se leen al exponer y None se omite"""
+        gauge = registry.gauge('ia_test_backlog', 'Prueba', ['consumer'])
+        state = {'value': None}
+        gauge.set_function(lambda: state['value'], consumer='tickets')
+
+        assert 'ia_test_backlog{' not in registry.render()
+
+        state['value'] = 7
+        assert 'ia_test_backlog{consumer="tickets"} 7' in registry.render()
+
+    def test_wrong_labels_raise(self, registry):
+        """Test que etiquetas distintas a las declaradas son un error"""
+        counter = registry.counter('ia_test_total', 'Prueba', ['outcome'])
+
+        with pytest.raises(ValueError):
+            counter.inc(stage='x')
+
+    def test_label_values_are_escaped(self, registry):
+        """Test que comillas y saltos de línea se escapan"""
+        counter = registry.counter('ia_test_total', 'Prueba', ['outcome'])
+        counter.inc(outcome='a"b\nc')
+
+        assert 'ia_test_total{outcome="a\\"b\\nc"} 1' in registry.render()
+
+    def test_register_twice_returns_same_metric(self, registry):
+        """Test que registrar de nuevo devuelve la misma métrica"""
+        first = registry.counter('ia_test_total', 'Prueba', ['outcome'])
+
+        assert registry.counter('ia_test_total', 'Prueba', ['outcome']) is first
+        with pytest.raises(ValueError):
+            registry.gauge('ia_test_total', 'Prueba', ['outcome'])
+
+
+@pytest.mark.unit
+class TestInstrumentation:
+    """Tests de la instrumentación de upstreams y consumidores"""
+
+    async def test_upstream_latency_by_host_and_status(self):
+        """Test que cada petición upstream se mide por host y status"""
+        def handler(request: httpx.Request):
+            return httpx.Response(404 if request.url.path == '/missing' else 200, json={})
+
+        upstream = UpstreamClient('token', transport=httpx.MockTransport(handler))
+        upstream.register('metrics-test', 'http://tickets-svc:3002')
+        before_ok = UPSTREAM_LATENCY.count(host='metrics-test', status='200')
+
+        await upstream.get('metrics-test', '/tickets')
+        await upstream.get('metrics-test', '/missing')
+        await upstream.close()
+
+        assert UPSTREAM_LATENCY.count(host='metrics-test', status='200') == before_ok + 1
+        assert UPSTREAM_LATENCY.count(host='metrics-test', status='404') == 1
+
+    async def test_upstream_transport_errors_are_measured(self):
+        """Test que un error de transporte se mide con status 'error'"""
+        def handler(request: httpx.Request):
+            raise httpx.ConnectError('refused', request=request)
+
+        upstream = UpstreamClient('token', transport=httpx.MockTransport(handler), retry=RetryPolicy(max_attempts=1))
+        upstream.register('metrics-down', 'http://tickets-svc:3002')
+
+        with pytest.raises(httpx.ConnectError):
+            await upstream.get('metrics-down', '/tickets')
+        await upstream.close()
+
+        assert UPSTREAM_LATENCY.count(host='metrics-down', status='error') == 1
+
+    def test_thread_mode_tracks_in_flight(self):
+        """Test que el modo thread también cuenta los mensajes en vuelo"""
+        client = RabbitMQClient('amqp://localhost:5672')
+        seen = []
+
+        class Connection:
+            def add_callback_threadsafe(self, callback):
+                pass
+
+        client._process_and_settle(Connection(), None, 1, False, lambda message: seen.append(client.in_flight), {})
+
+        assert seen == [1]
+        assert client.in_flight == 0
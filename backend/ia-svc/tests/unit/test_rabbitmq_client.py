@@ -0,0 +1,204 @@
+"""
+Unit Tests for RabbitMQ Client
+Tests the asyncio-native consumer dispatch without a live broker
+"""
+import asyncio
+import json
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.rabbitmq_client import RabbitMQClient, CONSUMER_MODE_ASYNCIO
+
+
+class FakeChannel:
+    """Minimal stand-in for a pika channel"""
+
+    def __init__(self):
+        self.is_open = True
+        self.acked = []
+        self.nacked = []
+
+    def basic_ack(self, delivery_tag):
+        self.acked.append(delivery_tag)
+
+    def basic_nack(self, delivery_tag, requeue=True):
+        self.nacked.append((delivery_tag, requeue))
+
+
+def delivery(tag, routing_key='ticket.creado', redelivered=False):
+    return SimpleNamespace(delivery_tag=tag, routing_key=routing_key, redelivered=redelivered)
+
+
+class TestAsyncioConsumer:
+    """Test suite for the asyncio consumer mode"""
+
+    @pytest.fixture
+    async def client(self):
+        client = RabbitMQClient('amqp://localhost:5672', consumer_mode=CONSUMER_MODE_ASYNCIO, max_in_flight=2)
+        client._loop = asyncio.get_running_loop()
+        return client
+
+    @pytest.mark.unit
+    async def test_start_consuming_does_not_block(self, client):
+        """start_consuming returns immediately and uses the running loop"""
+        with patch('services.rabbitmq_client.AsyncioConnection') as connection_cls:
+            client.start_consuming('ia_tickets', 'ticket.creado', callback=MagicMock())
+
+        assert client._loop is asyncio.get_running_loop()
+        assert connection_cls.call_args.kwargs['custom_ioloop'] is client._loop
+
+    @pytest.mark.unit
+    async def test_ack_after_coroutine_completes(self, client):
+        """Messages are acked only once the handler has finished"""
+        channel = FakeChannel()
+        release = asyncio.Event()
+        seen = []
+
+        async def handler(message):
+            seen.append(message)
+            await release.wait()
+
+        client._on_async_message(handler, False, channel, delivery(1), None, json.dumps({'ticket': {'id': 't1'}}))
+        await asyncio.sleep(0)
+
+        assert seen == [{'ticket': {'id': 't1'}}]
+        assert client.in_flight == 1
+        assert channel.acked == []
+
+        release.set()
+        await asyncio.gather(*client._tasks)
+        assert channel.acked == [1]
+        assert client.in_flight == 0
+
+    @pytest.mark.unit
+    async def test_sync_callback_receives_routing_key(self, client):
+        """Sync callbacks run off the loop and can receive the routing key"""
+        channel = FakeChannel()
+        seen = []
+
+        client._on_async_message(lambda key, msg: seen.append((key, msg)), True, channel,
+                                 delivery(7, 'usuario.actualizado'), None, b'{"empresaId": "e1"}')
+        await asyncio.gather(*client._tasks)
+
+        assert seen == [('usuario.actualizado', {'empresaId': 'e1'})]
+        assert channel.acked == [7]
+
+    @pytest.mark.unit
+    async def test_failing_handler_is_requeued_once(self, client):
+        """A failing handler is nacked: requeued on first delivery, dropped on redelivery"""
+        channel = FakeChannel()
+
+        async def handler(message):
+            raise RuntimeError('boom')
+
+        client._on_async_message(handler, False, channel, delivery(3), None, b'{}')
+        client._on_async_message(handler, False, channel, delivery(4, redelivered=True), None, b'{}')
+        await asyncio.gather(*client._tasks)
+
+        assert channel.acked == []
+        assert sorted(channel.nacked) == [(3, True), (4, False)]
+        assert client.in_flight == 0
+
+    @pytest.mark.unit
+    async def test_invalid_json_is_dropped(self, client):
+        """Undecodable payloads are acked without dispatching"""
+        channel = FakeChannel()
+        handler = MagicMock()
+
+        client._on_async_message(handler, False, channel, delivery(9), None, b'not-json')
+
+        handler.assert_not_called()
+        assert channel.acked == [9]
+
+
+class FakeConnection:
+    """Runs thread-safe callbacks inline, like the connection thread would"""
+
+    def add_callback_threadsafe(self, callback):
+        callback()
+
+
+class TestThreadWorkerPool:
+    """Test suite for the bounded worker pool with ack-after-processing"""
+
+    @pytest.fixture
+    def client(self):
+        return RabbitMQClient('amqp://localhost:5672')
+
+    @pytest.mark.unit
+    def test_prefetch_matches_worker_pool(self, monkeypatch):
+        """Prefetch defaults to the worker pool size"""
+        monkeypatch.setenv('RABBITMQ_WORKERS', '3')
+        client = RabbitMQClient('amqp://localhost:5672')
+
+        assert client.workers == 3
+        assert client.prefetch_count == 3
+
+    @pytest.mark.unit
+    def test_ack_after_callback(self, client):
+        """The message is acked on the connection thread after the callback returns"""
+        channel = FakeChannel()
+        seen = []
+
+        client._process_and_settle(FakeConnection(), channel, 5, False, seen.append, {'ticket': {'id': 't1'}})
+
+        assert seen == [{'ticket': {'id': 't1'}}]
+        assert channel.acked == [5]
+
+    @pytest.mark.unit
+    def test_coroutine_callbacks_reuse_worker_loop(self, client):
+        """Coroutine callbacks run on one persistent loop per worker thread"""
+        channel = FakeChannel()
+        loops = []
+
+        async def handler(message):
+            loops.append(asyncio.get_running_loop())
+
+        client._process_and_settle(FakeConnection(), channel, 1, False, handler, {})
+        client._process_and_settle(FakeConnection(), channel, 2, False, handler, {})
+
+        assert loops[0] is loops[1]
+        assert channel.acked == [1, 2]
+
+    @pytest.mark.unit
+    def test_failure_nacks(self, client):
+        """Failures are requeued once and dropped when already redelivered"""
+        channel = FakeChannel()
+
+        def handler(message):
+            raise RuntimeError('boom')
+
+        client._process_and_settle(FakeConnection(), channel, 1, False, handler, {})
+        client._process_and_settle(FakeConnection(), channel, 2, True, handler, {})
+
+        assert channel.nacked == [(1, True), (2, False)]
+
+    @pytest.mark.unit
+    def test_closed_channel_is_not_settled(self, client):
+        """If the channel closed meanwhile, the broker redelivers instead"""
+        channel = FakeChannel()
+        channel.is_open = False
+
+        client._process_and_settle(FakeConnection(), channel, 1, False, lambda m: None, {})
+
+        assert channel.acked == []
+
+    @pytest.mark.unit
+    def test_temporary_channel_closes_its_connection(self, client):
+        """Declarations use a short-lived connection that is closed even if they fail"""
+        with patch('services.rabbitmq_client.pika.BlockingConnection') as connection_cls:
+            connection = connection_cls.return_value
+            connection.is_open = True
+            with pytest.raises(RuntimeError):
+                with client.temporary_channel() as channel:
+                    assert channel is connection.channel.return_value
+                    raise RuntimeError('queue_declare')
+
+        connection.close.assert_called_once()
+        assert client.connection is None
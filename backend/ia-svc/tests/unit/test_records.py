@@ -0,0 +1,75 @@
+"""
+Unit Tests for compact records
+Tests one-pass conversion from upstream JSON, interning and the agent dict representation
+"""
+import math
+import pytest
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.records import AgentRecord, TicketRecord
+
+
+@pytest.mark.unit
+class TestTicketRecord:
+    """Tests de la conversión de tickets"""
+
+    def test_batch_keeps_only_scoring_fields(self):
+        """Test que del JSON solo quedan los campos de las métricas, con fechas como epoch"""
+        raws = [
+            {"_id": "t1", "agenteAsignado": {"_id": "agent1", "nombre": "Juan", "email": "j@x.com"},
+             "estado": "abierto", "prioridad": "alta", "titulo": "VPN", "descripcion": "x" * 500,
+             "createdAt": "1970-01-01T00:01:00Z", "fechaAsignacion": None, "updatedAt": "1970-01-02T00:00:00.250Z"},
+            {"id": "t2", "agenteAsignado": None, "estado": "cerrado", "createdAt": "no es fecha"},
+        ]
+
+        first, second = TicketRecord.from_json_batch(raws)
+
+        assert (first.id, first.agent_id, first.estado, first.prioridad) == ("t1", "agent1", "abierto", "alta")
+        assert first.created_at == 60
+        assert first.assigned_at == 60  # Sin fecha de asignación la edad se mide desde la creación
+        assert first.updated_at == 86400
+        assert second.id == "t2" and second.agent_id is None
+        assert math.isnan(second.created_at)
+        assert not hasattr(first, "__dict__")
+
+    def test_repeated_strings_are_interned(self):
+        """Test que estados y agentes repetidos comparten una sola cadena"""
+        raws = [{"_id": f"t{i}", "agenteAsignado": "".join(["agent", "1"]), "estado": "".join(["en_", "proceso"])}
+                for i in range(3)]
+
+        records = TicketRecord.from_json_batch(raws)
+
+        assert records[0].estado is records[2].estado
+        assert records[0].agent_id is records[2].agent_id
+
+    def test_copy_is_independent(self):
+        record = TicketRecord("t1", "agent1", "abierto", "media")
+        clone = record.copy()
+        clone.estado = "cerrado"
+
+        assert record.estado == "abierto"
+
+
+@pytest.mark.unit
+class TestAgentRecord:
+    """Tests de los registros de agentes"""
+
+    def test_from_json_and_to_dict(self):
+        """Test que se guardan ID, nombre y grupos, y el dict incluye las métricas pedidas"""
+        agent = AgentRecord.from_json({"_id": "agent1", "nombre": "Juan", "email": "j@x.com", "rol": "soporte",
+                                       "gruposDeAtencion": ["Mesa de Servicio", "Redes"]})
+
+        assert agent.grupos == ("Mesa de Servicio", "Redes")
+        assert agent.to_dict() == {"_id": "agent1", "id": "agent1", "nombre": "Juan",
+                                   "gruposDeAtencion": ["Mesa de Servicio", "Redes"]}
+        assert agent.to_dict(metrics={"active_count": 2})["metrics"] == {"active_count": 2}
+
+    def test_coerce_accepts_records_and_dicts(self):
+        agent = AgentRecord("agent1", "Juan")
+
+        assert AgentRecord.coerce(agent) is agent
+        assert AgentRecord.coerce({"id": "agent2"}).id == "agent2"
@@ -0,0 +1,254 @@
+"""
+Unit Tests for upstream resilience
+Tests circuit breaker transitions, jittered retries, the per-ticket deadline budget and the fast-fail fallback
+"""
+import asyncio
+import random
+import time
+import httpx
+import pytest
+import sys
+import os
+from unittest.mock import AsyncMock, MagicMock
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.idempotency import IdempotencyCache
+from services.resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceeded, RetryPolicy,
+    CLOSED, OPEN, HALF_OPEN, deadline, remaining_budget
+)
+from services.upstream_client import UpstreamClient
+
+
+def _upstream(handler, attempts=3, failures=3, reset=30.0):
+    client = UpstreamClient('token', transport=httpx.MockTransport(handler),
+                            retry=RetryPolicy(max_attempts=attempts, base_delay=0.001, max_delay=0.002),
+                            breaker_failures=failures, breaker_reset_seconds=reset)
+    client.register('tickets', 'http://tickets-svc:3002')
+    return client
+
+
+@pytest.mark.unit
+class TestCircuitBreaker:
+    """Test suite for CircuitBreaker"""
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker('tickets', failure_threshold=2, reset_timeout=30)
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+
+        assert breaker.state == OPEN
+        assert breaker.allow() is False
+        assert breaker.stats()['rejected'] == 1
+
+    def test_half_open_allows_a_single_probe(self):
+        """After the reset timeout one probe goes through; its result closes or reopens the circuit"""
+        breaker = CircuitBreaker('tickets', failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+
+        assert breaker.allow() is True
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow() is False  # Prueba en curso
+        breaker.record_failure()
+        assert breaker.state == OPEN
+
+        assert breaker.allow() is True
+        breaker.record_success()
+        assert breaker.state == CLOSED
+        assert breaker.stats()['times_opened'] == 2
+
+    def test_abandoned_probe_frees_the_slot(self):
+        breaker = CircuitBreaker('tickets', failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        assert breaker.allow() is True
+        breaker.abandon()
+
+        assert breaker.allow() is True
+
+    def test_backoff_is_jittered_and_capped(self):
+        policy = RetryPolicy(max_attempts=5, base_delay=0.1, max_delay=0.3, rng=random.Random(1))
+        delays = [policy.backoff(attempt) for attempt in (1, 2, 3, 4) for _ in range(50)]
+
+        assert all(0 <= d <= 0.3 for d in delays)
+        assert len(set(delays)) > 100
+        assert max(policy.backoff(1) for _ in range(50)) <= 0.1
+
+    def test_nested_deadline_never_extends(self):
+        assert remaining_budget() is None
+        with deadline(5):
+            with deadline(60):
+                assert remaining_budget() <= 5
+            with deadline(1):
+                assert remaining_budget() <= 1
+        assert remaining_budget() is None
+
+
+@pytest.mark.unit
+class TestResilientUpstream:
+    """Tests de reintentos, circuito y presupuesto en UpstreamClient"""
+
+    async def test_retries_transient_errors(self):
+        """A 503 followed by a connection error is retried until a good response"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                return httpx.Response(503, json={})
+            if len(calls) == 2:
+                raise httpx.ConnectError('refused', request=request)
+            return httpx.Response(200, json={'data': []})
+
+        upstream = _upstream(handler)
+        response = await upstream.get('tickets', '/tickets', route='tickets.list')
+        await upstream.close()
+
+        assert response.status_code == 200
+        assert len(calls) == 3
+        assert upstream.breakers['tickets'].state == CLOSED
+
+    async def test_client_errors_are_not_retried(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(404, json={})
+
+        upstream = _upstream(handler)
+        response = await upstream.get('tickets', '/tickets/x')
+        await upstream.close()
+
+        assert response.status_code == 404
+        assert len(calls) == 1
+
+    async def test_writes_are_not_retried_once_sent(self):
+        """A PUT that reached tickets-svc (5xx or read timeout) may have side effects: no retry"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                return httpx.Response(503, json={})
+            raise httpx.ReadTimeout('timeout', request=request)
+
+        upstream = _upstream(handler, failures=100)
+        response = await upstream.put('tickets', '/tickets/t1/asignar-ia', json={'agenteId': 'a1'})
+        with pytest.raises(httpx.ReadTimeout):
+            await upstream.put('tickets', '/tickets/t1/asignar-ia', json={'agenteId': 'a1'})
+        await upstream.close()
+
+        assert response.status_code == 503
+        assert len(calls) == 2
+
+    async def test_writes_retry_connect_errors(self):
+        """If the connection was never established the write did not happen and is retried"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                raise httpx.ConnectError('refused', request=request)
+            return httpx.Response(200, json={})
+
+        upstream = _upstream(handler)
+        response = await upstream.put('tickets', '/tickets/t1/asignar-ia', json={'agenteId': 'a1'})
+        await upstream.close()
+
+        assert response.status_code == 200
+        assert len(calls) == 2
+
+    async def test_open_circuit_fails_fast(self):
+        """Once open, calls fail immediately without touching the transport"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            raise httpx.ConnectError('refused', request=request)
+
+        upstream = _upstream(handler, attempts=2, failures=3)
+        with pytest.raises(httpx.ConnectError):
+            await upstream.get('tickets', '/tickets')
+        with pytest.raises(httpx.ConnectError):
+            await upstream.get('tickets', '/tickets')  # Tercer fallo: se abre y no se reintenta
+
+        started = time.perf_counter()
+        with pytest.raises(CircuitOpenError):
+            await upstream.put('tickets', '/tickets/t1/asignar-ia', json={'agenteId': 'a1'})
+        await upstream.close()
+
+        assert len(calls) == 3
+        assert time.perf_counter() - started < 0.05
+        assert upstream.stats()['tickets']['state'] == OPEN
+
+    async def test_deadline_caps_timeout_and_retries(self):
+        """The per-ticket budget shortens the route timeout and stops further attempts"""
+        calls = []
+
+        async def handler(request):
+            calls.append(request.extensions['timeout']['read'])
+            await asyncio.sleep(0.05)
+            return httpx.Response(503, json={})
+
+        upstream = _upstream(handler, attempts=10, failures=100)
+        with deadline(0.12):
+            response = await upstream.get('tickets', '/tickets', route='tickets.list')
+            await asyncio.sleep(max(remaining_budget(), 0) + 0.01)
+            with pytest.raises(DeadlineExceeded):
+                await upstream.get('tickets', '/tickets', route='tickets.list')
+        await upstream.close()
+
+        assert response.status_code == 503
+        assert 1 <= len(calls) <= 3
+        assert all(timeout <= 0.12 for timeout in calls)
+
+
+@pytest.mark.unit
+class TestFastFailFallback:
+    """Tests del fallback a 'ticket.sugerencia_asignacion' con el upstream caído"""
+
+    async def test_unavailable_upstream_publishes_suggestion(self, monkeypatch):
+        """With usuarios-svc's circuit open the ticket goes straight to the suggestion event"""
+        import main
+        monkeypatch.setattr(main, 'idempotency', IdempotencyCache())
+        monkeypatch.setattr(main, 'update_ticket_classification', AsyncMock())
+        monkeypatch.setattr(main, 'assign_ticket_to_agent', AsyncMock())
+        monkeypatch.setattr(main, 'publish_event', MagicMock())
+        monkeypatch.setattr(main.agent_assigner, 'assign_ticket',
+                            AsyncMock(side_effect=CircuitOpenError('usuarios', 12.0)))
+
+        await main.process_new_ticket({'ticket': {'id': 'cb-1', 'empresaId': 'e1'}})
+
+        routing_key, payload = main.publish_event.call_args.args
+        assert routing_key == 'ticket.sugerencia_asignacion'
+        assert payload['ticketId'] == 'cb-1' and payload['agenteIdSugerido'] is None
+        main.assign_ticket_to_agent.assert_not_awaited()
+
+    async def test_open_tickets_circuit_skips_load_blind_scoring(self, monkeypatch):
+        """With tickets-svc's circuit open agents are not scored on an empty snapshot"""
+        import main
+        from services.agent_assigner import AgentAssigner
+        from services.workload_ledger import WorkloadLedger
+
+        upstream = _upstream(lambda request: httpx.Response(200, json=[]), failures=1)
+        upstream.breakers['tickets'].record_failure()
+        assigner = AgentAssigner('http://usuarios-svc:3001', 'http://tickets-svc:3002',
+                                 upstream=upstream, ledger=WorkloadLedger())
+        assigner.get_available_agents = AsyncMock(return_value=[{'_id': 'agent1', 'nombre': 'Juan'}])
+        monkeypatch.setattr(main, 'agent_assigner', assigner)
+        monkeypatch.setattr(main, 'idempotency', IdempotencyCache())
+        monkeypatch.setattr(main, 'update_ticket_classification', AsyncMock())
+        monkeypatch.setattr(main, 'assign_ticket_to_agent', AsyncMock())
+        monkeypatch.setattr(main, 'publish_event', MagicMock())
+
+        await main.process_new_ticket({'ticket': {'id': 'cb-2', 'empresaId': 'e1'}})
+
+        routing_key, payload = main.publish_event.call_args.args
+        assert routing_key == 'ticket.sugerencia_asignacion'
+        assert payload['agenteIdSugerido'] is None
+        main.assign_ticket_to_agent.assert_not_awaited()
+        assert not assigner.ledger.has_company('e1')
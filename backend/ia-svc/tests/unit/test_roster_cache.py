@@ -0,0 +1,121 @@
+"""
+Unit Tests for Roster Cache
+Tests TTL expiry, LRU eviction and invalidation of the per-company roster
+"""
+import pytest
+from unittest.mock import AsyncMock, patch
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.roster_cache import RosterCache
+from services.agent_assigner import AgentAssigner
+from services.records import AgentRecord
+from services.ticket_snapshot import TicketSnapshot
+
+
+class TestRosterCache:
+    """Test suite for RosterCache class"""
+
+    @pytest.mark.unit
+    def test_hit_and_miss_counters(self):
+        """Hits and misses are counted"""
+        cache = RosterCache(ttl_seconds=60, max_entries=10)
+
+        assert cache.get("empresa1") is None
+        cache.set("empresa1", {"Mesa de Servicio": []})
+        assert cache.get("empresa1") == {"Mesa de Servicio": []}
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["size"] == 1
+
+    @pytest.mark.unit
+    def test_entries_expire_after_ttl(self):
+        """Expired entries are treated as misses"""
+        cache = RosterCache(ttl_seconds=60, max_entries=10)
+        with patch("services.roster_cache.time.monotonic", return_value=1000.0):
+            cache.set("empresa1", {})
+        with patch("services.roster_cache.time.monotonic", return_value=1061.0):
+            assert cache.get("empresa1") is None
+        assert cache.stats()["size"] == 0
+
+    @pytest.mark.unit
+    def test_evicts_least_recently_used(self):
+        """Size bound evicts the least recently used company"""
+        cache = RosterCache(ttl_seconds=60, max_entries=2)
+        cache.set("empresa1", {})
+        cache.set("empresa2", {})
+        cache.get("empresa1")
+        cache.set("empresa3", {})
+
+        assert cache.get("empresa2") is None
+        assert cache.get("empresa1") == {}
+        assert cache.stats()["evictions"] == 1
+
+    @pytest.mark.unit
+    def test_invalidate_one_or_all(self):
+        """Invalidation drops one company or the whole cache"""
+        cache = RosterCache(ttl_seconds=60, max_entries=10)
+        cache.set("empresa1", {})
+        cache.set("empresa2", {})
+
+        cache.invalidate("empresa1")
+        assert cache.get("empresa1") is None
+        assert cache.get("empresa2") == {}
+
+        cache.invalidate()
+        assert cache.get("empresa2") is None
+
+    @pytest.mark.unit
+    def test_zero_ttl_disables_cache(self):
+        """TTL 0 disables caching"""
+        cache = RosterCache(ttl_seconds=0)
+        cache.set("empresa1", {})
+        assert cache.get("empresa1") is None
+
+
+class TestAgentAssignerRosterCache:
+    """Test suite for roster caching inside AgentAssigner"""
+
+    @pytest.fixture
+    def agent_assigner(self):
+        assigner = AgentAssigner("http://localhost:3001", "http://localhost:3002",
+                                 roster_cache=RosterCache(ttl_seconds=60))
+        assigner._fetch_roster = AsyncMock(return_value={
+            "Mesa de Servicio": [AgentRecord("agent1", "Juan", ["Mesa de Servicio"])]
+        })
+        return assigner
+
+    @pytest.mark.unit
+    async def test_steady_state_skips_usuarios_svc(self, agent_assigner):
+        """Second lookup for the same company is served from cache"""
+        await agent_assigner.get_available_agents("Mesa de Servicio", "empresa1")
+        agents = await agent_assigner.get_available_agents("Mesa de Servicio", "empresa1")
+
+        agent_assigner._fetch_roster.assert_awaited_once_with("empresa1")
+        assert [a.id for a in agents] == ["agent1"]
+
+    @pytest.mark.unit
+    async def test_assignment_does_not_mutate_cache(self, agent_assigner):
+        """Assignment returns a new dict, so metrics never leak into the cached agent records"""
+        agent_assigner.get_company_snapshot = AsyncMock(return_value=TicketSnapshot("empresa1", []))
+
+        best = await agent_assigner.assign_ticket({"empresaId": "empresa1", "grupo_atencion": "Mesa de Servicio"})
+
+        cached = await agent_assigner.get_available_agents("Mesa de Servicio", "empresa1")
+        assert best["_id"] == "agent1"
+        assert best["metrics"]["active_count"] == 0
+        assert not hasattr(cached[0], "metrics")
+
+    @pytest.mark.unit
+    async def test_invalidation_forces_refetch(self, agent_assigner):
+        """A user-change event invalidates the company roster"""
+        await agent_assigner.get_available_agents("Mesa de Servicio", "empresa1")
+        agent_assigner.invalidate_roster("empresa1")
+        await agent_assigner.get_available_agents("Mesa de Servicio", "empresa1")
+
+        assert agent_assigner._fetch_roster.await_count == 2
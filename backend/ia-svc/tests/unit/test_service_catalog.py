@@ -0,0 +1,241 @@
+"""
+Unit Tests for the Service Catalog Index
+Tests normalization, precomputed classifications and immutability
+"""
+import copy
+import json
+import pytest
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.service_catalog import (
+    ServiceCatalogIndex, FrozenClassification, normalize_service_name, parse_sla_to_minutes
+)
+from services.ticket_classifier import (
+    TicketClassifier, DEFAULT_CLASSIFICATION, SERVICE_CATALOG_BY_NAME, load_service_catalog
+)
+
+
+CATALOG = [
+    {"nombre": "Robo de equipo cómputo", "tipo": "Incidente", "categoria": "Computo Personal",
+     "prioridad": "Media", "sla": "32 horas", "gruposDeAtencion": "Mesa de Servicio"},
+    {"nombre": "Reseteo de Autenticador", "tipo": "Requerimiento", "categoria": "Seguridad",
+     "prioridad": "critica", "sla": "2hrs", "gruposDeAtencion": "Seguridad"},
+    {"nombre": "Sin datos", "tipo": "Incidente"},
+    {"nombre": "ROBO DE EQUIPO COMPUTO", "tipo": "Requerimiento"},
+]
+
+
+@pytest.fixture
+def catalog_file(tmp_path):
+    path = tmp_path / "catalogo.json"
+    path.write_text(json.dumps(CATALOG, ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.unit
+class TestServiceCatalogIndex:
+    """Test suite for ServiceCatalogIndex"""
+
+    def test_normalize_service_name(self):
+        assert normalize_service_name("  Robo de  equipo CÓMPUTO ") == "robo de equipo computo"
+        assert normalize_service_name(None) == ""
+
+    def test_parse_sla_to_minutes(self):
+        assert parse_sla_to_minutes("4 horas") == 240
+        assert parse_sla_to_minutes("2hrs") == 120
+        assert parse_sla_to_minutes("30 min") == 30
+        assert parse_sla_to_minutes("NA") is None
+
+    def test_lookup_is_accent_and_case_insensitive(self, catalog_file):
+        index = ServiceCatalogIndex.from_file(catalog_file, DEFAULT_CLASSIFICATION)
+
+        result = index.lookup("robo de equipo computo")
+
+        assert result == {
+            "tipo": "incidente",
+            "prioridad": "media",
+            "categoria": "Computo Personal",
+            "grupo_atencion": "Mesa de Servicio",
+            "tiempoResolucion": 1920,
+            "tiempoRespuesta": 1920,
+            "servicioCatalogo": "Robo de equipo cómputo",
+            "confianza": 1.0,
+        }
+        assert index.lookup("Robo de equipo cómputo") is result
+        assert index.lookup("No existe") is None
+
+    def test_first_duplicate_wins(self, catalog_file):
+        index = ServiceCatalogIndex.from_file(catalog_file, DEFAULT_CLASSIFICATION)
+
+        assert len(index) == 3
+        assert index.duplicates == ["ROBO DE EQUIPO COMPUTO"]
+        assert index.lookup("Robo de equipo cómputo")["tipo"] == "incidente"
+
+    def test_missing_fields_use_default(self, catalog_file):
+        index = ServiceCatalogIndex.from_file(catalog_file, DEFAULT_CLASSIFICATION)
+
+        result = index.lookup("Sin datos")
+
+        assert result["grupo_atencion"] == "Mesa de Servicio"
+        assert result["tiempoResolucion"] == 1440
+        assert result["prioridad"] == "media"
+
+    def test_classifications_are_frozen(self, catalog_file):
+        index = ServiceCatalogIndex.from_file(catalog_file, DEFAULT_CLASSIFICATION)
+        result = index.lookup("Reseteo de Autenticador")
+
+        assert isinstance(result, FrozenClassification)
+        with pytest.raises(TypeError):
+            result["prioridad"] = "baja"
+        with pytest.raises(TypeError):
+            result.update(prioridad="baja")
+        assert copy.copy(result) is result
+        assert dict(result)["prioridad"] == "critica"
+        assert json.loads(json.dumps(result))["tiempoResolucion"] == 120
+
+    def test_falls_back_to_builtin_map(self, tmp_path):
+        index = load_service_catalog(str(tmp_path / "missing.json"))
+
+        assert index.source == "mapa interno"
+        assert len(index) == len(SERVICE_CATALOG_BY_NAME)
+
+    def test_classifier_uses_catalog_file(self, catalog_file):
+        classifier = TicketClassifier(catalog_path=catalog_file)
+
+        first = classifier.classify_ticket({"servicioNombre": "reseteo de autenticador"})
+        second = classifier.classify_ticket({"servicioNombre": "Reseteo de Autenticador"})
+
+        assert first is second
+        assert first["grupo_atencion"] == "Seguridad"
+
+    def test_bundled_catalog_is_complete(self):
+        classifier = TicketClassifier()
+
+        assert len(classifier.catalog) > 100
+
+
+@pytest.mark.unit
+class TestFuzzyMatching:
+    """Test suite for trigram-based fuzzy matching"""
+
+    @pytest.fixture
+    def index(self, catalog_file):
+        return ServiceCatalogIndex.from_file(catalog_file, DEFAULT_CLASSIFICATION)
+
+    def test_typo_matches_closest_service(self, index):
+        name, score = index.fuzzy_match("Resteo de Autenticador")
+
+        assert name == "Reseteo de Autenticador"
+        assert 0.5 <= score < 1.0
+
+    def test_below_threshold_returns_none(self, index):
+        assert index.fuzzy_match("Impresora atascada") is None
+        assert index.fuzzy_match("") is None
+
+    def test_lookup_fuzzy_reports_confidence(self, index):
+        result = index.lookup_fuzzy("reseteo autenticador")
+
+        assert result["grupo_atencion"] == "Seguridad"
+        assert result["servicioCatalogo"] == "Reseteo de Autenticador"
+        assert 0 < result["confianza"] < 1
+        assert index.lookup_fuzzy("reseteo autenticador") is result
+
+    def test_classifier_uses_fuzzy_before_default(self, catalog_file):
+        classifier = TicketClassifier(catalog_path=catalog_file)
+
+        fuzzy = classifier.classify_ticket({"servicioNombre": "Robo de equipo de computo"})
+        default = classifier.classify_ticket({"servicioNombre": "Algo totalmente distinto"})
+
+        assert fuzzy["servicioCatalogo"] == "Robo de equipo cómputo"
+        assert default["confianza"] == 0.0
+        assert default["grupo_atencion"] == "Mesa de Servicio"
+
+    def test_fuzzy_can_be_disabled(self, catalog_file):
+        classifier = TicketClassifier(catalog_path=catalog_file, fuzzy_threshold=0)
+
+        result = classifier.classify_ticket({"servicioNombre": "Resteo de Autenticador"})
+
+        assert result["confianza"] == 0.0
+
+    def test_candidates_only_from_shared_trigrams(self, index):
+        # Una consulta sin trigramas en común no toca ningún servicio
+        assert index.fuzzy_match("zzzz", threshold=0.01) is None
+
+
+@pytest.mark.unit
+class TestCatalogHotReload:
+    """Test suite for background catalog reloads"""
+
+    @pytest.fixture
+    def classifier(self, catalog_file):
+        return TicketClassifier(catalog_path=catalog_file)
+
+    def write_catalog(self, path, entries):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False)
+        # Garantizar un mtime distinto aunque el sistema de archivos tenga poca resolución
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    def test_unchanged_file_is_not_reloaded(self, classifier):
+        assert classifier.reload_catalog() is False
+        assert classifier.reloads == 0
+
+    def test_changed_file_is_swapped_in(self, classifier, catalog_file):
+        previous = classifier.catalog
+        self.write_catalog(catalog_file, CATALOG + [
+            {"nombre": "Servicio Nuevo", "tipo": "Incidente", "prioridad": "Alta",
+             "sla": "4 horas", "gruposDeAtencion": "Redes"}
+        ])
+
+        assert classifier.reload_catalog() is True
+
+        assert classifier.classify_ticket({"servicioNombre": "servicio nuevo"})["grupo_atencion"] == "Redes"
+        # El índice anterior queda intacto para quien todavía lo esté usando
+        assert previous.lookup("Servicio Nuevo") is None
+        assert classifier.catalog_stats()["reloads"] == 1
+
+    def test_invalid_catalog_keeps_previous_index(self, classifier, catalog_file):
+        previous = classifier.catalog
+        with open(catalog_file, "w", encoding="utf-8") as f:
+            f.write("{no es json")
+
+        assert classifier.reload_catalog(force=True) is False
+
+        assert classifier.catalog is previous
+        assert classifier.reload_errors == 1
+
+    def test_empty_catalog_rejected(self, classifier):
+        previous = classifier.catalog
+
+        assert classifier.reload_catalog(entries=[]) is False
+        assert classifier.catalog is previous
+
+    def test_reload_from_event_entries(self, classifier):
+        assert classifier.reload_catalog(entries=[
+            {"nombre": "Desde Evento", "tipo": "Requerimiento", "prioridad": "Baja",
+             "sla": "8 horas", "gruposDeAtencion": "ERP"}
+        ]) is True
+
+        assert classifier.catalog.source == "evento"
+        assert classifier.classify_ticket({"servicioNombre": "Desde evento"})["grupo_atencion"] == "ERP"
+
+    def test_watcher_picks_up_changes(self, classifier, catalog_file):
+        import time
+        classifier.start_watching(interval=0.01)
+        try:
+            self.write_catalog(catalog_file, [
+                {"nombre": "Vigilado", "tipo": "Incidente", "prioridad": "Media",
+                 "sla": "4 horas", "gruposDeAtencion": "Redes"}
+            ])
+            deadline = time.monotonic() + 2
+            while classifier.reloads == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            classifier.stop_watching()
+
+        assert "Vigilado" in classifier.catalog
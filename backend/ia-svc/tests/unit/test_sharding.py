@@ -0,0 +1,156 @@
+"""
+Unit Tests for company-affinity sharding
+Tests the consistent-hash ring, the shard router and the per-shard ledger reconciliation
+"""
+import asyncio
+import pytest
+import sys
+import os
+from concurrent.futures import Future
+from unittest.mock import AsyncMock, MagicMock
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.sharding import (
+    ShardRing, ShardRouter, company_of, declare_shard_queues, shard_path, shard_queue, shard_routing_key
+)
+from services.workload_ledger import WorkloadLedger
+
+
+def _resolved(value='msg-1'):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+@pytest.mark.unit
+class TestShardRing:
+    """Tests del anillo de hash consistente"""
+
+    def test_same_company_same_shard(self):
+        ring = ShardRing(4)
+        assert ring.shard_for('empresa-1') == ShardRing(4).shard_for('empresa-1')
+        assert 0 <= ring.shard_for('') < 4
+
+    def test_companies_spread_across_shards(self):
+        ring = ShardRing(4)
+        counts = [0] * 4
+        for i in range(4000):
+            counts[ring.shard_for(f'empresa-{i}')] += 1
+
+        assert min(counts) > 600  # Ideal: 1000 por shard
+
+    def test_adding_a_shard_moves_few_companies(self):
+        """Going from 4 to 5 shards only remaps about 1/5 of the companies, all to the new shard"""
+        before, after = ShardRing(4), ShardRing(5)
+        companies = [f'empresa-{i}' for i in range(4000)]
+        moved = [c for c in companies if before.shard_for(c) != after.shard_for(c)]
+
+        assert len(moved) < len(companies) * 0.3
+        assert all(after.shard_for(c) == 4 for c in moved)
+
+    def test_requires_a_shard(self):
+        with pytest.raises(ValueError):
+            ShardRing(0)
+
+    def test_company_of(self):
+        assert company_of({'ticket': {'id': 't1', 'empresaId': 'e1'}}) == 'e1'
+        assert company_of({'ticket': {'empresaId': {'_id': 'e2'}}}) == 'e2'
+        assert company_of({'empresaId': 'e3'}) == 'e3'
+        assert company_of({'ticket': {'id': 't1'}}) == ''
+
+
+@pytest.mark.unit
+class TestShardRouter:
+    """Tests del enrutador hacia las colas de los shards"""
+
+    async def test_route_publishes_to_owner_shard(self):
+        publisher = MagicMock()
+        publisher.publish.return_value = _resolved()
+        router = ShardRouter('amqp://localhost', 3, publisher, consumer=MagicMock())
+        message = {'ticket': {'id': 't1', 'empresaId': 'e1'}}
+
+        shard = await router.route(message)
+
+        publisher.publish.assert_called_once_with(shard_routing_key(shard), message)
+        assert shard == router.ring.shard_for('e1')
+        assert router.routed[shard] == 1
+
+    async def test_unconfirmed_copy_fails_the_delivery(self):
+        """If the broker rejects the copy the original message must not be acked"""
+        failed = Future()
+        failed.set_exception(RuntimeError('nack'))
+        publisher = MagicMock()
+        publisher.publish.return_value = failed
+        router = ShardRouter('amqp://localhost', 2, publisher, consumer=MagicMock())
+
+        with pytest.raises(RuntimeError):
+            await router.route({'ticket': {'id': 't1', 'empresaId': 'e1'}})
+        assert sum(router.routed) == 0
+
+    async def test_copies_are_published_in_arrival_order(self):
+        """Confirmations are awaited concurrently, but every copy is published before the first one is confirmed"""
+        pending = [Future() for _ in range(3)]
+        publisher = MagicMock()
+        publisher.publish.side_effect = pending
+        router = ShardRouter('amqp://localhost', 2, publisher, consumer=MagicMock())
+        messages = [{'ticket': {'id': f't{i}', 'empresaId': f'e{i}'}} for i in range(3)]
+
+        tasks = [asyncio.create_task(router.route(message)) for message in messages]
+        await asyncio.sleep(0)
+        assert [c.args[1] for c in publisher.publish.call_args_list] == messages
+
+        for future in reversed(pending):
+            future.set_result('ok')
+        await asyncio.gather(*tasks)
+        assert sum(router.routed) == 3
+
+    def test_consumer_prefetch_matches_confirm_window(self):
+        router = ShardRouter('amqp://localhost', 2, MagicMock(), confirm_window=50)
+
+        assert router.consumer.consumer_mode == 'asyncio'
+        assert router.consumer.max_in_flight == 50
+
+    def test_declares_durable_shard_queues(self):
+        client = MagicMock()
+        channel = client.temporary_channel.return_value.__enter__.return_value
+        declare_shard_queues(client, 2)
+
+        client.connect.assert_not_called()
+        client.temporary_channel.return_value.__exit__.assert_called_once()
+        assert [c.kwargs['queue'] for c in channel.queue_declare.call_args_list] == [shard_queue(0), shard_queue(1)]
+        assert all(c.kwargs['durable'] for c in channel.queue_declare.call_args_list)
+        assert channel.queue_bind.call_args_list[1].kwargs['routing_key'] == 'ia.shard.1'
+
+    def test_each_shard_has_its_own_outbox(self):
+        """Shard processes must never drain the same SQLite outbox; paths are stable across restarts"""
+        paths = {shard_path('data/event_outbox.db', shard) for shard in range(4)}
+
+        assert len(paths) == 4 and 'data/event_outbox.db' not in paths
+        assert shard_path('data/event_outbox.db', 1) == 'data/event_outbox.shard-1.db'
+
+    def test_shard_keys_do_not_match_ticket_bindings(self):
+        """Other services bind 'ticket.#', so the shard copies must not start with 'ticket.'"""
+        assert not shard_routing_key(0).startswith('ticket.')
+
+
+@pytest.mark.unit
+class TestShardReconcile:
+    """Tests de la reconciliación del libro mayor limitada a las empresas del shard"""
+
+    async def test_reconciles_only_loaded_companies(self, monkeypatch):
+        import main
+        ledger = WorkloadLedger()
+        ledger.load_company('e1', [])
+        monkeypatch.setattr(main.agent_assigner, 'ledger', ledger)
+        fetch = AsyncMock(return_value=[{'_id': 't1', 'empresaId': 'e1', 'estado': 'abierto',
+                                         'agenteAsignado': 'a1', 'prioridad': 'alta'}])
+        monkeypatch.setattr(main.agent_assigner, 'fetch_company_tickets', fetch)
+
+        loaded = await main.agent_assigner.sync_workload_ledger(companies=ledger.company_ids())
+
+        assert loaded == 1
+        fetch.assert_awaited_once_with('e1')
+        assert ledger.company('e1').active_load('a1')[0] == 1
+        assert ledger.stats()['last_reconcile'] is not None
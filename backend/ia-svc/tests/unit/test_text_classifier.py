@@ -0,0 +1,109 @@
+"""
+Unit Tests for the Text Classifier
+Tests hashed features, training, the memory-mapped artifact and classifier fallback
+"""
+import json
+import pytest
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+np = pytest.importorskip("numpy")
+
+from services.text_classifier import (
+    HashingVectorizer, TextClassifier, build_training_set, load_text_classifier, tokenize
+)
+from services.ticket_classifier import TicketClassifier
+
+
+CATALOG = [
+    {"nombre": "Sin salida a Internet", "categoria": "Redes", "tipo": "Incidente",
+     "prioridad": "Media", "sla": "12 horas", "gruposDeAtencion": "Telecomunicaciones"},
+    {"nombre": "Desbloqueo de cuenta", "categoria": "Directorio Activo", "tipo": "Requerimiento",
+     "prioridad": "Alta", "sla": "2 horas", "gruposDeAtencion": "Mesa de Servicio"},
+    {"nombre": "Virus", "categoria": "Seguridad", "tipo": "Incidente",
+     "prioridad": "Alta", "sla": "4 horas", "gruposDeAtencion": "Seguridad"},
+]
+
+HISTORY = [
+    {"titulo": "No hay internet", "descripcion": "la red no conecta en el piso 3", "servicioNombre": "Sin salida a Internet"},
+    {"titulo": "Sin red", "descripcion": "no carga ninguna pagina", "servicioNombre": "sin salida a internet"},
+    {"titulo": "Cuenta bloqueada", "descripcion": "no puedo iniciar sesion, mi usuario esta bloqueado", "servicioNombre": "Desbloqueo de cuenta"},
+    {"titulo": "Usuario bloqueado", "descripcion": "demasiados intentos de contraseña", "servicioNombre": "Desbloqueo de cuenta"},
+    {"titulo": "Antivirus alerta", "descripcion": "aparece un malware en mi equipo", "servicioNombre": "Virus"},
+    {"titulo": "Equipo infectado", "descripcion": "el antivirus detecto un troyano", "servicioNombre": "Virus"},
+]
+
+
+@pytest.fixture
+def model():
+    texts, labels = build_training_set(CATALOG, HISTORY)
+    return TextClassifier.train(texts, labels, n_features=2 ** 12, epochs=60)
+
+
+@pytest.mark.unit
+class TestTextClassifier:
+    """Test suite for the NumPy text classifier"""
+
+    def test_tokenize_normalizes_and_adds_bigrams(self):
+        assert tokenize("Contraseña BLOQUEADA!") == ["contrasena", "bloqueada", "contrasena bloqueada"]
+
+    def test_vectorizer_rows_are_unit_norm(self):
+        rows, cols, vals = HashingVectorizer(2 ** 10).transform(["hola mundo", "", "otra linea de texto"])
+
+        assert set(rows.tolist()) == {0, 2}
+        for row in (0, 2):
+            assert np.isclose(np.sum(vals[rows == row] ** 2), 1.0)
+        assert cols.max() < 2 ** 10
+
+    def test_training_set_uses_catalog_and_history(self):
+        texts, labels = build_training_set(CATALOG, HISTORY + [{"titulo": "x", "servicioNombre": "Desconocido"}])
+
+        assert len(texts) == len(labels) == 3 + 3 + len(HISTORY)
+        assert set(labels) == {c["nombre"] for c in CATALOG}
+
+    def test_batch_prediction(self, model):
+        predictions = model.predict([
+            "no tengo internet en la oficina",
+            "mi usuario esta bloqueado",
+            "el antivirus encontro malware",
+            "",
+        ])
+
+        assert [label for label, _ in predictions[:3]] == ["Sin salida a Internet", "Desbloqueo de cuenta", "Virus"]
+        assert all(0 < prob <= 1 for _, prob in predictions)
+        assert len(predictions) == 4
+
+    def test_artifact_roundtrip_is_memory_mapped(self, model, tmp_path):
+        model.save(str(tmp_path))
+
+        loaded = load_text_classifier(str(tmp_path))
+
+        assert isinstance(loaded.weights, np.memmap)
+        assert loaded.labels == model.labels
+        assert np.allclose(loaded.predict_proba(["usuario bloqueado"]), model.predict_proba(["usuario bloqueado"]))
+
+    def test_missing_or_invalid_artifact(self, tmp_path):
+        assert load_text_classifier(str(tmp_path / "missing")) is None
+
+        (tmp_path / "meta.json").write_text(json.dumps({"version": 99}))
+        assert load_text_classifier(str(tmp_path)) is None
+
+    def test_ticket_classifier_falls_back_to_text(self, model, tmp_path):
+        catalog_file = tmp_path / "catalogo.json"
+        catalog_file.write_text(json.dumps(CATALOG, ensure_ascii=False), encoding="utf-8")
+        classifier = TicketClassifier(catalog_path=str(catalog_file), text_model=model)
+        classifier.text_min_confidence = 0.0
+
+        single = classifier.classify_ticket({"titulo": "Cuenta bloqueada", "descripcion": "no puedo entrar"})
+        batch = classifier.classify_batch([
+            {"servicioNombre": "Virus"},
+            {"titulo": "sin internet", "descripcion": "la red no conecta"},
+            {},
+        ])
+
+        assert single["servicioCatalogo"] == "Desbloqueo de cuenta"
+        assert 0 < single["confianza"] < 1
+        assert [c["servicioCatalogo"] for c in batch] == ["Virus", "Sin salida a Internet", None]
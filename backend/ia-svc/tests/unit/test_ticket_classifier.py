@@ -0,0 +1,60 @@
+"""
+Unit Tests for Ticket Classifier
+Tests single and batch catalog-based classification
+"""
+import pytest
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.ticket_classifier import TicketClassifier
+
+
+@pytest.mark.unit
+class TestTicketClassifier:
+    """Test suite for TicketClassifier"""
+
+    @pytest.fixture
+    def classifier(self):
+        return TicketClassifier()
+
+    def test_known_service(self, classifier):
+        result = classifier.classify_ticket({'servicioNombre': 'Virus'})
+
+        assert result['grupo_atencion'] == 'Seguridad'
+        assert result['prioridad'] == 'alta'
+        assert result['tiempoResolucion'] == 240
+
+    def test_unknown_service_uses_default(self, classifier):
+        result = classifier.classify_ticket({'servicioNombre': 'No existe'})
+
+        assert result['grupo_atencion'] == 'Mesa de Servicio'
+        assert result['tiempoResolucion'] == 1440
+
+    def test_batch_preserves_order(self, classifier):
+        tickets = [
+            {'servicioNombre': 'Virus'},
+            {'servicioNombre': 'Sin salida a Internet'},
+            {},
+            {'servicioNombre': 'Virus'},
+        ]
+
+        results = classifier.classify_batch(tickets)
+
+        assert [r['grupo_atencion'] for r in results] == [
+            'Seguridad', 'Telecomunicaciones', 'Mesa de Servicio', 'Seguridad'
+        ]
+
+    def test_batch_matches_single_classification(self, classifier):
+        tickets = [{'servicioNombre': name} for name in ('Virus', 'Desbloqueo de cuenta', 'Otro')]
+
+        assert classifier.classify_batch(tickets) == [classifier.classify_ticket(t) for t in tickets]
+
+    def test_batch_looks_up_each_service_once(self, classifier, mocker):
+        spy = mocker.spy(classifier, '_classify_service')
+
+        classifier.classify_batch([{'servicioNombre': 'Virus'}] * 500 + [{'servicioNombre': 'Otro'}] * 500)
+
+        assert spy.call_count == 2
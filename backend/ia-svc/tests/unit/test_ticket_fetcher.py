@@ -0,0 +1,143 @@
+"""
+Unit Tests for Ticket Fetcher
+Tests bounded parallel pagination, filters, the closed-ticket window and cursor mode
+"""
+import asyncio
+import pytest
+import httpx
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from benchmarks.synthetic import FakeUpstreams
+from services.ticket_fetcher import TicketFetcher
+from services.upstream_client import UpstreamClient
+
+
+def _tickets(n, estado='abierto', agent='agent1', days_ago=0.0, step_hours=0.0, prefix='t'):
+    now = datetime.utcnow()
+    return [{'_id': f'{prefix}{i}', 'empresaId': 'e1', 'estado': estado, 'prioridad': 'media',
+             'agenteAsignado': agent,
+             'createdAt': (now - timedelta(days=days_ago, hours=i * step_hours)).isoformat() + 'Z'}
+            for i in range(n)]
+
+
+def _fetcher(handler, **kwargs):
+    upstream = UpstreamClient('token', transport=httpx.MockTransport(handler))
+    upstream.register('tickets', 'http://tickets-svc:3002')
+    return TicketFetcher(upstream, **kwargs)
+
+
+@pytest.mark.unit
+class TestTicketFetcher:
+    """Test suite for TicketFetcher"""
+
+    async def test_fetches_every_page_past_1000(self):
+        """Every page is requested, not just the first 1000 tickets"""
+        upstreams = FakeUpstreams({'e1': {'tickets': _tickets(2345)}})
+        fetcher = _fetcher(upstreams.handle, page_size=200, concurrency=4)
+
+        tickets = await fetcher.collect(fetcher.iter_tickets('e1'))
+
+        assert len({t['_id'] for t in tickets}) == len(tickets) == 2345
+        assert upstreams.requests['GET tickets-svc/tickets'] == 12
+
+    async def test_parallel_pages_are_bounded(self):
+        """Pages overlap, but never more than 'concurrency' requests are in flight"""
+        tickets = _tickets(1000)
+        state = {'in_flight': 0, 'peak': 0}
+
+        async def handler(request):
+            state['in_flight'] += 1
+            state['peak'] = max(state['peak'], state['in_flight'])
+            await asyncio.sleep(0.01)
+            state['in_flight'] -= 1
+            pagina, limite = int(request.url.params['pagina']), int(request.url.params['limite'])
+            page = tickets[(pagina - 1) * limite:pagina * limite]
+            return httpx.Response(200, json={'data': page, 'total': len(tickets)})
+
+        fetcher = _fetcher(handler, page_size=50, concurrency=3)
+        result = await fetcher.collect(fetcher.iter_tickets('e1', states=['abierto', 'en_proceso']))
+
+        assert len(result) == 1000
+        assert state['peak'] == 3
+
+    async def test_filters_are_sent_to_tickets_svc(self):
+        """Estado, agente y 'asignado' travel as tickets-svc query params"""
+        seen = []
+
+        def handler(request):
+            seen.append(dict(request.url.params))
+            return httpx.Response(200, json={'data': [], 'total': 0})
+
+        fetcher = _fetcher(handler, page_size=100)
+        await fetcher.collect(fetcher.iter_tickets('e1', states=['abierto'], agente_id='agent7'))
+        await fetcher.collect(fetcher.iter_tickets(None, states=['cerrado'], assigned_only=True))
+
+        assert seen[0] == {'limite': '100', 'pagina': '1', 'empresaId': 'e1', 'estado': 'abierto',
+                           'agenteAsignado': 'agent7'}
+        assert seen[1] == {'limite': '100', 'pagina': '1', 'estado': 'cerrado', 'asignado': 'true'}
+
+    async def test_scoring_stops_at_closed_ticket_window(self):
+        """Closed tickets older than the scoring window are neither returned nor paged through"""
+        active = _tickets(300, estado='en_proceso', days_ago=90, prefix='a')
+        unassigned = _tickets(10, estado='abierto', agent=None, prefix='u')
+        closed = _tickets(2000, estado='cerrado', step_hours=1, prefix='c')  # 1 ticket por hora hacia atrás
+        upstreams = FakeUpstreams({'e1': {'tickets': active + unassigned + closed}})
+        fetcher = _fetcher(upstreams.handle, page_size=100, concurrency=2)
+
+        tickets = await fetcher.collect(fetcher.scoring_tickets('e1', window_days=10))
+        ids = {t['_id'] for t in tickets}
+
+        assert {t['_id'] for t in active + unassigned} <= ids
+        closed_ids = ids - {t['_id'] for t in active + unassigned}
+        assert 238 <= len(closed_ids) <= 241  # ~240 horas de ventana
+        # 20 páginas de cerrados en total; se cortó poco después de la página 3
+        assert upstreams.requests['GET tickets-svc/tickets'] < 4 + 1 + 6
+
+    async def test_duplicates_across_pages_are_dropped(self):
+        """A ticket that shifts pages while paginating is yielded once"""
+        tickets = _tickets(6)
+
+        def handler(request):
+            pagina = int(request.url.params['pagina'])
+            # La página 2 repite el último de la 1 (entró un ticket nuevo entre ambas)
+            page = tickets[0:3] if pagina == 1 else tickets[2:6]
+            return httpx.Response(200, json={'data': page, 'total': 6})
+
+        fetcher = _fetcher(handler, page_size=3)
+        result = await fetcher.collect(fetcher.iter_tickets('e1'))
+
+        assert [t['_id'] for t in result] == ['t0', 't1', 't2', 't3', 't4', 't5']
+
+    async def test_follows_cursor_when_available(self):
+        """With 'nextCursor' in the response, pagination follows the cursor"""
+        tickets = _tickets(5)
+        cursors = []
+
+        def handler(request):
+            cursor = request.url.params.get('cursor')
+            cursors.append(cursor)
+            start = int(cursor or 0)
+            next_cursor = str(start + 2) if start + 2 < len(tickets) else None
+            return httpx.Response(200, json={'data': tickets[start:start + 2], 'nextCursor': next_cursor})
+
+        fetcher = _fetcher(handler, page_size=2)
+        result = await fetcher.collect(fetcher.iter_tickets('e1'))
+
+        assert len(result) == 5
+        assert cursors == [None, '2', '4']
+
+    async def test_errors_propagate(self):
+        """A failing page fails the whole download"""
+        def handler(request):
+            if request.url.params['pagina'] == '2':
+                return httpx.Response(503, json={})
+            return httpx.Response(200, json={'data': _tickets(2), 'total': 6})
+
+        fetcher = _fetcher(handler, page_size=2)
+        with pytest.raises(httpx.HTTPStatusError):
+            await fetcher.collect(fetcher.iter_tickets('e1'))
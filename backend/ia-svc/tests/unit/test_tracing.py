@@ -0,0 +1,209 @@
+"""
+Unit Tests for per-ticket tracing
+Tests span nesting, traceparent propagation and the in-memory/JSONL exporters
+"""
+import asyncio
+import json
+import httpx
+import pytest
+from unittest.mock import AsyncMock
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.tracing import (
+    Tracer, RingBufferExporter, JsonlFileExporter, TRACER, current_span, inject, parse_traceparent
+)
+from services.agent_assigner import AgentAssigner
+from services.ticket_snapshot import TicketSnapshot
+from services.upstream_client import UpstreamClient
+
+
+@pytest.fixture
+def buffer():
+    return RingBufferExporter(max_traces=10)
+
+
+@pytest.fixture
+def tracer(buffer):
+    return Tracer([buffer])
+
+
+@pytest.fixture
+def global_buffer():
+    """Anillo del TRACER global, vacío para la prueba"""
+    TRACER.buffer.clear()
+    yield TRACER.buffer
+    TRACER.buffer.clear()
+
+
+@pytest.mark.unit
+class TestTracer:
+    """Tests de creación y anidamiento de spans"""
+
+    def test_child_spans_share_trace(self, tracer, buffer):
+        """Test que los spans hijos cuelgan del span actual"""
+        with tracer.start_trace('ticket.creado', ticket_id='T1') as root:
+            with tracer.span('classify_ticket') as child:
+                assert current_span() is child
+
+        spans = {s['name']: s for s in buffer.get_trace(root.trace_id)}
+        assert spans['classify_ticket']['parentId'] == root.span_id
+        assert spans['ticket.creado']['root'] is True
+        assert spans['ticket.creado']['durationMs'] >= spans['classify_ticket']['durationMs']
+        assert current_span() is None
+
+    def test_span_outside_trace_is_noop(self, tracer, buffer):
+        """Test que sin traza abierta no se registra nada"""
+        with tracer.span('classify_ticket') as span:
+            assert span is None
+
+        assert buffer.traces() == []
+
+    def test_errors_mark_the_span(self, tracer, buffer):
+        """Test que una excepción marca el span como error y se propaga"""
+        with pytest.raises(RuntimeError):
+            with tracer.start_trace('ticket.creado', ticket_id='T1'):
+                raise RuntimeError('boom')
+
+        summary = buffer.traces()[0]
+        assert summary['status'] == 'error'
+
+    async def test_concurrent_tickets_do_not_mix(self, tracer, buffer):
+        """Test que cada tarea de asyncio conserva su propia traza"""
+        async def process(ticket_id):
+            with tracer.start_trace('ticket.creado', ticket_id=ticket_id) as root:
+                await asyncio.sleep(0)
+                with tracer.span('classify_ticket') as child:
+                    assert child.trace_id == root.trace_id
+
+        await asyncio.gather(*(process(f'T{i}') for i in range(5)))
+
+        assert sorted(t['ticketId'] for t in buffer.traces()) == [f'T{i}' for i in range(5)]
+        assert all(t['spans'] == 2 for t in buffer.traces())
+
+    def test_disabled_tracer_records_nothing(self, buffer):
+        """Test que TRACING_ENABLED=false desactiva todo"""
+        tracer = Tracer([buffer], enabled=False)
+
+        with tracer.start_trace('ticket.creado') as root:
+            assert root is None
+
+        assert buffer.traces() == []
+
+
+@pytest.mark.unit
+class TestPropagation:
+    """Tests del header traceparent"""
+
+    def test_inject_uses_current_span(self, tracer):
+        """Test que inject agrega el traceparent del span actual"""
+        assert inject({'x': '1'}) == {'x': '1'}
+
+        with tracer.start_trace('ticket.creado') as root:
+            headers = inject({'x': '1'})
+
+        assert headers['traceparent'] == f'00-{root.trace_id}-{root.span_id}-01'
+        assert headers['x'] == '1'
+
+    def test_start_trace_continues_remote_parent(self, tracer):
+        """Test que una raíz con traceparent continúa la traza remota"""
+        remote = '00-' + 'a' * 32 + '-' + 'b' * 16 + '-01'
+
+        with tracer.start_trace('ticket.creado', traceparent=remote) as root:
+            pass
+
+        assert root.trace_id == 'a' * 32
+        assert root.parent_id == 'b' * 16
+
+    @pytest.mark.parametrize('value', [None, '', 'basura', '00-' + '0' * 32 + '-' + 'b' * 16 + '-01'])
+    def test_invalid_traceparent_is_ignored(self, value):
+        """Test que un traceparent inválido no se usa"""
+        assert parse_traceparent(value) is None
+
+    async def test_upstream_calls_carry_traceparent(self, global_buffer):
+        """Test que las peticiones upstream llevan el traceparent y generan un span"""
+        seen = []
+
+        def handler(request: httpx.Request):
+            seen.append(request.headers.get('traceparent'))
+            return httpx.Response(200, json={'data': []})
+
+        upstream = UpstreamClient('token', transport=httpx.MockTransport(handler))
+        upstream.register('tickets', 'http://tickets-svc:3002')
+
+        await upstream.get('tickets', '/tickets')
+        with TRACER.start_trace('ticket.creado', ticket_id='T1') as root:
+            await upstream.get('tickets', '/tickets', route='tickets.list')
+        await upstream.close()
+
+        assert seen[0] is None
+        assert seen[1].startswith(f'00-{root.trace_id}-')
+        http_span = next(s for s in global_buffer.get_trace(root.trace_id) if s['name'] == 'http GET')
+        assert http_span['attributes']['status'] == '200'
+        assert seen[1] == f"00-{root.trace_id}-{http_span['spanId']}-01"
+
+
+@pytest.mark.unit
+class TestExporters:
+    """Tests de los exportadores"""
+
+    def test_ring_buffer_evicts_oldest_trace(self, buffer, tracer):
+        """Test que el anillo conserva solo las últimas trazas"""
+        for i in range(12):
+            with tracer.start_trace('ticket.creado', ticket_id=f'T{i}'):
+                pass
+
+        traces = buffer.traces(limit=100)
+        assert len(traces) == 10
+        assert traces[0]['ticketId'] == 'T11'
+
+    def test_filters_by_ticket_and_duration(self, buffer, tracer):
+        """Test que se puede filtrar por ticket y por duración mínima"""
+        with tracer.start_trace('ticket.creado', ticket_id='T1'):
+            pass
+        with tracer.start_trace('ticket.creado', ticket_id='T2'):
+            pass
+
+        assert [t['ticketId'] for t in buffer.traces(ticket_id='T2')] == ['T2']
+        assert buffer.traces(min_duration_ms=60_000) == []
+
+    def test_jsonl_exporter_writes_one_span_per_line(self, tmp_path):
+        """Test que el exportador JSONL escribe un span por línea"""
+        path = tmp_path / 'trazas.jsonl'
+        exporter = JsonlFileExporter(str(path))
+        tracer = Tracer([exporter])
+
+        with tracer.start_trace('ticket.creado', ticket_id='T1'):
+            with tracer.span('classify_ticket'):
+                pass
+        exporter.close()
+
+        lines = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+        assert [line['name'] for line in lines] == ['classify_ticket', 'ticket.creado']
+
+
+@pytest.mark.unit
+class TestAssignerSpans:
+    """Tests de los spans del asignador"""
+
+    async def test_assign_ticket_spans(self, global_buffer):
+        """Test que assign_ticket abre un span por consulta de agentes y uno para las métricas del grupo"""
+        assigner = AgentAssigner('http://localhost:3001', 'http://localhost:3002')
+        assigner.get_available_agents = AsyncMock(return_value=[
+            {'_id': 'agent1', 'nombre': 'Juan', 'rol': 'soporte'},
+            {'_id': 'agent2', 'nombre': 'María', 'rol': 'soporte'},
+        ])
+        assigner.get_company_snapshot = AsyncMock(return_value=TicketSnapshot('empresa1', []))
+
+        with TRACER.start_trace('ticket.creado', ticket_id='T1') as root:
+            await assigner.assign_ticket({'empresaId': 'empresa1', 'grupo_atencion': 'Mesa de Servicio'})
+
+        spans = global_buffer.get_trace(root.trace_id)
+        names = [s['name'] for s in spans]
+        assert names.count('get_available_agents') == 1
+        assert names.count('calculate_agent_metrics') == 1
+        metrics_span = next(s for s in spans if s['name'] == 'calculate_agent_metrics')
+        assert metrics_span['attributes']['agentes'] == 2
@@ -0,0 +1,82 @@
+"""
+Unit Tests for Upstream Client
+Tests the shared pooled HTTP layer used by main.py and AgentAssigner
+"""
+import pytest
+import httpx
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.upstream_client import UpstreamClient
+from services.agent_assigner import AgentAssigner
+
+
+class TestUpstreamClient:
+    """Test suite for UpstreamClient class"""
+
+    @pytest.fixture
+    def requests_seen(self):
+        return []
+
+    @pytest.fixture
+    def upstream(self, requests_seen):
+        """UpstreamClient backed by an in-process mock transport"""
+        def handler(request: httpx.Request):
+            requests_seen.append(request)
+            if request.url.path == '/usuarios':
+                return httpx.Response(200, json={'data': [
+                    {'_id': 'a1', 'rol': 'soporte', 'gruposDeAtencion': ['Mesa de Servicio']},
+                    {'_id': 'a2', 'rol': 'usuario', 'gruposDeAtencion': ['Mesa de Servicio']},
+                ]})
+            return httpx.Response(200, json={'data': []})
+
+        client = UpstreamClient('token', route_timeouts={'tickets.list': 3.0},
+                                transport=httpx.MockTransport(handler))
+        client.register('usuarios', 'http://usuarios-svc:3001')
+        client.register('tickets', 'http://tickets-svc:3002/')
+        return client
+
+    @pytest.mark.unit
+    async def test_reuses_one_client_per_host(self, upstream):
+        """Every call to the same host goes through the same pooled client"""
+        await upstream.start()
+        first = upstream._get_client('tickets')
+
+        await upstream.get('tickets', '/tickets', route='tickets.list')
+        await upstream.get('tickets', '/tickets', route='tickets.list')
+
+        assert upstream._get_client('tickets') is first
+        await upstream.close()
+        assert first.is_closed
+
+    @pytest.mark.unit
+    async def test_service_headers_and_base_url(self, upstream, requests_seen):
+        """Requests carry service auth headers and resolve against the host base URL"""
+        await upstream.get('tickets', '/tickets', route='tickets.list')
+
+        request = requests_seen[0]
+        assert str(request.url) == 'http://tickets-svc:3002/tickets'
+        assert request.headers['Authorization'] == 'Bearer token'
+        assert request.headers['X-Service-Name'] == 'ia-svc'
+        assert request.extensions['timeout']['read'] == 3.0
+        await upstream.close()
+
+    @pytest.mark.unit
+    async def test_unknown_host_raises(self, upstream):
+        """Unregistered hosts are rejected"""
+        with pytest.raises(KeyError):
+            await upstream.get('chat', '/mensajes')
+
+    @pytest.mark.unit
+    async def test_agent_assigner_uses_shared_upstream(self, upstream, requests_seen):
+        """AgentAssigner goes through the injected upstream layer"""
+        assigner = AgentAssigner('http://usuarios-svc:3001', 'http://tickets-svc:3002', upstream=upstream)
+
+        agents = await assigner.get_available_agents('Mesa de Servicio', 'empresa1')
+
+        assert [a.id for a in agents] == ['a1']
+        assert requests_seen[0].url.params['empresaId'] == 'empresa1'
+        await upstream.close()
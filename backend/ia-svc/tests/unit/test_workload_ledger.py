@@ -0,0 +1,184 @@
+"""
+Unit Tests for Workload Ledger
+Tests the event-sourced per-company, per-agent workload counts
+"""
+import pytest
+from unittest.mock import AsyncMock
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from services.workload_ledger import WorkloadLedger
+from services.agent_assigner import AgentAssigner
+
+
+@pytest.fixture
+def ledger():
+    """Ledger bootstrapped with one company"""
+    ledger = WorkloadLedger()
+    ledger.load_all([
+        {"_id": "t1", "empresaId": "empresa1", "agenteAsignado": "agent1", "estado": "abierto", "prioridad": "alta"},
+        {"_id": "t2", "empresaId": "empresa1", "agenteAsignado": {"_id": "agent1"}, "estado": "en_proceso", "prioridad": "media"},
+        {"_id": "t3", "empresaId": "empresa1", "agenteAsignado": "agent2", "estado": "cerrado", "prioridad": "baja"},
+        {"_id": "t4", "empresaId": "empresa1", "agenteAsignado": None, "estado": "abierto", "prioridad": "media"},
+    ])
+    return ledger
+
+
+class TestWorkloadLedger:
+    """Test suite for WorkloadLedger class"""
+
+    @pytest.mark.unit
+    def test_bootstrap_counts(self, ledger):
+        """Bootstrap builds active counts and priority weights per agent"""
+        workload = ledger.company("empresa1")
+
+        assert workload.active_load("agent1") == (2, 3)
+        assert workload.active_load("agent2") == (0, 0)
+        assert [t.id for t in workload.tickets_for("agent2", ["cerrado"])] == ["t3"]
+
+    @pytest.mark.unit
+    def test_assignment_event_moves_load(self, ledger):
+        """Assigning an unassigned ticket adds it to the agent's load"""
+        ledger.apply_event("ticket.asignado", {"ticket": {"id": "t4", "agenteId": "agent2", "estado": "abierto"}})
+
+        assert ledger.company("empresa1").active_load("agent2") == (1, 1)
+
+    @pytest.mark.unit
+    def test_delegation_reassigns(self, ledger):
+        """Delegation moves the ticket to the becario"""
+        ledger.apply_event("ticket.delegado", {"ticket": {"id": "t1", "becarioId": "agent3", "tutorId": "agent1"}})
+        workload = ledger.company("empresa1")
+
+        assert workload.active_load("agent1") == (1, 1)
+        assert workload.active_load("agent3") == (1, 2)
+
+    @pytest.mark.unit
+    def test_closing_removes_active_load(self, ledger):
+        """State change to closed drops the ticket from the active counters"""
+        ledger.apply_event("ticket.estado_actualizado", {"ticket": {"id": "t1", "estado": "cerrado"}})
+        workload = ledger.company("empresa1")
+
+        assert workload.active_load("agent1") == (1, 1)
+        assert len(workload.tickets_for("agent1", ["cerrado"])) == 1
+
+    @pytest.mark.unit
+    def test_columns_follow_events(self, ledger):
+        """Grouped totals track reassignments and closures without rebuilding the columns"""
+        ledger.apply_event("ticket.asignado", {"ticket": {"id": "t1", "agenteId": "agent2"}})
+        ledger.apply_event("ticket.estado_actualizado", {"ticket": {"id": "t2", "estado": "resuelto"}})
+        ledger.apply_event("ticket.eliminado", {"ticket": {"id": "t3"}})
+        workload = ledger.company("empresa1")
+
+        totals = workload.agent_totals(["agent1", "agent2"])
+
+        assert len(workload.columns) == 2
+        assert totals["agent1"]["active_count"] == 0
+        assert (totals["agent2"]["active_count"], totals["agent2"]["active_weighted"]) == workload.active_load("agent2")
+
+    @pytest.mark.unit
+    def test_created_ticket_for_known_company(self, ledger):
+        """New tickets are tracked for bootstrapped companies and ignored otherwise"""
+        assert ledger.apply_event("ticket.creado", {"ticket": {"id": "t5", "empresaId": "empresa1"}})
+        assert not ledger.apply_event("ticket.creado", {"ticket": {"id": "t6", "empresaId": "otra"}})
+        assert not ledger.apply_event("ticket.asignado", {"ticket": {"id": "desconocido", "agenteId": "agent1"}})
+
+        ledger.apply_event("ticket.asignado_automaticamente", {"ticket": {"id": "t5", "agenteId": "agent2"}})
+        assert ledger.company("empresa1").active_load("agent2") == (1, 1)
+
+    @pytest.mark.unit
+    def test_deleted_ticket(self, ledger):
+        """Deleted tickets leave the ledger"""
+        ledger.apply_event("ticket.eliminado", {"ticket": {"id": "t1"}})
+
+        assert ledger.company("empresa1").active_load("agent1") == (1, 1)
+        assert ledger.stats()["tickets"] == 3
+
+    @pytest.mark.unit
+    def test_reconcile_replaces_company_state(self, ledger):
+        """Reconciliation replaces the company state with the fresh snapshot"""
+        ledger.load_company("empresa1", [
+            {"_id": "t1", "agenteAsignado": "agent2", "estado": "abierto", "prioridad": "alta"},
+        ])
+        workload = ledger.company("empresa1")
+
+        assert workload.active_load("agent1") == (0, 0)
+        assert workload.active_load("agent2") == (1, 2)
+        assert ledger.stats()["tickets"] == 1
+
+    @pytest.mark.unit
+    def test_reconcile_keeps_other_companies(self, ledger):
+        """Reloading a company drops only its own tickets, including the ones added by events"""
+        ledger.load_company("empresa2", [{"_id": "x1", "agenteAsignado": "agent9", "estado": "abierto"}])
+        ledger.apply_event("ticket.creado", {"ticket": {"id": "t5", "empresaId": "empresa1"}})
+
+        ledger.load_company("empresa1", [{"_id": "t1", "agenteAsignado": "agent1", "estado": "abierto"}])
+
+        assert ledger.stats()["tickets"] == 2
+        assert not ledger.apply_event("ticket.asignado", {"ticket": {"id": "t5", "agenteId": "agent1"}})
+        assert ledger.apply_event("ticket.estado_actualizado", {"ticket": {"id": "x1", "estado": "cerrado"}})
+
+    @pytest.mark.unit
+    def test_stale_event_is_ignored(self, ledger):
+        """An event older than the ticket's last known update does not overwrite it"""
+        ledger.apply_event("ticket.estado_actualizado", {"ticket": {"id": "t1", "estado": "cerrado"}})
+
+        assert not ledger.apply_event("ticket.asignado", {
+            "ticket": {"id": "t1", "agenteId": "agent2", "estado": "abierto", "updatedAt": "2020-01-01T00:00:00Z"}
+        })
+        assert ledger.company("empresa1").active_load("agent2") == (0, 0)
+        assert ledger.company("empresa1").active_load("agent1") == (1, 1)
+
+    @pytest.mark.unit
+    def test_events_during_reload_are_replayed(self, ledger):
+        """Events applied while a snapshot is being fetched survive the swap"""
+        with ledger.reloading() as since:
+            ledger.apply_event("ticket.estado_actualizado", {"ticket": {"id": "t1", "estado": "cerrado"}})
+            ledger.apply_event("ticket.creado", {"ticket": {"id": "t5", "empresaId": "empresa1"}})
+            ledger.apply_event("ticket.asignado", {"ticket": {"id": "t5", "agenteId": "agent2"}})
+            ledger.apply_event("ticket.eliminado", {"ticket": {"id": "t2"}})
+            ledger.load_company("empresa1", [
+                {"_id": "t1", "agenteAsignado": "agent1", "estado": "abierto", "prioridad": "alta"},
+                {"_id": "t2", "agenteAsignado": "agent1", "estado": "en_proceso", "prioridad": "media"},
+            ], since=since)
+        workload = ledger.company("empresa1")
+
+        assert workload.active_load("agent1") == (0, 0)
+        assert workload.active_load("agent2") == (1, 1)
+        assert ledger.stats()["tickets"] == 2
+
+
+class TestAgentAssignerLedger:
+    """Test suite for ledger-backed assignment"""
+
+    @pytest.mark.unit
+    async def test_assignment_reads_ledger_without_fetching(self, ledger):
+        """Bootstrapped companies are scored without calling tickets-svc"""
+        assigner = AgentAssigner("http://localhost:3001", "http://localhost:3002", ledger=ledger)
+        assigner.get_available_agents = AsyncMock(return_value=[
+            {"_id": "agent1", "nombre": "Juan"},
+            {"_id": "agent2", "nombre": "María"},
+        ])
+        assigner.fetch_company_tickets = AsyncMock()
+
+        best = await assigner.assign_ticket({"empresaId": "empresa1", "grupo_atencion": "Mesa de Servicio"})
+
+        assigner.fetch_company_tickets.assert_not_awaited()
+        assert best["_id"] == "agent2"
+
+    @pytest.mark.unit
+    async def test_unknown_company_is_loaded_once(self):
+        """First assignment for a company bootstraps it into the ledger"""
+        ledger = WorkloadLedger()
+        assigner = AgentAssigner("http://localhost:3001", "http://localhost:3002", ledger=ledger)
+        assigner.fetch_company_tickets = AsyncMock(return_value=[
+            {"_id": "t1", "agenteAsignado": "agent1", "estado": "abierto", "prioridad": "media"},
+        ])
+
+        await assigner.get_workload_view("empresa9")
+        await assigner.get_workload_view("empresa9")
+
+        assigner.fetch_company_tickets.assert_awaited_once_with("empresa9")
+        assert ledger.company("empresa9").active_load("agent1") == (1, 1)
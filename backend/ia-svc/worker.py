@@ -0,0 +1,125 @@
+# ia-svc/worker.py
+"""
+Modo worker: procesos consumidores de 'ticket.creado' separados de la API HTTP.
+
+    python worker.py --workers 4
+
+Lanza un proceso enrutador (consume 'ia_tickets' y reparte por empresaId con hash
+consistente, ver services/sharding.py) y N procesos de shard, cada uno con su propio
+event loop, pools HTTP, cachés y libro mayor. Los procesos que se caen se vuelven a
+lanzar; SIGTERM/SIGINT detiene a todos.
+
+La API se corre aparte con IA_MODE=api para que no consuma también los tickets.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import time
+
+from logger import init_logger, get_logger
+
+logger = get_logger('worker')
+
+RABBITMQ_URL = os.getenv('RABBITMQ_URL', 'amqp://localhost:5672')
+
+# Segundos mínimos entre relanzamientos de un mismo proceso (evita un bucle de caídas)
+RESTART_BACKOFF_SECONDS = float(os.getenv('IA_WORKER_RESTART_SECONDS', 5))
+
+
+def run_router(shards: int):
+    """Proceso enrutador: 'ia_tickets' -> 'ia_tickets.shard.<n>'"""
+    from services.event_publisher import EventPublisher
+    from services.sharding import ShardRouter
+
+    init_logger()
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    router = ShardRouter(RABBITMQ_URL, shards, EventPublisher(RABBITMQ_URL))
+    try:
+        router.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        router.consumer.close()
+        router.publisher.close()
+        logger.info('🔀 Enrutador detenido (enrutados por shard: %s)', router.routed)
+
+
+def run_shard(shard: int, shards: int):
+    """Proceso de un shard: consumidor de su cola sin API HTTP"""
+    import main
+    asyncio.run(main.run_worker(shard, shards))
+
+
+class Supervisor:
+    """
+    Lanza y vigila los procesos hijos.
+
+    Args:
+        shards: Número de procesos consumidores
+    """
+
+    def __init__(self, shards: int):
+        self.shards = shards
+        self._context = multiprocessing.get_context('spawn')
+        self._targets = {'router': (run_router, (shards,))}
+        for shard in range(shards):
+            self._targets[f'shard-{shard}'] = (run_shard, (shard, shards))
+        self._processes = {}
+        self._started_at = {}
+        self._stopping = False
+
+    def _spawn(self, name: str):
+        target, args = self._targets[name]
+        process = self._context.Process(target=target, args=args, name=f'ia-{name}')
+        process.start()
+        self._processes[name] = process
+        self._started_at[name] = time.monotonic()
+        logger.info('🧵 %s iniciado (pid %s)', name, process.pid)
+
+    def stop(self, *_):
+        self._stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for name in self._targets:
+            self._spawn(name)
+
+        while not self._stopping:
+            time.sleep(0.5)
+            for name, process in list(self._processes.items()):
+                if process.is_alive() or self._stopping:
+                    continue
+                if time.monotonic() - self._started_at[name] < RESTART_BACKOFF_SECONDS:
+                    continue
+                logger.warning('⚠️ %s terminó (código %s), relanzando', name, process.exitcode)
+                self._spawn(name)
+
+        logger.info('🛑 Deteniendo %s procesos...', len(self._processes))
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self._processes.values():
+            process.join(timeout=30)
+            if process.is_alive():
+                process.kill()
+        logger.info('✅ Workers detenidos')
+
+
+def main():
+    init_logger()
+    parser = argparse.ArgumentParser(description='Procesos consumidores del servicio de IA')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('IA_WORKERS', os.cpu_count() or 1)),
+                        help='Número de procesos consumidores (default: IA_WORKERS o núcleos de la CPU)')
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error('--workers debe ser al menos 1')
+
+    logger.info('🚀 INICIANDO WORKERS DE IA (%s shards)', args.workers)
+    Supervisor(args.workers).run()
+
+
+if __name__ == '__main__':
+    main()